@@ -0,0 +1,32 @@
+"""create upstream usage (quota ledger) table
+
+Revision ID: upstream_usage_20261018
+Revises: standings_cache_20250918
+Create Date: 2026-10-18
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'upstream_usage_20261018'
+down_revision: Union[str, None] = 'standings_cache_20250918'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    op.create_table(
+        'upstream_usage',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('upstream', sa.String(length=32), nullable=False),
+        sa.Column('route', sa.String(length=64), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('credits', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=False),
+        sa.UniqueConstraint('upstream', 'route', 'day', name='uq_upstream_usage_upstream_route_day'),
+    )
+    op.create_index('ix_upstream_usage_upstream_day', 'upstream_usage', ['upstream', 'day'])
+
+def downgrade() -> None:
+    op.drop_index('ix_upstream_usage_upstream_day', table_name='upstream_usage')
+    op.drop_table('upstream_usage')
@@ -12,6 +12,7 @@ from .endpoints.contact import router as contact_router
 from .endpoints.google_events_debug import router as google_events_debug_router
 from .endpoints.athletes import router as athletes_router
 from .endpoints.workouts import router as workouts_router
+from .endpoints.admin import router as admin_router
 
 api_router = APIRouter()
 api_router.include_router(auth_router, prefix="/auth", tags=["auth"])
@@ -25,4 +26,5 @@ api_router.include_router(leaderboards_router, prefix="/leaderboards", tags=["le
 api_router.include_router(contact_router, prefix="/contact", tags=["contact"])
 api_router.include_router(google_events_debug_router, prefix="/google-events", tags=["google-events-debug"])
 api_router.include_router(athletes_router)
-api_router.include_router(workouts_router)
\ No newline at end of file
+api_router.include_router(workouts_router)
+api_router.include_router(admin_router, prefix="/admin", tags=["admin"])
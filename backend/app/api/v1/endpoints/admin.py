@@ -0,0 +1,64 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+
+from app.core.cache import cache
+from app.core.dependencies import require_admin
+from app.core.http import http_clients
+from app.crud.quota import usage_by_route
+from app.db.session import get_db
+from app.services.events import event_index_stats
+from app.services.quota import month_start, quota_ledger
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+class CacheInvalidateRequest(BaseModel):
+    prefix: str | None = None  # e.g. "tennis_atp:" or "sportsdb:lookuptable"
+    tag: str | None = None  # e.g. "sport:nba" or "source:wikipedia"
+
+
+@router.get("/cache/stats")
+async def cache_stats(namespace: str | None = Query(None, description="Limit to one key prefix, e.g. 'events'")):
+    stats = cache.stats()
+    if namespace:
+        stats = {namespace: stats[namespace]} if namespace in stats else {}
+    return {
+        "entries": sum(s["entries"] for s in stats.values()),
+        "bytes": sum(s["bytes"] for s in stats.values()),
+        "namespaces": stats,
+        "functions": cache.function_stats(),
+    }
+
+
+@router.get("/upstreams")
+async def upstream_stats():
+    """Circuit breaker state and rate limiter counters per upstream."""
+    return http_clients.stats()
+
+
+@router.get("/events/index")
+async def events_index_stats():
+    """Spatial index sizes and query counters per events query / filter chips."""
+    return event_index_stats()
+
+
+@router.get("/quota")
+def quota_usage(db: Session = Depends(get_db)):
+    """Month-to-date credits per metered upstream (as of the last ledger flush), plus rows by route and day."""
+    return {
+        "upstreams": quota_ledger.stats(),
+        "routes": usage_by_route(db, month_start()),
+    }
+
+
+@router.post("/cache/invalidate")
+async def cache_invalidate(req: CacheInvalidateRequest):
+    if not req.prefix and not req.tag:
+        raise HTTPException(status_code=400, detail="Provide a prefix and/or a tag")
+    removed = {}
+    if req.prefix:
+        removed["prefix"] = await cache.invalidate_prefix(req.prefix)
+    if req.tag:
+        removed["tag"] = await cache.invalidate_tag(req.tag)
+    return {"removed": removed}
@@ -1,5 +1,7 @@
+import json
 from fastapi import APIRouter, HTTPException, Query
-from app.services.events import aggregate_events
+from fastapi.responses import StreamingResponse
+from app.services.events import aggregate_events, stream_events
 from app.schemas.event import EventsResponse, compute_viewport
 
 router = APIRouter()
@@ -75,4 +77,42 @@ async def list_events_with_viewport(
                                   min_lon=min_lon, max_lon=max_lon,
                                   user_lat=user_lat, user_lon=user_lon)
     vp = compute_viewport(resp.data)
-    return {"total": resp.total, "viewport": vp, "events": [e.model_dump() for e in resp.data]}
\ No newline at end of file
+    return {"total": resp.total, "viewport": vp, "events": [e.model_dump() for e in resp.data]}
+
+
+def _frame(frame: dict, fmt: str) -> str:
+    payload = json.dumps(frame, default=str, separators=(",", ":"))
+    if fmt == "sse":
+        return f"event: {frame['type']}\ndata: {payload}\n\n"
+    return payload + "\n"
+
+
+@router.get("/stream")
+async def stream_events_progressively(
+    q: str = Query(""),
+    page: int = Query(1, ge=1),
+    limit: int = Query(20, ge=1, le=50),
+    htichips: str | None = Query(None),
+    min_lat: float | None = None,
+    max_lat: float | None = None,
+    min_lon: float | None = None,
+    max_lon: float | None = None,
+    user_lat: float | None = Query(None),
+    user_lon: float | None = Query(None),
+    format: str = Query("ndjson", pattern="^(ndjson|sse)$", description="'ndjson' lines or 'sse' (Server-Sent Events)"),
+):
+    """Same results as /events, streamed: ranked 'events' frames as upstream batches arrive, then a 'done' frame
+    carrying the final page and flags. A failure after the stream started arrives as an 'error' frame.
+    """
+    async def frames():
+        try:
+            async for frame in stream_events(query=q, page=page, limit=limit, htichips=htichips,
+                                             min_lat=min_lat, max_lat=max_lat, min_lon=min_lon, max_lon=max_lon,
+                                             user_lat=user_lat, user_lon=user_lon):
+                yield _frame(frame, format)
+        except Exception as exc:  # noqa: BLE001 - the 200 status line is already sent
+            yield _frame({"type": "error", "detail": f"Events fetch failed: {exc}"}, format)
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(frames(), media_type=media_type,
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
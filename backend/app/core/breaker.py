@@ -0,0 +1,281 @@
+"""Per-upstream circuit breakers for the shared HTTP clients.
+
+Each upstream gets a ``Breaker`` tracking the outcome and latency of its last
+``window`` requests. The states are:
+
+* closed: requests flow. The breaker opens when at least ``min_calls`` recent
+  requests failed at ``failure_rate`` or more, or at once on a 429.
+* open: requests fail fast with ``CircuitOpen`` without being sent, for
+  ``open_seconds`` (or the upstream's Retry-After, if longer).
+* half-open: after the open interval, exactly one probe request goes out.
+  If it succeeds the breaker closes; if it fails it re-opens for twice as
+  long, up to ``max_open_seconds``.
+
+Failures are transport errors, 5xx, 429, and responses slower than
+``slow_seconds`` (when set). Other 4xx mean the upstream is answering and
+count as successes. Services check ``http_clients.breaker(name).available()``
+before spending a request budget; ``stats()`` feeds GET /admin/upstreams.
+
+``SharedBreakerState`` publishes each trip (the wall-clock time the breaker
+stays open until) in the shared ``breaker`` cache namespace, and workers
+check it before sending, so one worker's 429 makes them all back off.
+"""
+from __future__ import annotations
+import time
+import asyncio
+import logging
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable
+
+import httpx
+
+from app.core.ratelimit import UpstreamThrottled
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+BREAKER_SYNC_SECONDS = 2.0  # how often a worker re-reads an upstream's shared breaker state
+
+
+@dataclass(frozen=True)
+class BreakerPolicy:
+    window: int = 50
+    min_calls: int = 10
+    failure_rate: float = 0.5
+    slow_seconds: float = 0.0  # 0 = latency never counts as a failure
+    open_seconds: float = 30.0
+    max_open_seconds: float = 600.0
+
+
+class CircuitOpen(UpstreamThrottled):
+    """The upstream's breaker is open (or its probe is in flight); the request was not sent."""
+
+
+def retry_after_seconds(response: httpx.Response) -> float | None:
+    """Seconds from a numeric Retry-After header, or None."""
+    raw = response.headers.get("Retry-After")
+    try:
+        return max(0.0, float(raw)) if raw else None
+    except ValueError:
+        return None  # HTTP-date form; the breaker's own interval applies
+
+
+class Breaker:
+    """Closed/open/half-open state machine for one upstream."""
+
+    def __init__(self, name: str, policy: BreakerPolicy):
+        self.name = name
+        self.policy = policy
+        self._state = CLOSED
+        self._results: deque[tuple[bool, float]] = deque(maxlen=max(1, policy.window))
+        self._opened_at = 0.0
+        self._open_for = policy.open_seconds
+        self._probing = False
+        self.opens = 0
+        self.adopted = 0
+        self.rejected = 0
+        self.on_change: Callable[[Breaker], None] | None = None  # called after it opens or closes
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() >= self._opened_at + self._open_for:
+            return HALF_OPEN
+        return self._state
+
+    def available(self) -> bool:
+        """Whether a request sent now would go out (closed, or half-open with no probe running)."""
+        state = self.state
+        return state == CLOSED or (state == HALF_OPEN and not self._probing)
+
+    def before_request(self, request: httpx.Request) -> bool:
+        """Admit a request or raise CircuitOpen; returns True if it is the half-open probe."""
+        state = self.state
+        if state == CLOSED:
+            return False
+        if state == HALF_OPEN and not self._probing:
+            self._state = HALF_OPEN
+            self._probing = True
+            return True
+        self.rejected += 1
+        raise CircuitOpen(f"{self.name}: circuit {state}", request=request)
+
+    def open_until(self) -> float | None:
+        """Wall-clock time the breaker stays open until, or None when it is not open."""
+        if self._state != OPEN:
+            return None
+        return time.time() + self._opened_at + self._open_for - time.monotonic()
+
+    def adopt(self, open_until: float) -> None:
+        """Open until ``open_until`` (wall clock) because another worker's breaker tripped."""
+        remaining = min(open_until - time.time(), self.policy.max_open_seconds)
+        current = self.open_until()
+        if remaining <= 0 or self._probing or (current is not None and current >= open_until):
+            return
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._open_for = remaining
+        self._results.clear()
+        self.adopted += 1
+        logger.info("breaker.open upstream=%s seconds=%.1f (shared)", self.name, remaining)
+
+    def release_probe(self) -> None:
+        """The probe ended without a verdict (cancelled or throttled locally); let another one try."""
+        self._probing = False
+
+    def record(self, ok: bool, seconds: float, probe: bool = False, rate_limited: bool = False,
+               retry_after: float | None = None) -> None:
+        if ok and self.policy.slow_seconds and seconds > self.policy.slow_seconds:
+            ok = False
+        if probe:
+            self._probing = False
+            if ok:
+                self._close()
+            else:
+                self._trip(retry_after, backoff=True)
+            return
+        if self._state != CLOSED:
+            return  # started before the breaker opened
+        self._results.append((ok, seconds))
+        if rate_limited:
+            self._trip(retry_after)
+            return
+        failures = sum(1 for good, _ in self._results if not good)
+        if len(self._results) >= self.policy.min_calls and failures / len(self._results) >= self.policy.failure_rate:
+            self._trip(retry_after)
+
+    def _trip(self, retry_after: float | None = None, backoff: bool = False) -> None:
+        if backoff:
+            self._open_for = min(self.policy.max_open_seconds, self._open_for * 2)
+        else:
+            self._open_for = self.policy.open_seconds
+        if retry_after:
+            self._open_for = max(self._open_for, min(retry_after, self.policy.max_open_seconds))
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._results.clear()
+        self.opens += 1
+        logger.warning("breaker.open upstream=%s seconds=%.1f", self.name, self._open_for)
+        if self.on_change is not None:
+            self.on_change(self)
+
+    def _close(self) -> None:
+        self._state = CLOSED
+        self._open_for = self.policy.open_seconds
+        self._results.clear()
+        logger.info("breaker.closed upstream=%s", self.name)
+        if self.on_change is not None:
+            self.on_change(self)
+
+    def latency(self, quantile: float) -> float | None:
+        """Latency quantile (seconds) of recent successful requests; None until ``min_calls`` are seen."""
+        samples = sorted(seconds for ok, seconds in self._results if ok)
+        if len(samples) < self.policy.min_calls:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * quantile))]
+
+    def stats(self) -> dict[str, Any]:
+        state = self.state
+        failures = sum(1 for ok, _ in self._results if not ok)
+        retry_in = self._opened_at + self._open_for - time.monotonic() if state == OPEN else 0.0
+        return {
+            "state": state,
+            "failure_rate": round(failures / len(self._results), 3) if self._results else 0.0,
+            "calls": len(self._results),
+            "p95_seconds": self.latency(0.95),
+            "open_for_seconds": self._open_for if state != CLOSED else 0.0,
+            "retry_in_seconds": max(0.0, round(retry_in, 1)),
+            "opens": self.opens,
+            "adopted": self.adopted,
+            "rejected": self.rejected,
+        }
+
+
+class SharedBreakerState:
+    """Keeps breakers of the same upstream open together across workers, through the shared cache.
+
+    A trip stores ``breaker:<upstream>`` = open-until time (wall clock), expiring
+    with it; a successful probe deletes the key. Before sending, a worker reads
+    the key (at most every ``sync_seconds`` per upstream) and opens its own
+    breaker until the same time.
+    """
+
+    def __init__(self, cache: Any, sync_seconds: float = BREAKER_SYNC_SECONDS):
+        self.cache = cache
+        self.sync_seconds = sync_seconds
+        self._checked: dict[str, float] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    def attach(self, breaker: Breaker) -> None:
+        breaker.on_change = self._publish
+
+    def _publish(self, breaker: Breaker) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = loop.create_task(self._write(breaker.name, breaker.open_until()))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _write(self, name: str, open_until: float | None) -> None:
+        key = f"breaker:{name}"
+        try:
+            if open_until is None:
+                await self.cache.delete(key)
+            else:
+                await self.cache.set(key, open_until, max(1, round(open_until - time.time())))
+        except Exception as e:  # noqa: BLE001 - the local breaker still protects this worker
+            logger.warning("breaker.publish failed upstream=%s err=%s", name, e)
+
+    async def pull(self, breaker: Breaker) -> None:
+        now = time.monotonic()
+        if now - self._checked.get(breaker.name, -self.sync_seconds) < self.sync_seconds:
+            return
+        self._checked[breaker.name] = now
+        try:
+            open_until = await self.cache.get(f"breaker:{breaker.name}")
+        except Exception as e:  # noqa: BLE001
+            logger.debug("breaker.pull failed upstream=%s err=%s", breaker.name, e)
+            return
+        if open_until:
+            breaker.adopt(float(open_until))
+
+
+class BreakerTransport(httpx.AsyncBaseTransport):
+    """Routes requests through a Breaker and reports each outcome back to it."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, breaker: Breaker,
+                 shared: SharedBreakerState | None = None):
+        self._transport = transport
+        self.breaker = breaker
+        self.shared = shared
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if self.shared is not None:
+            await self.shared.pull(self.breaker)
+        probe = self.breaker.before_request(request)
+        started = time.perf_counter()
+        try:
+            response = await self._transport.handle_async_request(request)
+        except UpstreamThrottled:
+            if probe:
+                self.breaker.release_probe()
+            raise
+        except Exception:
+            self.breaker.record(False, time.perf_counter() - started, probe)
+            raise
+        except BaseException:
+            if probe:
+                self.breaker.release_probe()
+            raise
+        # Time spent queueing in the rate limiter says nothing about the upstream.
+        seconds = time.perf_counter() - started - request.extensions.get("rate_limit_waited", 0.0)
+        status = response.status_code
+        self.breaker.record(status < 500 and status != 429, seconds, probe,
+                            rate_limited=status == 429, retry_after=retry_after_seconds(response))
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
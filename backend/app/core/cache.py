@@ -1,35 +1,967 @@
 from __future__ import annotations
+import sys
+import copy
+import json
 import time
+import heapq
+import bisect
 import asyncio
-from typing import Any, Callable
+import logging
+import inspect
+import functools
+import contextvars
+from collections import OrderedDict
+from itertools import zip_longest
+from dataclasses import dataclass, fields
+from typing import Any, Callable, NamedTuple
+
+from app.core.config import settings
+from app.core.cache_backends import CacheBackend, backend_from_url, decode, encode
+from app.core.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class NamespacePolicy:
+    """Per-namespace settings; the namespace is the text before the first ':'.
+
+    ``max_entries`` / ``max_bytes`` bound memory (None = cache-wide default).
+    ``hard_ttl`` enables stale-while-revalidate: the TTL passed to ``set`` is
+    the soft TTL, and until ``hard_ttl`` seconds after the write an expired
+    entry may still be served while one background refresh runs.
+    ``negative_ttl`` is how long a remembered failure is kept when the caller
+    does not pass its own TTL to ``set_negative``.
+    ``shared`` writes entries through to the L2 backend (when one is
+    configured) so every worker sees them. It is off by default: only
+    namespaces of public upstream data opt in, so per-user keys (``events``
+    carries the user's coordinates, ``revgeo`` their location) stay in-process.
+    ``serialize`` stores values as encoded (pickled, zlib-compressed) bytes
+    and decodes on every read, so callers always get a private copy they may
+    mutate, and large lists/HTML take a fraction of their live size.
+    ``tags`` are attached to every entry in the namespace (on top of any
+    passed to ``set``), so ``invalidate_tag`` can purge related data across
+    namespaces, e.g. everything tagged ``source:wikipedia``.
+    """
+    max_entries: int | None = None
+    max_bytes: int | None = None
+    hard_ttl: int | None = None
+    negative_ttl: int | None = None
+    shared: bool | None = None
+    serialize: bool | None = None
+    tags: tuple[str, ...] | None = None
+
+
+MB = 1024 * 1024
+HOUR = 3600
+REFRESH_BACKOFF = 60  # seconds between refresh attempts after a failure, when the namespace has no negative_ttl
+
+# Wikipedia / TheSportsDB standings keys: soft TTL comes from the service, keep stale copies for a day.
+# Values are the namespace tags used for invalidation.
+STANDINGS_NAMESPACES = {
+    "fifa_rankings": ("source:wikipedia", "sport:soccer"),
+    "skiing_wc_overall": ("source:wikipedia", "sport:skiing"),
+    "tennis_atp": ("source:wikipedia", "sport:tennis"),
+    "golf_owgr": ("source:wikipedia", "sport:golf"),
+    "cricket_odi": ("source:wikipedia", "sport:cricket"),
+    "rugby_world": ("source:wikipedia", "sport:rugby"),
+    "cycling_uci": ("source:wikipedia", "sport:cycling"),
+    "running_records": ("source:wikipedia", "sport:running"),
+    "esports_highest": ("source:wikipedia", "sport:esports"),
+    "nba_standings": ("source:wikipedia", "sport:nba"),
+    "nfl_standings": ("source:wikipedia", "sport:nfl"),
+    "mlb_standings": ("source:wikipedia", "sport:mlb"),
+    "nhl_standings": ("source:wikipedia", "sport:nhl"),
+    "topsoc": ("source:thesportsdb", "sport:soccer"),
+}
+
+# Namespaces that grow with user input get explicit budgets; everything else
+# falls back to CACHE_MAX_ENTRIES / CACHE_MAX_BYTES from settings. Namespaces
+# holding mutable lists/models (or big HTML) are serialized; small immutable
+# values such as geocode tuples are kept live. Only public upstream data is
+# shared through the L2.
+NAMESPACE_POLICIES: dict[str, NamespacePolicy] = {
+    "events": NamespacePolicy(max_entries=2000, max_bytes=32 * MB, hard_ttl=30 * 60, serialize=True),  # one key per query/page/limit/bbox
+    "evpool": NamespacePolicy(max_entries=1000, max_bytes=32 * MB, hard_ttl=30 * 60, serialize=True, shared=True),  # candidate pool tiers per query/location/view mode
+    "geocode": NamespacePolicy(max_entries=20000, max_bytes=8 * MB, hard_ttl=7 * 24 * HOUR, negative_ttl=15 * 60,
+                               shared=True),  # one key per address string
+    "rawfetch": NamespacePolicy(max_entries=64, max_bytes=48 * MB, hard_ttl=24 * HOUR, negative_ttl=120, serialize=True,
+                                shared=True, tags=("source:wikipedia",)),  # Wikipedia HTML + ETag/Last-Modified validators
+    "wikirows": NamespacePolicy(max_entries=256, hard_ttl=24 * HOUR, serialize=True,
+                                shared=True, tags=("source:wikipedia",)),  # parsed tables keyed by page digest
+    "sportsdb": NamespacePolicy(max_entries=2000, max_bytes=32 * MB, hard_ttl=30 * 60, negative_ttl=30, serialize=True,
+                                shared=True, tags=("source:thesportsdb",)),  # includes the shared 429 cooldown flag
+    "scrape_ev": NamespacePolicy(hard_ttl=15 * 60, serialize=True, shared=True),  # Event lists that aggregate_events annotates per user
+    "revgeo": NamespacePolicy(hard_ttl=7 * 24 * HOUR, negative_ttl=15 * 60),  # keyed by user coordinates: not shared
+    "fwdgeo": NamespacePolicy(hard_ttl=7 * 24 * HOUR, negative_ttl=15 * 60, shared=True),
+    "latlon": NamespacePolicy(hard_ttl=7 * 24 * HOUR, negative_ttl=15 * 60, shared=True),
+    "breaker": NamespacePolicy(max_entries=64, shared=True),  # open-until time per upstream (app.core.breaker.SharedBreakerState)
+    "ergast": NamespacePolicy(hard_ttl=24 * HOUR, negative_ttl=60, serialize=True, shared=True,
+                              tags=("source:ergast", "sport:f1")),
+    **{ns: NamespacePolicy(hard_ttl=24 * HOUR, serialize=True, shared=True, tags=tags)
+       for ns, tags in STANDINGS_NAMESPACES.items()},
+}
+
+
+class CacheLookup(NamedTuple):
+    """Result of ``TTLCache.lookup``; distinguishes a cached None/failure from a miss."""
+    hit: bool
+    value: Any = None
+    negative: bool = False  # hit on a remembered failure (set via set_negative)
+    stale: bool = False  # served past its soft TTL
+
+
+MISS = CacheLookup(hit=False)
+
+
+def namespace_of(key: str) -> str:
+    return key.split(":", 1)[0]
+
+
+def approx_size(value: Any, _depth: int = 0) -> int:
+    """Rough deep size of a cached value in bytes.
+
+    Only used for budget accounting, so it trades accuracy for speed: containers
+    are walked a few levels deep and pydantic models are sized via their __dict__.
+    """
+    size = sys.getsizeof(value)
+    if _depth >= 4 or isinstance(value, (str, bytes, bytearray, int, float, bool)) or value is None:
+        return size
+    if isinstance(value, dict):
+        for k, v in value.items():
+            size += approx_size(k, _depth + 1) + approx_size(v, _depth + 1)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        for v in value:
+            size += approx_size(v, _depth + 1)
+    elif hasattr(value, "__dict__"):
+        size += approx_size(vars(value), _depth + 1)
+    return size
+
+
+class _Entry:
+    __slots__ = ("expires_at", "hard_expires_at", "value", "size", "refresh", "refreshing", "retry_at", "negative",
+                 "synced_at", "l2_hash", "encoded", "tags")
+
+    def __init__(self, expires_at: float, hard_expires_at: float, value: Any, size: int,
+                 refresh: Callable[[], Any] | None = None, negative: bool = False, tags: tuple[str, ...] = ()):
+        self.expires_at = expires_at  # soft expiry: fresh until here
+        self.hard_expires_at = hard_expires_at  # may be served stale until here
+        self.value = value
+        self.size = size
+        self.refresh = refresh  # coroutine factory that recomputes and re-sets the key
+        self.refreshing = False
+        self.retry_at = 0.0  # after a failed refresh: no new one before this
+        self.negative = negative
+        self.synced_at = 0.0  # last time this copy was written to / confirmed against L2
+        self.l2_hash: int | None = None  # hash of the L2 payload this copy came from (or was written as)
+        self.encoded = False  # value holds encode() bytes; decode on read
+        self.tags = tags
+
+    def read(self) -> Any:
+        return decode(self.value) if self.encoded else self.value
+
+
+class _NamespaceStats:
+    """Counters for one namespace or @cached function; plain ints are safe on a single event loop."""
+    __slots__ = ("hits", "stale_hits", "negative_hits", "misses", "sets", "evictions", "expirations",
+                 "coalesced", "produced", "producer_errors", "producer_seconds", "producer_max_seconds")
 
-class TTLCache:
-    """Simple async-safe in-process TTL cache."""
     def __init__(self):
-        self._store: dict[str, tuple[float, Any]] = {}
-        self._lock = asyncio.Lock()
-
-    async def get(self, key: str):
-        async with self._lock:
-            item = self._store.get(key)
-            if not item:
-                return None
-            expires_at, value = item
-            if expires_at < time.time():
-                self._store.pop(key, None)
-                return None
+        for name in self.__slots__:
+            setattr(self, name, 0)
+
+    def record_producer(self, seconds: float, failed: bool = False) -> None:
+        self.produced += 1
+        self.producer_errors += int(failed)
+        self.producer_seconds += seconds
+        self.producer_max_seconds = max(self.producer_max_seconds, seconds)
+
+
+class _Shard:
+    """One lock stripe: per-namespace LRU dicts, byte counters and secondary indexes.
+
+    ``expiry`` holds ``(hard_expires_at, key)`` pairs, one per install. Pairs
+    whose entry was since replaced, evicted or deleted are dropped lazily when
+    they reach the top, so the heap never pins evicted values in memory.
+    ``keys`` is every live key in sorted order (prefix ranges via bisect) and
+    ``tags`` maps each tag to its live keys; both are kept exact.
+    """
+    __slots__ = ("lock", "namespaces", "bytes", "expiry", "keys", "tags")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.namespaces: dict[str, OrderedDict[str, _Entry]] = {}
+        self.bytes: dict[str, int] = {}
+        self.expiry: list[tuple[float, str]] = []
+        self.keys: list[str] = []
+        self.tags: dict[str, set[str]] = {}
+
+    def add(self, ns: str, key: str, entry: _Entry) -> None:
+        self.pop(ns, key)
+        self.namespaces.setdefault(ns, OrderedDict())[key] = entry
+        self.bytes[ns] = self.bytes.get(ns, 0) + entry.size
+        heapq.heappush(self.expiry, (entry.hard_expires_at, key))
+        bisect.insort(self.keys, key)
+        for tag in entry.tags:
+            self.tags.setdefault(tag, set()).add(key)
+
+    def unindex(self, ns: str, key: str, entry: _Entry) -> None:
+        """Forget a key already removed from its namespace dict."""
+        self.bytes[ns] -= entry.size
+        i = bisect.bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            del self.keys[i]
+        for tag in entry.tags:
+            keys = self.tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.tags[tag]
+
+    def pop(self, ns: str, key: str) -> _Entry | None:
+        entries = self.namespaces.get(ns)
+        if entries is None:
+            return None
+        entry = entries.pop(key, None)
+        if entry is not None:
+            self.unindex(ns, key, entry)
+        return entry
+
+    def with_prefix(self, prefix: str) -> list[str]:
+        lo = bisect.bisect_left(self.keys, prefix)
+        hi = bisect.bisect_left(self.keys, prefix + "\U0010ffff")
+        return self.keys[lo:hi]
+
+
+class TTLCache:
+    """Async-safe in-process TTL cache, bounded per namespace.
+
+    Keys are spread over ``shards`` lock stripes so unrelated keys do not
+    contend on one lock. Inside each shard every namespace is an LRU
+    (OrderedDict ordered by last access); when a namespace exceeds its entry or
+    byte budget the least recently used entries are evicted. Budgets are split
+    evenly across shards, so limits are approximate by design.
+
+    Entries written by ``get_or_set`` / ``get_or_compute`` remember their
+    producer, so once past their soft TTL (but within the namespace hard TTL)
+    ``get`` serves the stale value immediately and refreshes in the background.
+
+    Nothing is removed on expiry by itself: reads drop hard-expired entries
+    they touch, and ``start_sweeper`` runs ``sweep`` periodically to reclaim
+    keys that are never read again (e.g. one-off ``events:`` queries).
+
+    Failures are remembered with ``set_negative``. ``get`` cannot tell such an
+    entry from a miss (both return None), so code that caches failures should
+    use ``lookup`` instead.
+
+    With an ``l2`` backend, writes to shared namespaces go through to L2 and
+    L1 misses fall back to it. An L1 copy is re-checked against L2 once it is
+    older than ``l2_sync_seconds``, which bounds how long a worker can serve a
+    value another worker already replaced or deleted.
+    """
+    def __init__(self, shards: int = 16,
+                 default_policy: NamespacePolicy | None = None,
+                 namespace_policies: dict[str, NamespacePolicy] | None = None,
+                 wait_timeout: float | None = 30.0,
+                 l2: CacheBackend | None = None,
+                 l2_sync_seconds: float = 5.0):
+        self._shards = [_Shard() for _ in range(max(1, shards))]
+        self._default_policy = default_policy or NamespacePolicy(max_entries=10000, max_bytes=64 * MB, negative_ttl=60)
+        self._namespace_policies = dict(namespace_policies or {})
+        self._resolved: dict[str, NamespacePolicy] = {}
+        # key -> producer task currently filling it (single-flight)
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._background: set[asyncio.Task] = set()
+        self._wait_timeout = wait_timeout
+        self._l2 = l2
+        self._l2_sync_seconds = l2_sync_seconds
+        self._stats: dict[str, _NamespaceStats] = {}
+        self._fn_stats: dict[str, _NamespaceStats] = {}
+        self._sweeper: asyncio.Task | None = None
+
+    def _shard(self, key: str) -> _Shard:
+        return self._shards[hash(key) % len(self._shards)]
+
+    def policy_for(self, ns: str) -> NamespacePolicy:
+        """Namespace policy with unset fields filled from the default policy."""
+        policy = self._resolved.get(ns)
+        if policy is None:
+            own = self._namespace_policies.get(ns, NamespacePolicy())
+            default = self._default_policy
+            policy = NamespacePolicy(**{
+                f.name: getattr(own, f.name) if getattr(own, f.name) is not None else getattr(default, f.name)
+                for f in fields(NamespacePolicy)
+            })
+            self._resolved[ns] = policy
+        return policy
+
+    def _ns_stats(self, ns: str) -> _NamespaceStats:
+        st = self._stats.get(ns)
+        if st is None:
+            st = self._stats[ns] = _NamespaceStats()
+        return st
+
+    def _evict(self, shard: _Shard, ns: str) -> None:
+        policy = self.policy_for(ns)
+        n = len(self._shards)
+        max_entries = max(1, policy.max_entries // n)
+        max_bytes = max(1, policy.max_bytes // n)
+        entries = shard.namespaces[ns]
+        while entries and (len(entries) > max_entries or shard.bytes[ns] > max_bytes):
+            key, victim = entries.popitem(last=False)
+            shard.unindex(ns, key, victim)
+            self._ns_stats(ns).evictions += 1
+
+    def _install(self, shard: _Shard, ns: str, key: str, entry: _Entry) -> None:
+        """Put an entry in its shard and enforce the namespace budget. Caller holds shard.lock."""
+        shard.add(ns, key, entry)
+        self._evict(shard, ns)
+
+    def _make_entry(self, ns: str, key: str, value: Any, expires_at: float, hard_expires_at: float,
+                    refresh: Callable[[], Any] | None = None, negative: bool = False,
+                    tags: tuple[str, ...] = (), encoded: bool = False) -> _Entry:
+        """Build an entry, encoding the value when the namespace is serialized.
+
+        ``encoded`` says ``value`` is already ``encode()`` bytes; they are kept
+        as they are in a serialized namespace and decoded otherwise.
+        """
+        policy = self.policy_for(ns)
+        if policy.tags:
+            tags = tuple(dict.fromkeys((*policy.tags, *tags)))
+        if encoded:
+            if policy.serialize:
+                entry = _Entry(expires_at, hard_expires_at, value, approx_size(key) + len(value), refresh, negative, tags)
+                entry.encoded = True
+                return entry
+            value = decode(value)
+        if policy.serialize:
+            try:
+                stored = encode(value)
+            except Exception as e:  # noqa: BLE001 - unpicklable value: keep it live rather than not at all
+                logger.warning("cache.encode failed key=%s err=%s", key[:80], e)
+            else:
+                entry = _Entry(expires_at, hard_expires_at, stored, approx_size(key) + len(stored), refresh, negative, tags)
+                entry.encoded = True
+                return entry
+        return _Entry(expires_at, hard_expires_at, value, approx_size(key) + approx_size(value), refresh, negative, tags)
+
+    def _is_shared(self, ns: str) -> bool:
+        return self._l2 is not None and bool(self.policy_for(ns).shared)
+
+    async def _sync_from_l2(self, key: str, ns: str, shard: _Shard) -> None:
+        """Refresh the L1 copy of a shared key from L2 if it is missing or due for a re-check.
+
+        A re-check that finds the same payload (by hash) only bumps ``synced_at``;
+        the value is decoded and reinstalled only when L2 holds something new.
+        """
+        entries = shard.namespaces.get(ns)
+        item = entries.get(key) if entries is not None else None
+        now = time.time()
+        if item is not None and now - item.synced_at < self._l2_sync_seconds:
+            return
+        try:
+            data = await self._l2.get(key)
+        except Exception as e:  # noqa: BLE001
+            logger.debug("cache.l2 get failed key=%s err=%s", key[:80], e)
+            return
+        async with shard.lock:
+            entries = shard.namespaces.get(ns)
+            current = entries.get(key) if entries is not None else None
+            if data is None:
+                # Gone from L2 (expired or invalidated by another worker).
+                if current is not None and current.synced_at:
+                    shard.pop(ns, key)
+                return
+            digest = hash(data)
+            if current is not None and current.l2_hash == digest:
+                # Unchanged since this copy was installed or written: just note the re-check.
+                current.synced_at = now
+                return
+            try:
+                value, negative, expires_at, hard_expires_at, tags = decode(data)
+            except Exception as e:  # noqa: BLE001 - includes payloads written by an older release
+                logger.debug("cache.l2 decode failed key=%s err=%s", key[:80], e)
+                return
+            entry = self._make_entry(ns, key, value, expires_at, hard_expires_at,
+                                     current.refresh if current is not None else None, negative, tags)
+            entry.synced_at = now
+            entry.l2_hash = digest
+            self._install(shard, ns, key, entry)
+
+    async def lookup(self, key: str, allow_stale: bool = False,
+                     refresh: Callable[[], Any] | None = None) -> CacheLookup:
+        """Look a key up, reporting hit/miss separately from the value.
+
+        Past the soft TTL an entry is still returned (and refreshed in the
+        background) when it has a refresher, or when the caller explicitly asks
+        for ``allow_stale`` (e.g. to serve last-good data during a cooldown).
+        ``refresh`` supplies a refresher for entries that arrived without one
+        (e.g. copied from L2).
+        """
+        if tracer.exporter is None:
+            return await self._lookup(key, allow_stale, refresh)
+        with tracer.span("cache.lookup", namespace=namespace_of(key)) as span:
+            found = await self._lookup(key, allow_stale, refresh)
+            span.set("cache.hit", found.hit)
+            if found.hit:
+                span.set("cache.stale", found.stale)
+                span.set("cache.negative", found.negative)
+            return found
+
+    async def _lookup(self, key: str, allow_stale: bool,
+                      refresh: Callable[[], Any] | None) -> CacheLookup:
+        ns = namespace_of(key)
+        shard = self._shard(key)
+        st = self._ns_stats(ns)
+        if self._is_shared(ns):
+            await self._sync_from_l2(key, ns, shard)
+        async with shard.lock:
+            entries = shard.namespaces.get(ns)
+            item = entries.get(key) if entries is not None else None
+            if item is None:
+                st.misses += 1
+                return MISS
+            now = time.time()
+            stale = item.expires_at < now
+            if item.refresh is None and refresh is not None and not item.negative:
+                item.refresh = refresh
+            if stale:
+                if item.hard_expires_at < now:
+                    shard.pop(ns, key)
+                    st.expirations += 1
+                    st.misses += 1
+                    return MISS
+                if item.refresh is not None:
+                    if not item.refreshing and item.retry_at <= now:
+                        item.refreshing = True
+                        self._schedule_refresh(key, item)
+                elif not allow_stale:
+                    st.misses += 1
+                    return MISS
+            entries.move_to_end(key)
+            if item.negative:
+                st.negative_hits += 1
+            elif stale:
+                st.stale_hits += 1
+            else:
+                st.hits += 1
+            value = item.value
+        # Decode outside the lock; the bytes are immutable.
+        return CacheLookup(True, decode(value) if item.encoded else value, item.negative, stale)
+
+    async def get(self, key: str, allow_stale: bool = False):
+        """Return the cached value, or None on a miss (see ``lookup``)."""
+        return (await self.lookup(key, allow_stale)).value
+
+    async def set_negative(self, key: str, ttl_seconds: int | None = None, value: Any = None,
+                           tags: tuple[str, ...] = ()):
+        """Remember a failure for ``key`` so callers stop hammering the upstream.
+
+        ``value`` is what ``lookup`` hands back (e.g. ``[]`` or ``None``); the TTL
+        defaults to the namespace ``negative_ttl``. Negative entries are never
+        served stale.
+        """
+        if ttl_seconds is None:
+            ttl_seconds = self.policy_for(namespace_of(key)).negative_ttl
+        await self.set(key, value, ttl_seconds, negative=True, tags=tags)
+
+    async def set(self, key: str, value: Any, ttl_seconds: int,
+                  refresh: Callable[[], Any] | None = None, negative: bool = False,
+                  tags: tuple[str, ...] = ()):
+        """Cache ``value`` for ``ttl_seconds`` (soft TTL; see NamespacePolicy.hard_ttl).
+
+        ``tags`` (plus the namespace's own) let ``invalidate_tag`` find the key later.
+        """
+        ns = namespace_of(key)
+        shard = self._shard(key)
+        policy = self.policy_for(ns)
+        now = time.time()
+        expires_at = now + ttl_seconds
+        hard_expires_at = expires_at if negative else max(expires_at, now + (policy.hard_ttl or 0))
+        entry = self._make_entry(ns, key, value, expires_at, hard_expires_at, refresh, negative, tags)
+        if entry.size > policy.max_bytes // len(self._shards):
+            # A single value larger than the shard budget would flush the whole namespace.
+            logger.debug("cache.skip oversized key=%s bytes=%s", key[:80], entry.size)
+            async with shard.lock:
+                shard.pop(ns, key)
+            return
+        self._ns_stats(ns).sets += 1
+        shared = self._is_shared(ns)
+        if shared:
+            entry.synced_at = now
+            try:
+                payload = encode((value, negative, expires_at, hard_expires_at, entry.tags))
+            except Exception as e:  # noqa: BLE001
+                logger.warning("cache.l2 encode failed key=%s err=%s", key[:80], e)
+                shared = False
+            else:
+                entry.l2_hash = hash(payload)
+        async with shard.lock:
+            self._install(shard, ns, key, entry)
+        if shared:
+            try:
+                await self._l2.set(key, payload, hard_expires_at - now)
+            except Exception as e:  # noqa: BLE001
+                logger.warning("cache.l2 set failed key=%s err=%s", key[:80], e)
+
+    def _schedule_refresh(self, key: str, item: _Entry) -> None:
+        async def _refresh():
+            try:
+                await self._single_flight(key, item.refresh)
+            except Exception as e:  # noqa: BLE001
+                await self._keep_stale(key)
+                logger.warning("cache.refresh failed key=%s err=%s", key[:80], e)
+            finally:
+                # A refresh that did not replace the entry (e.g. a TTL of 0: "do not cache this
+                # result") must not leave it marked as refreshing, or it is never refreshed again.
+                item.refreshing = False
+        # A fresh context: the refresh belongs to no request, so it must not inherit the
+        # triggering request's context variables (trace span, a streaming response's callback).
+        task = asyncio.get_running_loop().create_task(_refresh(), context=contextvars.Context())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _keep_stale(self, key: str) -> bool:
+        """After a failed refresh: keep serving the stale entry and back off before the next attempt.
+
+        Returns False when there is nothing servable left (a real miss), so
+        the caller remembers the failure as a negative entry instead.
+        """
+        ns = namespace_of(key)
+        shard = self._shard(key)
+        now = time.time()
+        async with shard.lock:
+            entries = shard.namespaces.get(ns)
+            item = entries.get(key) if entries is not None else None
+            if item is None or item.negative or item.hard_expires_at <= now:
+                return False
+            item.refreshing = False
+            item.retry_at = now + (self.policy_for(ns).negative_ttl or REFRESH_BACKOFF)
+            return True
+
+    async def delete(self, key: str) -> None:
+        ns = namespace_of(key)
+        shard = self._shard(key)
+        async with shard.lock:
+            shard.pop(ns, key)
+        if self._is_shared(ns):
+            try:
+                await self._l2.delete(key)
+            except Exception as e:  # noqa: BLE001
+                logger.warning("cache.l2 delete failed key=%s err=%s", key[:80], e)
+
+    async def _single_flight(self, key: str, run: Callable[[], Any]):
+        """Run ``run`` once per key no matter how many callers miss concurrently.
+
+        The first caller starts the producer as its own task; later callers for
+        the same key await that task (bounded by ``wait_timeout``) and receive
+        its result or re-raise its exception. Running the producer detached
+        means a cancelled first caller does not cancel everyone else's result.
+        In serialized namespaces each waiter gets its own copy of the result.
+        """
+        task = self._inflight.get(key)
+        if task is not None:
+            self._ns_stats(namespace_of(key)).coalesced += 1
+        if task is None:
+            task = asyncio.ensure_future(run())
+            self._inflight[key] = task
+
+            def _done(t: asyncio.Task):
+                if self._inflight.get(key) is t:
+                    del self._inflight[key]
+                if not t.cancelled():
+                    t.exception()  # mark retrieved; waiters re-raise it themselves
+            task.add_done_callback(_done)
+            return await asyncio.shield(task)
+        result = await asyncio.wait_for(asyncio.shield(task), self._wait_timeout)
+        if result is not None and self.policy_for(namespace_of(key)).serialize:
+            result = decode(encode(result))
+        return result
+
+    async def _timed(self, key: str, producer: Callable[[], Any]):
+        """Await a producer, recording its latency (and failures) for the key's namespace."""
+        st = self._ns_stats(namespace_of(key))
+        started = time.perf_counter()
+        try:
+            result = await producer()
+        except BaseException:
+            st.record_producer(time.perf_counter() - started, failed=True)
+            raise
+        st.record_producer(time.perf_counter() - started)
+        return result
+
+    async def get_or_set(self, key: str, ttl_seconds: int, producer: Callable[[], Any],
+                         negative_ttl: int | None = None, tags: tuple[str, ...] = ()):
+        """Return the cached value or produce, cache and return it.
+
+        A producer returning None is remembered as a negative entry (namespace
+        ``negative_ttl`` unless given), so the next call does not retry at once.
+        A failed background refresh keeps the stale value instead.
+        """
+        async def run():
+            value = await self._timed(key, producer)
+            if value is None:
+                if not await self._keep_stale(key):
+                    await self.set_negative(key, negative_ttl, tags=tags)
+            else:
+                await self.set(key, value, ttl_seconds, refresh=run, tags=tags)
             return value
 
-    async def set(self, key: str, value: Any, ttl_seconds: int):
-        async with self._lock:
-            self._store[key] = (time.time() + ttl_seconds, value)
+        found = await self.lookup(key, refresh=run)
+        if found.hit:
+            return found.value
+        return await self._single_flight(key, run)
+
+    async def get_or_compute(self, key: str, producer: Callable[[], Any], tags: tuple[str, ...] = (),
+                             allow_stale: bool = True):
+        """Like get_or_set, but the producer decides the TTL.
+
+        ``producer`` returns ``(value, ttl_seconds)``. A None value is stored as
+        a negative entry (``ttl_seconds`` None = namespace ``negative_ttl``); any
+        other value with a TTL of 0/None is returned without being cached.
+        Useful when success and failure deserve different lifetimes.
+        With ``allow_stale=False`` a stale entry is refreshed before returning
+        (the stale value is still returned if that refresh yields nothing).
+        """
+        async def run():
+            value, ttl_seconds = await self._timed(key, producer)
+            if value is None:
+                if not await self._keep_stale(key):
+                    await self.set_negative(key, ttl_seconds, tags=tags)
+            elif ttl_seconds:
+                await self.set(key, value, ttl_seconds, refresh=run, tags=tags)
+            return value
+
+        found = await self.lookup(key, refresh=run)
+        if found.hit and (allow_stale or not found.stale):
+            return found.value
+        value = await self._single_flight(key, run)
+        return found.value if value is None and found.hit else value
+
+    async def _invalidate(self, select: Callable[[_Shard], list[str]]) -> list[str]:
+        removed: list[str] = []
+        for shard in self._shards:
+            async with shard.lock:
+                for key in select(shard):
+                    if shard.pop(namespace_of(key), key) is not None:
+                        removed.append(key)
+        return removed
+
+    async def _l2_delete_many(self, keys: list[str]) -> None:
+        for key in keys:
+            if self._is_shared(namespace_of(key)):
+                try:
+                    await self._l2.delete(key)
+                except Exception as e:  # noqa: BLE001
+                    logger.warning("cache.l2 delete failed key=%s err=%s", key[:80], e)
+
+    async def invalidate_prefix(self, prefix: str) -> int:
+        """Drop every key starting with ``prefix`` (e.g. ``tennis_atp:`` or ``sportsdb:lookuptable``).
+
+        Uses each shard's sorted key index, so the cost is O(log n + matches).
+        The L2 is purged by prefix too, so other workers lose their copies at
+        their next L2 re-check (``l2_sync_seconds``).
+        """
+        removed = await self._invalidate(lambda shard: shard.with_prefix(prefix))
+        if self._l2 is not None:
+            try:
+                await self._l2.delete_prefix(prefix)
+            except Exception as e:  # noqa: BLE001
+                logger.warning("cache.l2 delete_prefix failed prefix=%s err=%s", prefix[:80], e)
+        logger.info("cache.invalidate prefix=%s removed=%s", prefix[:80], len(removed))
+        return len(removed)
+
+    async def invalidate_tag(self, tag: str) -> int:
+        """Drop every key carrying ``tag``, via the per-shard tag index.
+
+        Only keys this worker holds in L1 are removed from L2; tag whole
+        namespaces (NamespacePolicy.tags) when every worker must forget them.
+        """
+        removed = await self._invalidate(lambda shard: list(shard.tags.get(tag, ())))
+        await self._l2_delete_many(removed)
+        logger.info("cache.invalidate tag=%s removed=%s", tag, len(removed))
+        return len(removed)
+
+    async def sweep(self, budget: int = 512) -> int:
+        """Drop entries past their hard expiry; returns how many were removed.
+
+        Pops each shard's expiry heap until the first unexpired pair, so the
+        work is proportional to what expired (plus stale pairs) rather than to
+        the cache size. The shard lock is released every ``budget`` pops to
+        keep reads flowing during a large purge.
+        """
+        removed = 0
+        for shard in self._shards:
+            done = False
+            while not done:
+                async with shard.lock:
+                    now = time.time()
+                    heap = shard.expiry
+                    for _ in range(budget):
+                        if not heap or heap[0][0] > now:
+                            done = True
+                            break
+                        expires, key = heapq.heappop(heap)
+                        ns = namespace_of(key)
+                        entries = shard.namespaces.get(ns)
+                        item = entries.get(key) if entries is not None else None
+                        if item is not None and item.hard_expires_at == expires:
+                            shard.pop(ns, key)
+                            self._ns_stats(ns).expirations += 1
+                            removed += 1
+                    else:
+                        done = not heap
+                    live = sum(len(e) for e in shard.namespaces.values())
+                    if done and len(heap) > 2 * live + 1024:
+                        # Mostly superseded pairs (rewritten hot keys): rebuild from live entries.
+                        shard.expiry = [(item.hard_expires_at, key)
+                                        for entries in shard.namespaces.values() for key, item in entries.items()]
+                        heapq.heapify(shard.expiry)
+                if not done:
+                    await asyncio.sleep(0)
+        return removed
+
+    def start_sweeper(self, interval: float) -> None:
+        """Run ``sweep`` every ``interval`` seconds on the running loop (idempotent)."""
+        if self._sweeper is not None and not self._sweeper.done():
+            return
+
+        async def _loop():
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    removed = await self.sweep()
+                    if removed:
+                        logger.debug("cache.sweep removed=%s", removed)
+                except Exception as e:  # noqa: BLE001
+                    logger.warning("cache.sweep failed err=%s", e)
+        self._sweeper = asyncio.create_task(_loop())
+
+    async def close(self) -> None:
+        """Close the L2 backend (app shutdown); L1 entries stay usable."""
+        if self._l2 is not None:
+            try:
+                await self._l2.close()
+            except Exception as e:  # noqa: BLE001
+                logger.warning("cache.l2 close failed err=%s", e)
+
+    async def stop_sweeper(self) -> None:
+        if self._sweeper is None:
+            return
+        self._sweeper.cancel()
+        try:
+            await self._sweeper
+        except asyncio.CancelledError:
+            pass
+        self._sweeper = None
+
+    def export_entries(self, namespaces: set[str] | None = None) -> list[tuple]:
+        """Live, non-negative entries as (key, stored, encoded, expires_at, hard_expires_at, tags).
+
+        ``stored`` is the entry's value as held: ``encode()`` bytes when
+        ``encoded`` (serialized namespaces), else the live object. Nothing is
+        decoded, so this stays cheap on the event loop and a consumer can cap
+        on encoded size. Most recently used first, so a size-capped consumer
+        (the snapshot writer) keeps the hottest data. Runs without awaiting,
+        so it sees a consistent view without taking the shard locks.
+        """
+        now = time.time()
+        per_list = []
+        for shard in self._shards:
+            for ns, entries in shard.namespaces.items():
+                if namespaces is not None and ns not in namespaces:
+                    continue
+                per_list.append([
+                    (key, item.value, item.encoded, item.expires_at, item.hard_expires_at, item.tags)
+                    for key, item in reversed(entries.items())
+                    if not item.negative and item.hard_expires_at >= now
+                ])
+        # Interleave the per-shard MRU lists; there is no global recency order.
+        return [row for rows in zip_longest(*per_list) for row in rows if row is not None]
+
+    async def restore(self, key: str, value: Any, negative: bool, expires_at: float, hard_expires_at: float,
+                      tags: tuple[str, ...] = (), encoded: bool = False) -> None:
+        """Install an entry with its original absolute expiry (L1 only; used when loading snapshots).
+
+        ``encoded``: ``value`` is ``encode()`` bytes (see ``_make_entry``).
+        """
+        if hard_expires_at < time.time():
+            return
+        ns = namespace_of(key)
+        shard = self._shard(key)
+        entry = self._make_entry(ns, key, value, expires_at, hard_expires_at, None, negative, tags, encoded)
+        async with shard.lock:
+            self._install(shard, ns, key, entry)
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        """Per-namespace counters plus current entry count and approximate bytes."""
+        entries: dict[str, int] = {}
+        nbytes: dict[str, int] = {}
+        for shard in self._shards:
+            for ns, items in shard.namespaces.items():
+                entries[ns] = entries.get(ns, 0) + len(items)
+                nbytes[ns] = nbytes.get(ns, 0) + shard.bytes.get(ns, 0)
+        out: dict[str, dict[str, Any]] = {}
+        for ns in sorted(set(self._stats) | set(entries)):
+            st = self._ns_stats(ns)
+            lookups = st.hits + st.stale_hits + st.negative_hits + st.misses
+            policy = self.policy_for(ns)
+            out[ns] = {
+                "entries": entries.get(ns, 0),
+                "bytes": nbytes.get(ns, 0),
+                "max_entries": policy.max_entries,
+                "max_bytes": policy.max_bytes,
+                "hits": st.hits,
+                "stale_hits": st.stale_hits,
+                "negative_hits": st.negative_hits,
+                "misses": st.misses,
+                "hit_ratio": round((lookups - st.misses) / lookups, 4) if lookups else None,
+                "sets": st.sets,
+                "evictions": st.evictions,
+                "expirations": st.expirations,
+                "coalesced": st.coalesced,
+                "produced": st.produced,
+                "producer_errors": st.producer_errors,
+                "producer_avg_ms": round(1000 * st.producer_seconds / st.produced, 1) if st.produced else None,
+                "producer_max_ms": round(1000 * st.producer_max_seconds, 1) if st.produced else None,
+            }
+        return out
+
+    def function_stats(self) -> dict[str, dict[str, Any]]:
+        """Per-function counters for ``@cached`` functions, keyed by module.qualname."""
+        out: dict[str, dict[str, Any]] = {}
+        for name, st in sorted(self._fn_stats.items()):
+            calls = st.hits + st.misses
+            out[name] = {
+                "calls": calls,
+                "hits": st.hits,
+                "misses": st.misses,
+                "hit_ratio": round(st.hits / calls, 4) if calls else None,
+                "errors": st.producer_errors,
+                "avg_ms": round(1000 * st.producer_seconds / st.produced, 1) if st.produced else None,
+                "max_ms": round(1000 * st.producer_max_seconds, 1) if st.produced else None,
+            }
+        return out
+
+    def __len__(self) -> int:
+        return sum(len(e) for s in self._shards for e in s.namespaces.values())
+
+
+cache = TTLCache(
+    shards=settings.CACHE_SHARDS,
+    default_policy=NamespacePolicy(
+        max_entries=settings.CACHE_MAX_ENTRIES,
+        max_bytes=settings.CACHE_MAX_BYTES,
+        negative_ttl=settings.CACHE_NEGATIVE_TTL,
+        shared=False,
+    ),
+    namespace_policies=NAMESPACE_POLICIES,
+    wait_timeout=settings.CACHE_SINGLEFLIGHT_TIMEOUT,
+    l2=backend_from_url(settings.CACHE_L2_URL),
+    l2_sync_seconds=settings.CACHE_L2_SYNC_SECONDS,
+)
+
+
+def _key_part(part: Any) -> str:
+    if isinstance(part, str):
+        return part
+    return json.dumps(part, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def make_key(namespace: str, *parts: Any) -> str:
+    """Canonical key ``namespace:part:...``; non-string parts are JSON with sorted keys.
+
+    ``{"l": 1, "s": "2024"}`` and ``{"s": "2024", "l": 1}`` give the same key,
+    which ``f"{params}"`` does not guarantee.
+    """
+    return ":".join((namespace, *map(_key_part, parts)))
+
+
+class Uncached(Exception):
+    """Raise from a ``@cached`` function to hand ``value`` back without caching anything.
+
+    For failures that say nothing about the key itself (e.g. the request was
+    throttled locally and never sent): the caller gets ``value`` (None means
+    ``negative_value``) and the next call tries again instead of hitting a
+    negative entry.
+    """
+
+    def __init__(self, value: Any = None):
+        super().__init__(value)
+        self.value = value
+
+
+def cached(namespace: str, ttl: int | Callable[..., int | None], negative_ttl: int | None = None,
+           key: Callable[..., Any] | None = None, negative_value: Any = None,
+           tags: tuple[str, ...] = (), using: TTLCache | None = None):
+    """Cache an async function's results in ``namespace``.
+
+    The key is built from the call arguments (all of them, or whatever ``key``
+    returns when called with the same arguments; return a tuple for several
+    parts). Calls go through ``get_or_compute``, so concurrent misses share one
+    call and, within the namespace ``hard_ttl``, stale results are served while
+    a refresh runs.
+
+    ``ttl`` is seconds, or a callable ``ttl(value, **arguments)`` returning
+    seconds for a given result (0/None = do not cache it). A None result is
+    cached as a failure for ``negative_ttl`` (default: the namespace's) and the
+    caller receives a copy of ``negative_value`` instead. Exceptions propagate
+    and are not cached; raise ``Uncached`` to return a value without caching it.
+    """
+    def decorate(fn: Callable[..., Any]):
+        sig = inspect.signature(fn)
+        name = f"{fn.__module__}.{fn.__qualname__}"
+
+        def key_for(args: tuple, kwargs: dict) -> tuple[str, dict[str, Any]]:
+            bound = sig.bind(*args, **kwargs)
+            bound.apply_defaults()
+            if key is None:
+                parts = tuple(bound.arguments.values())
+            else:
+                parts = key(*args, **kwargs)
+                if not isinstance(parts, tuple):
+                    parts = (parts,)
+            return make_key(namespace, *parts), bound.arguments
+
+        async def call(args: tuple, kwargs: dict, allow_stale: bool = True):
+            target = using or cache
+            st = target._fn_stats.get(name)
+            if st is None:
+                st = target._fn_stats[name] = _NamespaceStats()
+            cache_key, arguments = key_for(args, kwargs)
+            ran = False
+
+            async def producer():
+                nonlocal ran
+                ran = True
+                started = time.perf_counter()
+                try:
+                    value = await fn(*args, **kwargs)
+                except BaseException:
+                    st.record_producer(time.perf_counter() - started, failed=True)
+                    raise
+                st.record_producer(time.perf_counter() - started)
+                if value is None:
+                    return None, negative_ttl
+                return value, ttl(value, **arguments) if callable(ttl) else ttl
+
+            try:
+                value = await target.get_or_compute(cache_key, producer, tags=tags, allow_stale=allow_stale)
+            except Uncached as skip:
+                value = skip.value
+            if ran:
+                st.misses += 1
+            else:
+                st.hits += 1
+            return copy.copy(negative_value) if value is None else value
 
-    async def get_or_set(self, key: str, ttl_seconds: int, producer: Callable[[], Any]):
-        existing = await self.get(key)
-        if existing is not None:
-            return existing
-        value = await producer()
-        await self.set(key, value, ttl_seconds)
-        return value
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            return await call(args, kwargs)
 
-cache = TTLCache()
\ No newline at end of file
+        # fn.fresh(*args) -> like fn(*args), but a stale result is refreshed first instead of served.
+        wrapper.fresh = lambda *args, **kwargs: call(args, kwargs, allow_stale=False)  # type: ignore[attr-defined]
+        # For invalidation: fn.cache_key(*args) -> the key a call would use.
+        wrapper.cache_key = lambda *args, **kwargs: key_for(args, kwargs)[0]  # type: ignore[attr-defined]
+        return wrapper
+    return decorate
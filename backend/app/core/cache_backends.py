@@ -0,0 +1,232 @@
+"""Shared (L2) backends for ``app.core.cache.TTLCache``.
+
+Each gunicorn worker keeps its own in-process L1; an L2 backend lets workers
+share upstream results and cooldown flags. Backends only move opaque bytes
+with a TTL; encoding lives in ``encode``/``decode`` so every backend stores the
+same compact format.
+"""
+from __future__ import annotations
+import re
+import time
+import zlib
+import pickle
+import asyncio
+import sqlite3
+import logging
+import threading
+from abc import ABC, abstractmethod
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# Payloads above this size are zlib-compressed; Wikipedia HTML and event lists shrink 4-8x.
+COMPRESS_MIN_BYTES = 1024
+_RAW = b"p"
+_ZLIB = b"z"
+SQLITE_PURGE_INTERVAL = 300.0  # seconds between sweeps of expired rows in the SQLite backend
+
+
+def encode(value: Any) -> bytes:
+    """Serialize a cache value compactly (pickle, zlib above COMPRESS_MIN_BYTES).
+
+    Pickle is fine here because only this application writes to the backend;
+    never point CACHE_L2_URL at a store other clients can write.
+    """
+    raw = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    if len(raw) >= COMPRESS_MIN_BYTES:
+        return _ZLIB + zlib.compress(raw, 6)
+    return _RAW + raw
+
+
+def decode(data: bytes) -> Any:
+    tag, body = data[:1], data[1:]
+    if tag == _ZLIB:
+        body = zlib.decompress(body)
+    return pickle.loads(body)
+
+
+class CacheBackend(ABC):
+    """Minimal async key/value interface an L2 must provide."""
+
+    @abstractmethod
+    async def get(self, key: str) -> bytes | None: ...
+
+    @abstractmethod
+    async def set(self, key: str, data: bytes, ttl_seconds: float) -> None: ...
+
+    @abstractmethod
+    async def delete(self, key: str) -> None: ...
+
+    @abstractmethod
+    async def delete_prefix(self, prefix: str) -> int:
+        """Delete every key starting with ``prefix``; returns how many were removed."""
+
+    async def close(self) -> None:
+        return None
+
+
+class MemoryBackend(CacheBackend):
+    """Process-local backend; handy for tests and single-worker development."""
+
+    def __init__(self):
+        self._data: dict[str, tuple[float, bytes]] = {}
+
+    async def get(self, key: str) -> bytes | None:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        if item[0] < time.time():
+            self._data.pop(key, None)
+            return None
+        return item[1]
+
+    async def set(self, key: str, data: bytes, ttl_seconds: float) -> None:
+        self._data[key] = (time.time() + ttl_seconds, data)
+
+    async def delete(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    async def delete_prefix(self, prefix: str) -> int:
+        keys = [k for k in self._data if k.startswith(prefix)]
+        for k in keys:
+            del self._data[k]
+        return len(keys)
+
+
+class SQLiteBackend(CacheBackend):
+    """Local-file backend shared by all workers on one host (no Redis needed).
+
+    SQLite calls are blocking, so they run in the default thread pool; one
+    connection is shared and serialized with a lock. Expired rows are only
+    removed when read, so writes also purge every expired row at most once
+    per ``purge_interval`` seconds, keeping keys nobody reads again from
+    growing the file forever.
+    """
+
+    def __init__(self, path: str, purge_interval: float = SQLITE_PURGE_INTERVAL):
+        self._path = path
+        self._local = None
+        self._lock = threading.Lock()
+        self._purge_interval = purge_interval
+        self._purged_at = time.time()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS l2_cache ("
+                " key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS l2_cache_expires ON l2_cache (expires_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self._path, timeout=5.0, isolation_level=None, check_same_thread=False)
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._local is None:
+            self._local = self._connect()
+        return self._local
+
+    def _get(self, key: str) -> bytes | None:
+        with self._lock:
+            conn = self._conn()
+            row = conn.execute("SELECT value, expires_at FROM l2_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] < time.time():
+                conn.execute("DELETE FROM l2_cache WHERE key = ?", (key,))
+                return None
+            return row[0]
+
+    def _set(self, key: str, data: bytes, ttl_seconds: float) -> None:
+        now = time.time()
+        with self._lock:
+            conn = self._conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO l2_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, data, now + ttl_seconds),
+            )
+            if now - self._purged_at >= self._purge_interval:
+                self._purged_at = now
+                purged = conn.execute("DELETE FROM l2_cache WHERE expires_at < ?", (now,)).rowcount
+                if purged:
+                    logger.debug("cache.l2 purged expired=%s", purged)
+
+    def _delete(self, key: str) -> None:
+        with self._lock:
+            self._conn().execute("DELETE FROM l2_cache WHERE key = ?", (key,))
+
+    def _delete_prefix(self, prefix: str) -> int:
+        # Range on the primary key instead of LIKE so the index is used and '%'/'_' need no escaping.
+        with self._lock:
+            cur = self._conn().execute(
+                "DELETE FROM l2_cache WHERE key >= ? AND key < ?", (prefix, prefix + "\U0010ffff")
+            )
+            return cur.rowcount
+
+    async def get(self, key: str) -> bytes | None:
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, data: bytes, ttl_seconds: float) -> None:
+        await asyncio.to_thread(self._set, key, data, ttl_seconds)
+
+    async def delete(self, key: str) -> None:
+        await asyncio.to_thread(self._delete, key)
+
+    async def delete_prefix(self, prefix: str) -> int:
+        return await asyncio.to_thread(self._delete_prefix, prefix)
+
+    async def close(self) -> None:
+        with self._lock:
+            if self._local is not None:
+                self._local.close()
+                self._local = None
+
+
+class RedisBackend(CacheBackend):
+    """Redis (or any RESP-compatible server: KeyDB, Valkey, Dragonfly) backend."""
+
+    def __init__(self, url: str, prefix: str = "playaxis:"):
+        try:
+            import redis.asyncio as redis_asyncio  # optional dependency
+        except ImportError as exc:  # pragma: no cover - depends on deployment
+            raise RuntimeError("CACHE_L2_URL points at Redis but the 'redis' package is not installed") from exc
+        self._client = redis_asyncio.from_url(url)
+        self._prefix = prefix
+
+    async def get(self, key: str) -> bytes | None:
+        return await self._client.get(self._prefix + key)
+
+    async def set(self, key: str, data: bytes, ttl_seconds: float) -> None:
+        await self._client.set(self._prefix + key, data, px=max(1, int(ttl_seconds * 1000)))
+
+    async def delete(self, key: str) -> None:
+        await self._client.delete(self._prefix + key)
+
+    async def delete_prefix(self, prefix: str) -> int:
+        # SCAN (not KEYS) so a large keyspace does not block the server; glob metacharacters are escaped.
+        pattern = re.sub(r"([*?\[\]\\])", r"\\\1", self._prefix + prefix) + "*"
+        removed = 0
+        batch: list[bytes] = []
+        async for k in self._client.scan_iter(match=pattern, count=500):
+            batch.append(k)
+            if len(batch) >= 500:
+                removed += await self._client.delete(*batch)
+                batch.clear()
+        if batch:
+            removed += await self._client.delete(*batch)
+        return removed
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+def backend_from_url(url: str | None) -> CacheBackend | None:
+    """Build a backend from CACHE_L2_URL (redis://, rediss://, sqlite:///path, memory://)."""
+    if not url:
+        return None
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    if url.startswith("sqlite:///"):
+        return SQLiteBackend(url[len("sqlite:///"):])
+    if url.startswith("memory://"):
+        return MemoryBackend()
+    raise ValueError(f"Unsupported CACHE_L2_URL scheme: {url}")
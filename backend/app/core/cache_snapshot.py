@@ -0,0 +1,149 @@
+"""Periodic on-disk snapshots of selected cache namespaces.
+
+A redeploy otherwise starts with an empty cache and the first users pay for
+every cold SerpApi / Nominatim / Wikipedia call at once. The snapshot is a
+small SQLite file written atomically (temp file + rename) and reloaded at
+startup with each entry's original absolute expiry, so restored data is never
+served for longer than it would have been without the restart.
+"""
+from __future__ import annotations
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import logging
+import tempfile
+from typing import Callable
+
+from app.core.cache import TTLCache, namespace_of
+from app.core.cache_backends import decode, encode
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever cached value shapes change (schemas, tuple layouts); older snapshots are then ignored.
+SNAPSHOT_VERSION = 4
+
+
+def _write(path: str, rows: list[tuple], max_bytes: int) -> tuple[int, int]:
+    """Write exported entries, stopping at ``max_bytes`` of encoded data.
+
+    Serialized entries are written as the bytes the cache already holds; only
+    live values are encoded here (in the worker thread).
+    """
+    # A temp file per writer: several workers may checkpoint at once, and each rename is atomic.
+    fd, tmp = tempfile.mkstemp(prefix=f"{os.path.basename(path)}.", suffix=".tmp", dir=os.path.dirname(path) or ".")
+    os.close(fd)
+    conn = sqlite3.connect(tmp)
+    written = total = 0
+    try:
+        conn.execute("CREATE TABLE meta (version INTEGER NOT NULL, created_at REAL NOT NULL)")
+        conn.execute("CREATE TABLE entries (key TEXT PRIMARY KEY, data BLOB NOT NULL, expires_at REAL NOT NULL, "
+                     "hard_expires_at REAL NOT NULL, tags TEXT NOT NULL)")
+        conn.execute("INSERT INTO meta VALUES (?, ?)", (SNAPSHOT_VERSION, time.time()))
+        for key, stored, encoded, expires_at, hard_expires_at, tags in rows:
+            try:
+                data = stored if encoded else encode(stored)
+            except Exception as e:  # noqa: BLE001 - unpicklable values are simply skipped
+                logger.debug("cache.snapshot skip key=%s err=%s", key[:80], e)
+                continue
+            if total + len(data) > max_bytes:
+                break
+            conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                         (key, data, expires_at, hard_expires_at, json.dumps(list(tags))))
+            total += len(data)
+            written += 1
+        conn.commit()
+        conn.close()
+        os.replace(tmp, path)
+    except BaseException:
+        conn.close()
+        os.remove(tmp)
+        raise
+    return written, total
+
+
+def _read(path: str, keep_encoded: Callable[[str], bool]) -> list[tuple]:
+    """Rows as (key, value, encoded, expires_at, hard_expires_at, tags); ``keep_encoded(key)`` skips decoding."""
+    if not os.path.exists(path):
+        return []
+    conn = sqlite3.connect(path)
+    try:
+        row = conn.execute("SELECT version FROM meta").fetchone()
+        if not row or row[0] != SNAPSHOT_VERSION:
+            logger.info("cache.snapshot ignoring %s (version %s != %s)", path, row[0] if row else None, SNAPSHOT_VERSION)
+            return []
+        out = []
+        for key, data, expires_at, hard_expires_at, tags in conn.execute(
+            "SELECT key, data, expires_at, hard_expires_at, tags FROM entries WHERE hard_expires_at > ?", (time.time(),)
+        ):
+            encoded = keep_encoded(key)
+            try:
+                value = data if encoded else decode(data)
+            except Exception as e:  # noqa: BLE001 - e.g. a class moved since the snapshot
+                logger.debug("cache.snapshot undecodable key=%s err=%s", key[:80], e)
+                continue
+            out.append((key, value, encoded, expires_at, hard_expires_at, tuple(json.loads(tags))))
+        return out
+    except sqlite3.DatabaseError as e:
+        logger.warning("cache.snapshot unreadable %s err=%s", path, e)
+        return []
+    finally:
+        conn.close()
+
+
+async def save_snapshot(cache: TTLCache, path: str, namespaces: set[str], max_bytes: int) -> int:
+    rows = cache.export_entries(namespaces)
+    written, total = await asyncio.to_thread(_write, path, rows, max_bytes)
+    logger.info("cache.snapshot saved entries=%s bytes=%s path=%s", written, total, path)
+    return written
+
+
+async def load_snapshot(cache: TTLCache, path: str) -> int:
+    # Serialized namespaces take the stored bytes as they are; the rest are decoded in the thread.
+    rows = await asyncio.to_thread(_read, path, lambda key: bool(cache.policy_for(namespace_of(key)).serialize))
+    for key, value, encoded, expires_at, hard_expires_at, tags in rows:
+        await cache.restore(key, value, False, expires_at, hard_expires_at, tags, encoded=encoded)
+    logger.info("cache.snapshot loaded entries=%s path=%s", len(rows), path)
+    return len(rows)
+
+
+class CacheSnapshotter:
+    """Loads a snapshot at startup, then checkpoints every ``interval`` seconds and on shutdown."""
+
+    def __init__(self, cache: TTLCache, path: str, namespaces: set[str],
+                 interval: float = 300.0, max_bytes: int = 64 * 1024 * 1024):
+        self.cache = cache
+        self.path = path
+        self.namespaces = namespaces
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self._task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        try:
+            await load_snapshot(self.cache, self.path)
+        except Exception as e:  # noqa: BLE001 - a bad snapshot must never block startup
+            logger.warning("cache.snapshot load failed path=%s err=%s", self.path, e)
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await save_snapshot(self.cache, self.path, self.namespaces, self.max_bytes)
+            except Exception as e:  # noqa: BLE001
+                logger.warning("cache.snapshot save failed path=%s err=%s", self.path, e)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await save_snapshot(self.cache, self.path, self.namespaces, self.max_bytes)
+        except Exception as e:  # noqa: BLE001
+            logger.warning("cache.snapshot final save failed path=%s err=%s", self.path, e)
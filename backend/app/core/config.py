@@ -25,6 +25,53 @@ class Settings(BaseSettings):
     STANDINGS_CACHE_TTL_MIN: int = 30
     FORCE_REFRESH_STANDINGS: int = 0
 
+    # In-process cache (app/core/cache.py); per-namespace overrides live in NAMESPACE_POLICIES
+    CACHE_SHARDS: int = 16
+    CACHE_MAX_ENTRIES: int = 10000
+    CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    CACHE_NEGATIVE_TTL: int = 60  # default lifetime of a cached failure
+    CACHE_SINGLEFLIGHT_TIMEOUT: float = 30.0  # max seconds a coalesced caller waits on another's producer
+    # Optional shared L2 for multi-worker deployments: redis://host:6379/0, sqlite:////tmp/playaxis-l2.db, memory://
+    CACHE_L2_URL: str | None = None
+    CACHE_L2_SYNC_SECONDS: float = 5.0  # max age of an L1 copy before it is re-checked against L2
+    CACHE_SWEEP_INTERVAL: float = 30.0  # seconds between background passes that drop hard-expired entries
+    # Warm-restart snapshot (disabled unless a path is set, e.g. /data/cache-snapshot.db)
+    CACHE_SNAPSHOT_PATH: str | None = None
+    CACHE_SNAPSHOT_INTERVAL: int = 300
+    CACHE_SNAPSHOT_MAX_BYTES: int = 64 * 1024 * 1024
+    CACHE_SNAPSHOT_NAMESPACES: str = "revgeo,geocode,fwdgeo,latlon,rawfetch,sportsdb,events,scrape_ev"
+
+    # Pooled upstream HTTP clients (app/core/http.py); HTTP/2 also needs the optional 'h2' package
+    HTTP_HTTP2: bool = False
+    # Per-upstream rate limit overrides on top of RATE_LIMITS in app/core/http.py, as JSON, e.g.
+    # {"nominatim": {"rate": 1, "max_in_flight": 1, "max_wait": 10}, "serpapi": {"rate": 2}}
+    HTTP_RATE_LIMITS: dict[str, dict[str, float]] = {}
+    # Circuit breaker overrides on top of BREAKERS in app/core/http.py, e.g. {"serpapi": {"max_open_seconds": 43200}}
+    HTTP_BREAKERS: dict[str, dict[str, float]] = {}
+    # Process-wide retry/hedge budget: extra attempts allowed per opted-in request, plus a floor per second
+    HTTP_RETRY_BUDGET_RATIO: float = 0.2
+    HTTP_RETRY_BUDGET_MIN_PER_SECOND: float = 1.0
+    # Record/replay fixtures (app/core/fixtures.py): "record" saves upstream responses, "replay" serves them offline
+    HTTP_FIXTURES: str | None = None
+    HTTP_FIXTURES_DIR: str = "fixtures/http"
+    HTTP_FIXTURES_LATENCY_SCALE: float = 0.0  # 1.0 replays recorded latencies; 0 answers immediately
+    HTTP_FIXTURES_LATENCY: float = 0.0  # fixed seconds added to every replayed response
+    # Injected failure rates while replaying, e.g. {"timeout": 0.02, "503": 0.05, "429": 0.01}
+    HTTP_FIXTURES_ERRORS: dict[str, float] = {}
+    HTTP_FIXTURES_SEED: int | None = None
+
+    # Request tracing (app/core/tracing.py): "jsonl:/path/traces.jsonl" or "log"; unset = off
+    TRACING_EXPORTER: str | None = None
+    TRACING_SAMPLE_RATE: float = 1.0  # share of new traces recorded
+
+    # Monthly credit allowances for metered upstreams (app/services/quota.py), as JSON, e.g.
+    # {"serpapi": 5000, "scraperapi": 100000}; upstreams without one are counted but not planned
+    QUOTA_MONTHLY_CREDITS: dict[str, int] = {}
+    QUOTA_FLUSH_INTERVAL: float = 60.0  # seconds between ledger writes/reloads
+
+    # Shared secret for /api/v1/admin/* (sent as X-Admin-Token); admin routes answer 403 while unset
+    ADMIN_API_TOKEN: str | None = None
+
     # API URLs
     WEATHER_API_URL: str = "https://api.open-meteo.com/v1"
     TWITCH_API_URL: str = "https://api.twitch.tv/helix/"
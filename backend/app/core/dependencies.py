@@ -1,3 +1,5 @@
+import secrets
+
 from fastapi import Depends, HTTPException, status, Header
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
@@ -50,4 +52,11 @@ def get_optional_user(
     except JWTError:
         return None
     user = get_user_by_email(db, email=user_id)
-    return user
\ No newline at end of file
+    return user
+
+
+def require_admin(x_admin_token: str | None = Header(None)) -> None:
+    """Guard for operational endpoints; compares X-Admin-Token against ADMIN_API_TOKEN."""
+    expected = settings.ADMIN_API_TOKEN
+    if not expected or not x_admin_token or not secrets.compare_digest(x_admin_token, expected):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin token required")
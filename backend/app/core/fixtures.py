@@ -0,0 +1,279 @@
+"""Record/replay fixtures for the shared HTTP clients, for offline runs.
+
+With ``HTTP_FIXTURES=record`` every pooled client still talks to its real
+upstream, but responses are also written to a per-upstream corpus,
+``HTTP_FIXTURES_DIR/<upstream>.jsonl.gz`` (one gzipped JSON line per
+request), when the clients close at shutdown. Each worker merges its own
+recordings into the file under a lock, so several can record at once. With ``HTTP_FIXTURES=replay``
+nothing leaves the process: responses come from the corpus, and a request
+with no recording fails with ``FixtureMissing``.
+
+Requests match on a canonical key: method, scheme, host, path and the
+sorted query string. Credentials are left out: ``api_key``,
+``client_secret``, ... are dropped from the query and TheSportsDB's key in
+the path becomes ``REDACTED``. Nothing secret reaches the disk, and a corpus
+replays with any (placeholder) keys. Headers are not part of the key, but
+a replayed If-None-Match equal to the recorded ETag gets a 304.
+
+Replays are immediate by default. ``HTTP_FIXTURES_LATENCY_SCALE=1`` replays
+recorded timings, ``HTTP_FIXTURES_LATENCY`` adds a fixed delay, and
+``HTTP_FIXTURES_ERRORS`` injects failures at the given rates, e.g.
+``{"timeout": 0.02, "connect": 0.01, "503": 0.05, "429": 0.01}``. Injected
+failures go through the breakers and retries like real ones.
+"""
+from __future__ import annotations
+import os
+import re
+import gzip
+import json
+import time
+import base64
+import random
+import asyncio
+import logging
+import tempfile
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Iterator
+from urllib.parse import urlencode
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows; concurrent recording is then unsafe
+    fcntl = None  # type: ignore[assignment]
+
+import httpx
+
+from app.core.ratelimit import UpstreamThrottled
+
+logger = logging.getLogger(__name__)
+
+RECORD, REPLAY = "record", "replay"
+
+REDACTED = "REDACTED"
+REDACTED_PARAMS = {"api_key", "apikey", "key", "token", "access_token", "client_id", "client_secret"}
+# TheSportsDB puts its key in the path: /api/v1/json/<key>/eventsday.php
+REDACTED_PATHS = [re.compile(r"(/api/v\d+/json/)[^/]+(?=/)")]
+# Body-framing and per-client headers that must not be replayed; bodies are stored decoded.
+DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection", "keep-alive", "set-cookie"}
+
+
+class FixtureMissing(UpstreamThrottled):
+    """Replay mode found no recording for the request; nothing was sent."""
+
+
+@dataclass(frozen=True)
+class FixturePolicy:
+    mode: str | None = None  # None, "record" or "replay"
+    directory: str = "fixtures/http"
+    latency_scale: float = 0.0  # multiplier on recorded latency (0 = full speed)
+    latency: float = 0.0  # fixed seconds added to every replay
+    errors: dict[str, float] = field(default_factory=dict)  # kind -> rate; kinds: timeout, connect, or a status code
+    seed: int | None = None
+
+
+def redact_path(path: str) -> str:
+    """URL path with credentials (REDACTED_PATHS) replaced; also used for trace spans."""
+    for pattern in REDACTED_PATHS:
+        path = pattern.sub(r"\1" + REDACTED, path)
+    return path
+
+
+def _redact_url(url: httpx.URL) -> tuple[str, list[tuple[str, str]]]:
+    path = redact_path(url.path)
+    params = sorted((k, v) for k, v in url.params.multi_items() if k.lower() not in REDACTED_PARAMS)
+    return path, params
+
+
+def canonical_key(method: str, url: httpx.URL) -> str:
+    """Match key for a request: method + URL with sorted query params, credentials removed."""
+    path, params = _redact_url(url)
+    port = f":{url.port}" if url.port else ""
+    query = f"?{urlencode(params)}" if params else ""
+    return f"{method.upper()} {url.scheme}://{url.host}{port}{path}{query}"
+
+
+def _entry(key: str, response: httpx.Response, body: bytes, seconds: float) -> dict[str, Any]:
+    entry: dict[str, Any] = {
+        "key": key,
+        "status": response.status_code,
+        "headers": [[k, v] for k, v in response.headers.multi_items() if k.lower() not in DROPPED_HEADERS],
+        "elapsed": round(seconds, 4),
+    }
+    try:
+        entry["text"] = body.decode("utf-8")
+    except UnicodeDecodeError:
+        entry["base64"] = base64.b64encode(body).decode("ascii")
+    return entry
+
+
+def _entry_body(entry: dict[str, Any]) -> bytes:
+    if "base64" in entry:
+        return base64.b64decode(entry["base64"])
+    return entry.get("text", "").encode("utf-8")
+
+
+@contextmanager
+def _locked(path: str) -> Iterator[None]:
+    """Exclusive advisory lock on ``path`` across processes (no-op where fcntl is unavailable)."""
+    with open(path, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class FixtureCorpus:
+    """Recordings for one upstream, loaded from and saved to a gzipped JSON-lines file."""
+
+    def __init__(self, name: str, path: str):
+        self.name = name
+        self.path = path
+        self._entries: dict[str, dict[str, Any]] | None = None
+        self._pending: dict[str, dict[str, Any]] = {}  # recorded by this process, not yet saved
+        self.recorded = 0
+        self.replayed = 0
+        self.misses = 0
+        self.injected = 0
+
+    def _read(self) -> dict[str, dict[str, Any]]:
+        entries: dict[str, dict[str, Any]] = {}
+        try:
+            with gzip.open(self.path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        entries[entry["key"]] = entry
+        except FileNotFoundError:
+            pass
+        except Exception as e:  # noqa: BLE001 - a corrupt corpus behaves like an empty one
+            logger.warning("fixtures.load failed upstream=%s path=%s err=%s", self.name, self.path, e)
+        return entries
+
+    def _load(self) -> dict[str, dict[str, Any]]:
+        if self._entries is None:
+            self._entries = self._read()
+        return self._entries
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        return self._load().get(key)
+
+    def put(self, entry: dict[str, Any]) -> None:
+        self._load()[entry["key"]] = entry
+        self._pending[entry["key"]] = entry
+        self.recorded += 1
+
+    def save(self) -> None:
+        """Merge this process's new recordings into the file on disk, if there are any.
+
+        Every worker records into its own copy, so the file is re-read under an
+        exclusive lock and only this worker's recordings are laid over it; a
+        worker closing last no longer drops what the others recorded.
+        """
+        if not self._pending:
+            return
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        with _locked(f"{self.path}.lock"):
+            entries = self._read()
+            entries.update(self._pending)
+            fd, tmp = tempfile.mkstemp(prefix=f"{os.path.basename(self.path)}.", suffix=".tmp", dir=directory)
+            try:
+                with os.fdopen(fd, "wb") as raw, gzip.open(raw, "wt", encoding="utf-8") as f:
+                    for key in sorted(entries):
+                        f.write(json.dumps(entries[key], ensure_ascii=False, separators=(",", ":")) + "\n")
+                os.replace(tmp, self.path)
+            except BaseException:
+                os.remove(tmp)
+                raise
+        self._entries = entries
+        self._pending = {}
+        logger.info("fixtures.saved upstream=%s entries=%s path=%s", self.name, len(entries), self.path)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "entries": len(self._entries) if self._entries is not None else None,
+            "recorded": self.recorded,
+            "replayed": self.replayed,
+            "misses": self.misses,
+            "injected_errors": self.injected,
+        }
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """Sends requests for real and stores each response in the corpus."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, corpus: FixtureCorpus):
+        self._transport = transport
+        self.corpus = corpus
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        response = await self._transport.handle_async_request(request)
+        try:
+            body = b"".join([chunk async for chunk in response.aiter_bytes()])
+        finally:
+            await response.aclose()
+        # A 304 only means "unchanged"; keep the full response recorded before it.
+        if response.status_code != 304:
+            self.corpus.put(_entry(canonical_key(request.method, request.url), response, body,
+                                   time.perf_counter() - started))
+        headers = [(k, v) for k, v in response.headers.multi_items() if k.lower() not in DROPPED_HEADERS]
+        return httpx.Response(response.status_code, headers=headers, content=body,
+                              extensions={"http_version": response.extensions.get("http_version", b"HTTP/1.1")})
+
+    async def aclose(self) -> None:
+        try:
+            self.corpus.save()
+        except Exception as e:  # noqa: BLE001
+            logger.warning("fixtures.save failed upstream=%s err=%s", self.corpus.name, e)
+        await self._transport.aclose()
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """Answers requests from the corpus, with optional latency and error injection."""
+
+    def __init__(self, corpus: FixtureCorpus, policy: FixturePolicy):
+        self.corpus = corpus
+        self.policy = policy
+        self._rng = random.Random(policy.seed)
+
+    def _injected(self, request: httpx.Request) -> httpx.Response | None:
+        roll = self._rng.random()
+        for kind, rate in self.policy.errors.items():
+            roll -= rate
+            if roll >= 0:
+                continue
+            self.corpus.injected += 1
+            if kind == "timeout":
+                raise httpx.ReadTimeout("injected timeout", request=request)
+            if kind == "connect":
+                raise httpx.ConnectError("injected connection error", request=request)
+            return httpx.Response(int(kind), headers={"Retry-After": "1"} if kind == "429" else None)
+        return None
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        key = canonical_key(request.method, request.url)
+        entry = self.corpus.get(key)
+        if entry is None:
+            self.corpus.misses += 1
+            logger.info("fixtures.miss upstream=%s key=%s", self.corpus.name, key)
+            raise FixtureMissing(f"{self.corpus.name}: no recording for {key}", request=request)
+        delay = self.policy.latency + self.policy.latency_scale * entry.get("elapsed", 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        injected = self._injected(request) if self.policy.errors else None
+        if injected is not None:
+            return injected
+        self.corpus.replayed += 1
+        headers = httpx.Headers([tuple(h) for h in entry["headers"]])
+        etag = headers.get("ETag")
+        if etag and request.headers.get("If-None-Match") == etag:
+            return httpx.Response(304, headers=headers)
+        return httpx.Response(entry["status"], headers=headers, content=_entry_body(entry))
+
+    async def aclose(self) -> None:
+        pass
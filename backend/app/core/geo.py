@@ -0,0 +1,286 @@
+"""In-memory spatial index over geohash cells, with per-entry expiry.
+
+Entries are kept in one list sorted by (geohash, key). Every geohash cell
+is a contiguous run of that list, so the points of a cell are found with
+two bisections. That gives:
+
+* ``within(bbox)``: cover the box with at most MAX_COVER_CELLS cells, at
+  the finest precision that allows it, and scan only those runs.
+* ``nearest(lat, lon, k)``: scan the 3x3 block of cells around the point,
+  going from fine to coarse cells until the k-th closest candidate is
+  nearer than the block's inner radius (any closer point would have to be
+  inside the block).
+
+Both cost O(cells * log n + k') for k' candidates in the scanned cells,
+instead of a pass over every point. Entries expire after their TTL. Expired
+entries are skipped by queries and swept out on the next write.
+
+``GeoBatch`` is the columnar side: a list of events as latitude, longitude
+and start-time arrays, so distances, bbox masks and sort keys for a whole
+result set are computed in a few NumPy passes instead of per event.
+"""
+from __future__ import annotations
+import math
+import time
+import heapq
+import bisect
+from typing import Any, Generic, Hashable, Sequence, TypeVar
+
+import numpy as np
+
+T = TypeVar("T")
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+PRECISION = 9            # stored geohash length (cells of about 5 m x 5 m)
+MAX_COVER_CELLS = 24     # bbox queries use the finest precision whose cover stays within this many cells
+EARTH_RADIUS_KM = 6371.0
+_END = "~"               # sorts after every BASE32 character
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Distance in kilometers between two lat/lon points."""
+    R = EARTH_RADIUS_KM
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = math.sin(dlat/2)**2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon/2)**2
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    return R * c
+
+
+def cell_size(precision: int) -> tuple[float, float]:
+    """(height, width) in degrees of a geohash cell of ``precision`` characters."""
+    bits = 5 * precision
+    return 180.0 / (1 << (bits // 2)), 360.0 / (1 << ((bits + 1) // 2))
+
+
+def geohash(lat: float, lon: float, precision: int = PRECISION) -> str:
+    lat_lo, lat_hi, lon_lo, lon_hi = -90.0, 90.0, -180.0, 180.0
+    chars = []
+    bit, ch, even = 0, 0, True
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if lon >= mid:
+                ch = ch * 2 + 1
+                lon_lo = mid
+            else:
+                ch *= 2
+                lon_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                ch = ch * 2 + 1
+                lat_lo = mid
+            else:
+                ch *= 2
+                lat_hi = mid
+        even = not even
+        bit += 1
+        if bit == 5:
+            chars.append(BASE32[ch])
+            bit, ch = 0, 0
+    return "".join(chars)
+
+
+def _cell_center(row: int, col: int, precision: int) -> tuple[float, float]:
+    h, w = cell_size(precision)
+    return -90.0 + (row + 0.5) * h, -180.0 + (col + 0.5) * w
+
+
+def _grid(precision: int) -> tuple[int, int]:
+    h, w = cell_size(precision)
+    return round(180.0 / h), round(360.0 / w)
+
+
+def _row_col(lat: float, lon: float, precision: int) -> tuple[int, int]:
+    h, w = cell_size(precision)
+    rows, cols = _grid(precision)
+    row = min(rows - 1, max(0, int((lat + 90.0) // h)))
+    col = min(cols - 1, max(0, int((lon + 180.0) // w)))
+    return row, col
+
+
+def cover(min_lat: float, max_lat: float, min_lon: float, max_lon: float,
+          max_cells: int = MAX_COVER_CELLS) -> list[str]:
+    """Geohash prefixes whose cells together cover the box (coarsest is one cell per level-1 hash)."""
+    for precision in range(PRECISION, 0, -1):
+        r0, c0 = _row_col(min_lat, min_lon, precision)
+        r1, c1 = _row_col(max_lat, max_lon, precision)
+        if (r1 - r0 + 1) * (c1 - c0 + 1) <= max_cells:
+            return [geohash(*_cell_center(r, c, precision), precision)
+                    for r in range(r0, r1 + 1) for c in range(c0, c1 + 1)]
+    return [""]  # more than max_cells level-1 cells: scan everything
+
+
+def _block(lat: float, lon: float, precision: int) -> tuple[list[str], float]:
+    """The 3x3 cells around a point and the radius (km) that block is guaranteed to contain."""
+    h, w = cell_size(precision)
+    rows, cols = _grid(precision)
+    row, col = _row_col(lat, lon, precision)
+    lo_row, hi_row = max(0, row - 1), min(rows - 1, row + 1)
+    cells = {geohash(*_cell_center(r, c % cols, precision), precision)
+             for r in range(lo_row, hi_row + 1) for c in range(col - 1, col + 2)}
+    # Degrees to the block's edges; there is no edge past a pole, or around a block spanning every longitude.
+    edges = [lat - (-90.0 + lo_row * h) if lo_row > 0 else math.inf,
+             (-90.0 + (hi_row + 1) * h) - lat if hi_row < rows - 1 else math.inf]
+    radius = min(edges) * EARTH_RADIUS_KM * math.pi / 180.0
+    if cols > 3:
+        dlon = min(lon - (-180.0 + (col - 1) * w), (-180.0 + (col + 2) * w) - lon)
+        # Great-circle distance from the point to the meridian ``dlon`` degrees away.
+        reach = math.cos(math.radians(lat)) * math.sin(math.radians(min(dlon, 90.0)))
+        radius = min(radius, math.asin(min(1.0, reach)) * EARTH_RADIUS_KM)
+    return sorted(cells), radius
+
+
+class GeoIndex(Generic[T]):
+    """Points with a key, a value and an expiry; re-adding a key moves and refreshes it."""
+
+    def __init__(self, ttl: float, max_entries: int = 50_000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._sorted: list[tuple[str, Hashable]] = []
+        self._entries: dict[Hashable, tuple[str, float, float, float, T]] = {}
+        self._expiry: list[tuple[float, Hashable]] = []  # (expires_at, key); stale items are skipped
+        self.added = 0
+        self.expired = 0
+        self.evicted = 0
+        self.queries = 0
+        self.scanned = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, key: Hashable, lat: float, lon: float, value: T, ttl: float | None = None) -> None:
+        now = time.monotonic()
+        self._sweep(now)
+        expires = now + (self.ttl if ttl is None else ttl)
+        gh = geohash(lat, lon)
+        old = self._entries.get(key)
+        if old is not None and old[0] != gh:
+            self._unlink(old[0], key)
+        if old is None or old[0] != gh:
+            bisect.insort(self._sorted, (gh, key))
+        if old is None:
+            self.added += 1
+        self._entries[key] = (gh, lat, lon, expires, value)
+        heapq.heappush(self._expiry, (expires, key))
+        while len(self._entries) > self.max_entries:
+            self._pop_soonest()
+            self.evicted += 1
+        if len(self._expiry) > 2 * len(self._entries) + 64:
+            self._expiry = [(entry[3], k) for k, entry in self._entries.items()]
+            heapq.heapify(self._expiry)
+
+    def discard(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._unlink(entry[0], key)
+
+    def _unlink(self, gh: str, key: Hashable) -> None:
+        i = bisect.bisect_left(self._sorted, (gh, key))
+        if i < len(self._sorted) and self._sorted[i] == (gh, key):
+            del self._sorted[i]
+
+    def _pop_soonest(self) -> None:
+        while self._expiry:
+            expires, key = heapq.heappop(self._expiry)
+            entry = self._entries.get(key)
+            if entry is not None and entry[3] == expires:
+                self.discard(key)
+                return
+
+    def _sweep(self, now: float) -> None:
+        while self._expiry and self._expiry[0][0] <= now:
+            expires, key = heapq.heappop(self._expiry)
+            entry = self._entries.get(key)
+            if entry is not None and entry[3] == expires:
+                self.discard(key)
+                self.expired += 1
+
+    def _run(self, prefix: str) -> tuple[int, int]:
+        lo = bisect.bisect_left(self._sorted, (prefix,))
+        return lo, bisect.bisect_left(self._sorted, (prefix + _END,), lo)
+
+    def _scan(self, prefixes: list[str], now: float):
+        for prefix in prefixes:
+            lo, hi = self._run(prefix)
+            self.scanned += hi - lo
+            for _, key in self._sorted[lo:hi]:
+                entry = self._entries[key]
+                if entry[3] > now:
+                    yield entry
+
+    def within(self, min_lat: float, max_lat: float, min_lon: float, max_lon: float,
+               limit: int | None = None) -> list[T]:
+        """Values inside the box, in geohash order."""
+        self.queries += 1
+        now = time.monotonic()
+        found: list[T] = []
+        for _, lat, lon, _, value in self._scan(cover(min_lat, max_lat, min_lon, max_lon), now):
+            if min_lat <= lat <= max_lat and min_lon <= lon <= max_lon:
+                found.append(value)
+                if limit is not None and len(found) >= limit:
+                    break
+        return found
+
+    def nearest(self, lat: float, lon: float, k: int) -> list[tuple[float, T]]:
+        """The ``k`` closest values as (distance_km, value), nearest first."""
+        self.queries += 1
+        if k <= 0 or not self._entries:
+            return []
+        now = time.monotonic()
+        for precision in range(PRECISION - 1, 0, -1):
+            prefixes, radius = _block(lat, lon, precision)
+            if sum(hi - lo for lo, hi in map(self._run, prefixes)) < k:
+                continue  # too few points this close (expired ones included); widen without scanning
+            found = heapq.nsmallest(k, ((haversine_km(lat, lon, e[1], e[2]), e) for e in self._scan(prefixes, now)),
+                                    key=lambda d: d[0])
+            if len(found) == k and found[-1][0] <= radius:
+                return [(d, e[4]) for d, e in found]
+        found = heapq.nsmallest(k, ((haversine_km(lat, lon, e[1], e[2]), e) for e in self._scan([""], now)),
+                                key=lambda d: d[0])
+        return [(d, e[4]) for d, e in found]
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "added": self.added,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "queries": self.queries,
+            "scanned": self.scanned,
+        }
+
+
+class GeoBatch:
+    """Columnar view of objects with ``latitude``/``longitude``/``start`` (events); NaN where a coordinate is missing."""
+
+    def __init__(self, items: Sequence[Any]):
+        self.items = items
+        n = len(items)
+        self.lat = np.fromiter((np.nan if e.latitude is None else e.latitude for e in items), float, n)
+        self.lon = np.fromiter((np.nan if e.longitude is None else e.longitude for e in items), float, n)
+        self._start_rank: np.ndarray | None = None
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    @property
+    def start_rank(self) -> np.ndarray:
+        """Position of each item's start in sorted order (equal starts share a rank; missing sorts last)."""
+        if self._start_rank is None:
+            starts = np.array([e.start or "9999" for e in self.items], dtype=str)
+            self._start_rank = np.unique(starts, return_inverse=True)[1].reshape(-1)
+        return self._start_rank
+
+    def distances(self, lat: float, lon: float) -> np.ndarray:
+        """Haversine distance in km from (lat, lon) to every item; NaN where the item has no coordinates."""
+        lat1, lon1 = math.radians(lat), math.radians(lon)
+        lat2, lon2 = np.radians(self.lat), np.radians(self.lon)
+        a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+        return 2 * EARTH_RADIUS_KM * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+    def in_bbox(self, min_lat: float, max_lat: float, min_lon: float, max_lon: float) -> np.ndarray:
+        """Boolean mask of items inside the box (items without coordinates are outside)."""
+        return (self.lat >= min_lat) & (self.lat <= max_lat) & (self.lon >= min_lon) & (self.lon <= max_lon)
+
@@ -0,0 +1,266 @@
+"""Shared, pooled HTTP clients: one ``httpx.AsyncClient`` per upstream.
+
+Opening a client per call (``async with httpx.AsyncClient()``) pays a fresh
+TCP + TLS handshake every time, and a single /events request can open dozens.
+Services instead call ``http_client("nominatim")`` and reuse its keep-alive
+pool. Clients are opened in the FastAPI lifespan and closed on shutdown; they
+are also created lazily so scripts and background tasks work without it.
+
+Upstreams listed in RATE_LIMITS (overridable via HTTP_RATE_LIMITS) get their
+transport wrapped in app.core.ratelimit, so the budget is shared by every
+service talking to that host. Every upstream also sits behind a circuit
+breaker (app.core.breaker; BREAKERS / HTTP_BREAKERS), outside the limiter so
+an open circuit does not use up tokens. Breaker trips are shared with the
+other workers through the cache's ``breaker`` namespace. Outermost, app.core.retry retries
+and hedges the calls that opt in, so each attempt passes through the breaker
+and the limiter. app.core.tracing wraps the whole stack, so each call gets
+one span however many attempts it took.
+
+Innermost, a request whose ``on_send`` extension is set has it called as the
+request leaves for the network: once per attempt, including hedges and
+attempts cancelled later. Metered upstreams use it to charge their quota
+ledger for what the provider bills.
+
+With HTTP_FIXTURES set, app.core.fixtures records responses under the stack
+or replays them in place of the network. Replay skips the rate limiters, so
+offline runs go at full speed, but keeps breakers and retries for injected
+failures.
+"""
+from __future__ import annotations
+import os
+import logging
+import dataclasses
+import importlib.util
+from dataclasses import dataclass, field
+from typing import Any, TypeVar
+
+import httpx
+
+from app.core.config import settings
+from app.core.breaker import Breaker, BreakerPolicy, BreakerTransport, SharedBreakerState
+from app.core.cache import cache
+from app.core.fixtures import RECORD, REPLAY, FixtureCorpus, FixturePolicy, RecordingTransport, ReplayTransport
+from app.core.ratelimit import Limiter, RateLimit, RateLimitedTransport
+from app.core.retry import Retrier, RetryBudget, RetryPolicy, RetryTransport
+from app.core.tracing import TracingTransport
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+USER_AGENT = "PlayAxisEvents/1.0 (contact: support@playaxis.local)"
+
+
+@dataclass(frozen=True)
+class Upstream:
+    """Connection settings for one upstream host.
+
+    ``timeout`` is the default read/write/pool timeout (calls may pass their
+    own); ``http2`` is only honoured when HTTP_HTTP2 is on and ``h2`` is installed.
+    """
+    timeout: float = 15.0
+    connect_timeout: float = 5.0
+    max_connections: int = 20
+    max_keepalive: int = 10
+    keepalive_expiry: float = 60.0
+    http2: bool = False
+    headers: dict[str, str] = field(default_factory=dict)
+
+
+UPSTREAMS: dict[str, Upstream] = {
+    # SerpApi also serves the Google Maps place lookups used for lat/lon enrichment.
+    "serpapi": Upstream(timeout=20.0, max_connections=20, max_keepalive=10, http2=True),
+    "nominatim": Upstream(timeout=8.0, max_connections=2, max_keepalive=2, headers={"User-Agent": USER_AGENT}),
+    "thesportsdb": Upstream(timeout=15.0, max_connections=10, max_keepalive=5),
+    "ergast": Upstream(timeout=15.0, max_connections=4, max_keepalive=4),
+    "wikipedia": Upstream(timeout=20.0, max_connections=8, max_keepalive=4, http2=True,
+                          headers={"User-Agent": "MultiSportBot/1.0"}),
+    "open_meteo": Upstream(timeout=15.0, max_connections=10, max_keepalive=5, http2=True),
+    "twitch": Upstream(timeout=15.0, max_connections=10, max_keepalive=5),
+    "scraperapi": Upstream(timeout=16.0, max_connections=10, max_keepalive=5, headers={"User-Agent": USER_AGENT}),
+}
+
+# Published or plan limits, kept a little under where we know them.
+RATE_LIMITS: dict[str, RateLimit] = {
+    # Nominatim usage policy: at most 1 request/second, no parallel requests.
+    "nominatim": RateLimit(rate=1.0, burst=1, max_in_flight=1, max_wait=10.0),
+    "serpapi": RateLimit(rate=5.0, burst=5, max_in_flight=10, max_wait=5.0),
+    # Free TheSportsDB key: ~30 requests/minute.
+    "thesportsdb": RateLimit(rate=0.5, burst=10, max_in_flight=4, max_wait=10.0),
+    "ergast": RateLimit(rate=4.0, burst=4, max_in_flight=4, max_wait=5.0),
+    "wikipedia": RateLimit(rate=10.0, burst=10, max_in_flight=4, max_wait=10.0),
+    # ScraperAPI plans cap concurrent requests rather than the rate.
+    "scraperapi": RateLimit(max_in_flight=5, max_wait=15.0),
+}
+
+# Upstreams not listed use BreakerPolicy() defaults.
+BREAKERS: dict[str, BreakerPolicy] = {
+    # A 429 here usually means the monthly search quota is gone: back off up to 6h between probes.
+    "serpapi": BreakerPolicy(open_seconds=60.0, max_open_seconds=6 * 3600.0),
+    "scraperapi": BreakerPolicy(open_seconds=90.0, max_open_seconds=1800.0),
+    "nominatim": BreakerPolicy(open_seconds=60.0, max_open_seconds=1800.0),
+    "thesportsdb": BreakerPolicy(open_seconds=30.0, max_open_seconds=900.0),
+}
+
+# Upstreams not listed use RetryPolicy() defaults; calls still have to opt in.
+RETRIES: dict[str, RetryPolicy] = {
+    "serpapi": RetryPolicy(max_retries=1, base_delay=0.25, hedge=False),  # every search is billed
+    "nominatim": RetryPolicy(max_retries=1, base_delay=1.0),  # at 1 req/s a faster retry would only queue
+}
+
+
+def with_overrides(defaults: dict[str, T], overrides: dict[str, dict[str, Any]], fallback: T) -> dict[str, T]:
+    """Apply settings overrides (upstream -> field -> number) to per-upstream dataclasses."""
+    merged = dict(defaults)
+    for name, values in (overrides or {}).items():
+        base = merged.get(name, fallback)
+        known = {f.name for f in dataclasses.fields(base)}
+        changes: dict[str, Any] = {}
+        for key, value in values.items():
+            if key not in known:
+                logger.warning("http: ignoring unknown setting %s.%s", name, key)
+                continue
+            changes[key] = type(getattr(base, key))(value)
+        merged[name] = dataclasses.replace(base, **changes)
+    return merged
+
+
+class DispatchHookTransport(httpx.AsyncBaseTransport):
+    """Calls the request's ``on_send`` extension just before the request is sent (after the limiter)."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        on_send = request.extensions.get("on_send")
+        if on_send is not None:
+            on_send()
+        return await self._transport.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+class HttpClients:
+    """Registry of pooled clients keyed by upstream name."""
+
+    def __init__(self, upstreams: dict[str, Upstream], http2: bool = False,
+                 rate_limits: dict[str, RateLimit] | None = None,
+                 breakers: dict[str, BreakerPolicy] | None = None,
+                 retries: dict[str, RetryPolicy] | None = None,
+                 retry_budget: RetryBudget | None = None,
+                 fixtures: FixturePolicy | None = None,
+                 shared_breakers: SharedBreakerState | None = None):
+        self._upstreams = upstreams
+        self._clients: dict[str, httpx.AsyncClient] = {}
+        # Limiters and breakers outlive the clients, so a recreated client keeps their state.
+        self.limiters = {name: Limiter(name, limit) for name, limit in (rate_limits or {}).items()}
+        self.breakers = {name: Breaker(name, (breakers or {}).get(name, BreakerPolicy())) for name in upstreams}
+        self.shared_breakers = shared_breakers
+        if shared_breakers is not None:
+            for breaker in self.breakers.values():
+                shared_breakers.attach(breaker)
+        self.retry_budget = retry_budget or RetryBudget()
+        self.retriers = {
+            name: Retrier(name, (retries or {}).get(name, RetryPolicy()), self.retry_budget, self.breakers[name])
+            for name in upstreams
+        }
+        self.fixtures = fixtures or FixturePolicy()
+        if self.fixtures.mode not in (None, "", RECORD, REPLAY):
+            logger.warning("HTTP_FIXTURES=%r is not 'record' or 'replay'; ignoring it", self.fixtures.mode)
+            self.fixtures = dataclasses.replace(self.fixtures, mode=None)
+        self.corpora = {
+            name: FixtureCorpus(name, os.path.join(self.fixtures.directory, f"{name}.jsonl.gz"))
+            for name in upstreams
+        } if self.fixtures.mode else {}
+        self._http2 = http2 and importlib.util.find_spec("h2") is not None
+        if http2 and not self._http2:
+            logger.warning("HTTP_HTTP2 is set but the 'h2' package is not installed; using HTTP/1.1")
+
+    def _build(self, name: str) -> httpx.AsyncClient:
+        up = self._upstreams[name]
+        transport: httpx.AsyncBaseTransport
+        if self.fixtures.mode == REPLAY:
+            transport = ReplayTransport(self.corpora[name], self.fixtures)
+        else:
+            transport = httpx.AsyncHTTPTransport(
+                limits=httpx.Limits(
+                    max_connections=up.max_connections,
+                    max_keepalive_connections=up.max_keepalive,
+                    keepalive_expiry=up.keepalive_expiry,
+                ),
+                http2=self._http2 and up.http2,
+            )
+            if self.fixtures.mode == RECORD:
+                transport = RecordingTransport(transport, self.corpora[name])
+            transport = DispatchHookTransport(transport)
+            if name in self.limiters:
+                transport = RateLimitedTransport(transport, self.limiters[name])
+        transport = BreakerTransport(transport, self.breakers[name], self.shared_breakers)
+        transport = RetryTransport(transport, self.retriers[name])
+        transport = TracingTransport(transport, name)
+        return httpx.AsyncClient(
+            timeout=httpx.Timeout(up.timeout, connect=up.connect_timeout),
+            headers=up.headers,
+            transport=transport,
+        )
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._clients[name] = self._build(name)
+        return client
+
+    async def open(self) -> None:
+        for name in self._upstreams:
+            self.get(name)
+
+    async def aclose(self) -> None:
+        clients, self._clients = self._clients, {}
+        for name, client in clients.items():
+            try:
+                await client.aclose()
+            except Exception as e:  # noqa: BLE001
+                logger.warning("http.close failed upstream=%s err=%s", name, e)
+
+
+    def breaker(self, name: str) -> Breaker:
+        return self.breakers[name]
+
+    def stats(self) -> dict[str, dict]:
+        return {
+            "upstreams": {
+                name: {
+                    "breaker": self.breakers[name].stats(),
+                    "rate_limit": self.limiters[name].stats() if name in self.limiters else None,
+                    "retry": self.retriers[name].stats(),
+                    **({"fixtures": self.corpora[name].stats()} if self.corpora else {}),
+                }
+                for name in self._upstreams
+            },
+            "retry_budget": self.retry_budget.stats(),
+        }
+
+
+http_clients = HttpClients(
+    UPSTREAMS,
+    http2=settings.HTTP_HTTP2,
+    rate_limits=with_overrides(RATE_LIMITS, settings.HTTP_RATE_LIMITS, RateLimit()),
+    breakers=with_overrides(BREAKERS, settings.HTTP_BREAKERS, BreakerPolicy()),
+    retries=RETRIES,
+    retry_budget=RetryBudget(settings.HTTP_RETRY_BUDGET_RATIO, settings.HTTP_RETRY_BUDGET_MIN_PER_SECOND),
+    fixtures=FixturePolicy(
+        mode=settings.HTTP_FIXTURES,
+        directory=settings.HTTP_FIXTURES_DIR,
+        latency_scale=settings.HTTP_FIXTURES_LATENCY_SCALE,
+        latency=settings.HTTP_FIXTURES_LATENCY,
+        errors=settings.HTTP_FIXTURES_ERRORS,
+        seed=settings.HTTP_FIXTURES_SEED,
+    ),
+    shared_breakers=SharedBreakerState(cache),
+)
+
+
+def http_client(name: str) -> httpx.AsyncClient:
+    """Pooled client for an upstream in UPSTREAMS (do not close it)."""
+    return http_clients.get(name)
@@ -0,0 +1,188 @@
+"""Per-upstream rate limits: a token bucket plus a cap on requests in flight.
+
+``HttpClients`` wraps each pooled client's transport in ``RateLimitedTransport``,
+so every service calling ``http_client(name)`` draws on the same budget for
+that upstream. A request over budget queues (first come, first served) for up
+to ``max_wait`` seconds; if it still cannot be admitted it fails with
+``UpstreamThrottled`` without being sent, rather than earning a 429 that
+would end up in the negative cache.
+
+A call can shorten or extend its own wait with
+``client.get(url, extensions={"rate_limit_wait": 2.0})``.
+"""
+from __future__ import annotations
+import time
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """Budget for one upstream.
+
+    ``rate`` requests/second refill a bucket of ``burst`` tokens (0 = no rate
+    limit); ``max_in_flight`` caps concurrent requests (0 = no cap); a request
+    queues at most ``max_wait`` seconds for both.
+    """
+    rate: float = 0.0
+    burst: int = 1
+    max_in_flight: int = 0
+    max_wait: float = 5.0
+
+
+class UpstreamThrottled(httpx.TransportError):
+    """Refused locally without being sent: the limiter deadline ran out (or, as CircuitOpen, the breaker is open)."""
+
+
+class Limiter:
+    """Token bucket + in-flight semaphore for one upstream."""
+
+    def __init__(self, name: str, limit: RateLimit):
+        self.name = name
+        self.limit = limit
+        self._tokens = float(max(1, limit.burst))
+        self._updated = time.monotonic()
+        self._slots = asyncio.Semaphore(limit.max_in_flight) if limit.max_in_flight > 0 else None
+        self.admitted = 0
+        self.queued = 0
+        self.throttled = 0
+        self.refunded = 0
+        self.wait_seconds = 0.0
+        self.in_flight = 0
+
+    def _reserve(self, deadline: float) -> float | None:
+        """Take a token, on credit if need be; return the delay until it is ours (None: past deadline).
+
+        The balance may go negative: each queued request owes one token, so
+        later callers compute longer delays and are admitted in arrival order.
+        """
+        now = time.monotonic()
+        self._tokens = min(float(max(1, self.limit.burst)), self._tokens + (now - self._updated) * self.limit.rate)
+        self._updated = now
+        delay = max(0.0, (1.0 - self._tokens) / self.limit.rate)
+        if now + delay > deadline:
+            return None
+        self._tokens -= 1.0
+        return delay
+
+    def _throttled(self, request: httpx.Request, reason: str) -> UpstreamThrottled:
+        self.throttled += 1
+        logger.warning("ratelimit.throttled upstream=%s reason=%s url=%s", self.name, reason, str(request.url)[:120])
+        return UpstreamThrottled(f"{self.name}: {reason}", request=request)
+
+    async def acquire(self, request: httpx.Request, max_wait: float | None = None) -> float:
+        """Wait for a slot and a token, or raise UpstreamThrottled once ``max_wait`` runs out.
+
+        Returns the seconds spent waiting.
+        """
+        max_wait = self.limit.max_wait if max_wait is None else max_wait
+        started = time.monotonic()
+        deadline = started + max_wait
+        waited = False
+        if self._slots is not None:
+            if self._slots.locked():
+                waited = True
+                try:
+                    await asyncio.wait_for(self._slots.acquire(), max(0.0, max_wait))
+                except asyncio.TimeoutError:
+                    raise self._throttled(request, "too many requests in flight") from None
+            else:
+                await self._slots.acquire()
+        if self.limit.rate > 0:
+            delay = self._reserve(deadline)
+            if delay is None:
+                self._release_slot()
+                raise self._throttled(request, "rate limit")
+            if delay:
+                waited = True
+                try:
+                    await asyncio.sleep(delay)
+                except BaseException:
+                    # Cancelled while queued (a losing hedge, an early-stopped fan-out): nothing was
+                    # sent, so the reserved token goes back instead of throttling later requests.
+                    self._refund()
+                    self._release_slot()
+                    raise
+        self.admitted += 1
+        self.queued += waited
+        self.in_flight += 1
+        waited_seconds = time.monotonic() - started
+        self.wait_seconds += waited_seconds
+        return waited_seconds
+
+    def _refund(self) -> None:
+        self._tokens = min(float(max(1, self.limit.burst)), self._tokens + 1.0)
+        self.refunded += 1
+
+    def _release_slot(self) -> None:
+        if self._slots is not None:
+            self._slots.release()
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._release_slot()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "rate": self.limit.rate,
+            "burst": self.limit.burst,
+            "max_in_flight": self.limit.max_in_flight,
+            "in_flight": self.in_flight,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "throttled": self.throttled,
+            "refunded": self.refunded,
+            "wait_seconds": round(self.wait_seconds, 3),
+        }
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    """Response body that gives the limiter slot back once it is closed."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, release: Callable[[], None]):
+        self._stream = stream
+        self._release: Callable[[], None] | None = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            release, self._release = self._release, None
+            if release is not None:
+                release()
+
+
+class RateLimitedTransport(httpx.AsyncBaseTransport):
+    """Admits requests through a Limiter before handing them to the real transport."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, limiter: Limiter):
+        self._transport = transport
+        self.limiter = limiter
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        request.extensions["rate_limit_waited"] = await self.limiter.acquire(
+            request, request.extensions.get("rate_limit_wait"))
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            self.limiter.release()
+            raise
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_ReleasingStream(response.stream, self.limiter.release),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
@@ -0,0 +1,201 @@
+"""Retries with decorrelated jitter, and hedged requests, for the shared HTTP clients.
+
+Both are opt-in per call through request extensions:
+
+    await client.get(url, extensions={"retry": True})                 # retry transient failures
+    await client.get(url, extensions={"retry": True, "hedge": True})  # ... and hedge slow responses
+
+(``"retry": 1`` caps the retries for that call.) Only GET/HEAD are retried or
+hedged. A retry follows a transport error or a 500/502/503/504. Local
+throttles and open circuits are never retried. The sleep before each retry
+is ``min(max_delay, uniform(base_delay, previous * 3))`` (decorrelated jitter),
+and no retry starts more than ``deadline`` seconds after the first attempt.
+A hedge is a copy of the request sent once the first has been outstanding
+longer than the upstream's recent p95 latency (taken from its breaker);
+the first answer wins and the other request is cancelled.
+
+Retries and hedges all draw on one process-wide ``RetryBudget``, so a failing
+upstream cannot multiply the traffic it receives.
+"""
+from __future__ import annotations
+import time
+import random
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+import httpx
+
+from app.core.breaker import Breaker
+from app.core.ratelimit import UpstreamThrottled
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD"}
+
+Send = Callable[[httpx.Request], Awaitable[httpx.Response]]
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_retries: int = 2
+    base_delay: float = 0.1
+    max_delay: float = 2.0
+    deadline: float = 10.0  # a timed-out attempt is usually past this, so it is hedged rather than retried
+    hedge_min_delay: float = 0.05  # never hedge sooner than this, whatever the p95
+    hedge: bool = True  # False for billed upstreams: a hedge is a second paid request, cancelled or not
+
+
+class RetryBudget:
+    """Token bucket shared by all upstreams.
+
+    Every opted-in request deposits ``ratio`` tokens and every retry or hedge
+    withdraws one, so extra attempts stay at roughly ``ratio`` of traffic;
+    ``min_per_second`` keeps a few available when traffic is light.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_per_second: float = 1.0, max_tokens: float = 20.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._updated = time.monotonic()
+        self.exhausted = 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.max_tokens, self._tokens + (now - self._updated) * self.min_per_second)
+        self._updated = now
+
+    def deposit(self) -> None:
+        self._refill()
+        self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        self._refill()
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            return True
+        self.exhausted += 1
+        return False
+
+    def stats(self) -> dict[str, Any]:
+        self._refill()
+        return {"tokens": round(self._tokens, 2), "ratio": self.ratio, "exhausted": self.exhausted}
+
+
+def _discard(task: asyncio.Task) -> None:
+    """Done-callback for a losing hedge: close its response if it got one."""
+    if task.cancelled() or task.exception() is not None:
+        return
+    asyncio.ensure_future(task.result().aclose())
+
+
+class Retrier:
+    """Retry/hedge logic for one upstream."""
+
+    def __init__(self, name: str, policy: RetryPolicy, budget: RetryBudget, breaker: Breaker | None = None):
+        self.name = name
+        self.policy = policy
+        self.budget = budget
+        self.breaker = breaker
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def _may_retry(self, attempt: int, max_retries: int, started: float, delay: float) -> bool:
+        return (attempt < max_retries
+                and time.monotonic() - started + delay < self.policy.deadline
+                and self.budget.withdraw())
+
+    async def send(self, request: httpx.Request, send: Send) -> httpx.Response:
+        retry = request.extensions.get("retry")
+        hedge = request.extensions.get("hedge") and self.policy.hedge
+        if request.method not in IDEMPOTENT_METHODS or not (retry or hedge):
+            return await send(request)
+        self.budget.deposit()
+        max_retries = self.policy.max_retries if retry is True else int(retry or 0)
+        started = time.monotonic()
+        delay = self.policy.base_delay
+        attempt = 0
+        while True:
+            delay = min(self.policy.max_delay, random.uniform(self.policy.base_delay, delay * 3))
+            try:
+                response = await (self._hedged(request, send) if hedge else send(request))
+            except UpstreamThrottled:
+                raise
+            except httpx.TransportError as e:
+                if not self._may_retry(attempt, max_retries, started, delay):
+                    raise
+                logger.info("http.retry upstream=%s attempt=%s err=%s", self.name, attempt + 1, type(e).__name__)
+            else:
+                if response.status_code not in RETRY_STATUSES or not self._may_retry(attempt, max_retries, started, delay):
+                    return response
+                logger.info("http.retry upstream=%s attempt=%s status=%s", self.name, attempt + 1, response.status_code)
+                await response.aclose()
+            attempt += 1
+            self.retries += 1
+            request.extensions["retries"] = attempt
+            await asyncio.sleep(delay)
+
+    async def _hedged(self, request: httpx.Request, send: Send) -> httpx.Response:
+        p95 = self.breaker.latency(0.95) if self.breaker is not None else None
+        if p95 is None:
+            return await send(request)
+        first = asyncio.ensure_future(send(request))
+        try:
+            done, _ = await asyncio.wait({first}, timeout=max(p95, self.policy.hedge_min_delay))
+        except BaseException:
+            # asyncio.wait does not cancel on the caller's cancellation; without this the
+            # attempt (and its rate-limiter slot) would outlive the request.
+            first.add_done_callback(_discard)
+            first.cancel()
+            raise
+        if done or not self.budget.withdraw():
+            return await first
+        self.hedges += 1
+        request.extensions["hedged"] = True
+        # A separate Request so the two attempts do not share per-request extensions.
+        second = asyncio.ensure_future(send(httpx.Request(
+            request.method, request.url, headers=request.headers, extensions=dict(request.extensions))))
+        tasks = (first, second)
+        winner: asyncio.Task | None = None
+        error: BaseException | None = None
+        try:
+            pending = set(tasks)
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner = winner or task
+                    else:
+                        error = error or task.exception()
+        finally:
+            for task in tasks:
+                if task is not winner:
+                    task.add_done_callback(_discard)
+                    task.cancel()
+        if winner is None:
+            raise error  # type: ignore[misc]
+        if winner is second:
+            self.hedge_wins += 1
+        return winner.result()
+
+    def stats(self) -> dict[str, Any]:
+        return {"retries": self.retries, "hedges": self.hedges, "hedge_wins": self.hedge_wins}
+
+
+class RetryTransport(httpx.AsyncBaseTransport):
+    """Applies a Retrier to requests that opted in; others pass straight through."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, retrier: Retrier):
+        self._transport = transport
+        self.retrier = retrier
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self.retrier.send(request, self._transport.handle_async_request)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
@@ -0,0 +1,337 @@
+"""Lightweight request tracing: OpenTelemetry-style spans with a pluggable exporter.
+
+Tracing is off unless TRACING_EXPORTER is set:
+
+* ``jsonl:/path/traces.jsonl`` appends one JSON object per span, with
+  OTLP/JSON field names (traceId, spanId, parentSpanId, startTimeUnixNano, ...).
+* ``log`` logs each span at INFO through this module's logger.
+
+Any object with an ``export(spans: list[dict])`` method can be assigned to
+``tracer.exporter`` instead.
+
+Spans nest through a context variable, so tasks started inside a span
+(``asyncio.gather``, background refreshes) become its children. The places
+that open spans:
+
+* ``TracingMiddleware``: one root span per HTTP request, named after the
+  route template. It continues an incoming W3C ``traceparent`` and returns
+  the trace id in ``X-Trace-Id``.
+* ``@traced()`` service functions (aggregate_events, fetch_google_events, ...).
+* ``TTLCache.lookup``: ``cache.lookup`` spans with namespace, hit, stale, negative.
+* ``TracingTransport``: one ``http <upstream>`` span per upstream call, with
+  method, host/path, status, response bytes, retries and whether it was hedged.
+
+A trace's finished spans are exported when its root span ends.
+TRACING_SAMPLE_RATE picks the share of new traces to record.
+"""
+from __future__ import annotations
+import json
+import time
+import random
+import logging
+import functools
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Protocol
+
+import httpx
+
+from app.core.fixtures import redact_path
+
+logger = logging.getLogger(__name__)
+
+MAX_BUFFERED_SPANS = 512
+
+
+class Exporter(Protocol):
+    def export(self, spans: list[dict[str, Any]]) -> None: ...
+
+
+class JsonLinesExporter:
+    """Appends spans to a file, one JSON object per line."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, spans: list[dict[str, Any]]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            for span in spans:
+                f.write(json.dumps(span, default=str, separators=(",", ":")) + "\n")
+
+
+class LogExporter:
+    def export(self, spans: list[dict[str, Any]]) -> None:
+        for span in spans:
+            ms = (span["endTimeUnixNano"] - span["startTimeUnixNano"]) / 1e6
+            logger.info("span trace=%s name=%s ms=%.1f status=%s attrs=%s", span["traceId"], span["name"], ms,
+                        span["status"]["code"], span["attributes"])
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "attributes", "start_ns", "end_ns",
+                 "status", "message")
+
+    def __init__(self, name: str, trace_id: str, parent_id: str | None, attributes: dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns: int | None = None
+        self.status = "UNSET"
+        self.message = ""
+
+    def set(self, key: str, value: Any) -> None:
+        if value is not None:
+            self.attributes[key] = value
+
+    def record_exception(self, exc: BaseException) -> None:
+        self.status = "ERROR"
+        self.message = str(exc)[:200]
+        self.attributes["exception.type"] = type(exc).__name__
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "attributes": self.attributes,
+            "status": {"code": self.status, "message": self.message},
+        }
+
+
+class _NoopSpan:
+    """Stands in for a span when tracing is off or the trace is not sampled."""
+
+    trace_id = None
+
+    def set(self, key: str, value: Any) -> None:
+        pass
+
+    def record_exception(self, exc: BaseException) -> None:
+        pass
+
+
+NOOP = _NoopSpan()
+
+# The innermost open span of the running task (NOOP inside an unsampled trace).
+_current: contextvars.ContextVar[Span | _NoopSpan | None] = contextvars.ContextVar("trace_span", default=None)
+
+
+class Tracer:
+    def __init__(self, exporter: Exporter | None = None, sample_rate: float = 1.0):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self._finished: list[dict[str, Any]] = []
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    def start_span(self, name: str, attributes: dict[str, Any] | None = None, root: bool = False,
+                   remote: tuple[str, str, bool] | None = None) -> Span | _NoopSpan:
+        """Start a span under the current one without making it current (end it with ``end``).
+
+        ``root`` starts a new trace whatever the context, continuing ``remote``
+        (trace_id, parent_span_id, sampled) when given.
+        """
+        if self.exporter is None:
+            return NOOP
+        current = None if root else _current.get()
+        if current is NOOP:
+            return NOOP
+        if isinstance(current, Span):
+            return Span(name, current.trace_id, current.span_id, dict(attributes or {}))
+        if remote is not None:
+            trace_id, parent_id, sampled = remote
+            return Span(name, trace_id, parent_id, dict(attributes or {})) if sampled else NOOP
+        if random.random() >= self.sample_rate:
+            return NOOP
+        return Span(name, f"{random.getrandbits(128):032x}", None, dict(attributes or {}))
+
+    def end(self, span: Span | _NoopSpan, root: bool = False) -> None:
+        if not isinstance(span, Span) or span.end_ns is not None:
+            return
+        span.end_ns = time.time_ns()
+        self._finished.append(span.to_dict())
+        if root or span.parent_id is None or len(self._finished) >= MAX_BUFFERED_SPANS:
+            self.flush()
+
+    def flush(self) -> None:
+        spans, self._finished = self._finished, []
+        if not spans or self.exporter is None:
+            return
+        try:
+            self.exporter.export(spans)
+        except Exception as e:  # noqa: BLE001 - tracing must never break a request
+            logger.warning("tracing.export failed spans=%s err=%s", len(spans), e)
+
+    @contextmanager
+    def span(self, name: str, root: bool = False, remote: tuple[str, str, bool] | None = None,
+             **attributes: Any) -> Iterator[Span | _NoopSpan]:
+        """Open a span as the current one for the duration of the block."""
+        span = self.start_span(name, attributes, root, remote)
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            if isinstance(e, Exception):
+                span.record_exception(e)
+            else:
+                span.set("cancelled", True)
+            raise
+        finally:
+            _current.reset(token)
+            self.end(span, root=root)
+
+
+tracer = Tracer()
+
+
+def configure(spec: str | None, sample_rate: float = 1.0) -> None:
+    """Set the exporter from TRACING_EXPORTER ('jsonl:<path>', 'log', or empty to disable)."""
+    tracer.sample_rate = sample_rate
+    if not spec:
+        tracer.exporter = None
+    elif spec == "log":
+        tracer.exporter = LogExporter()
+    elif spec.startswith("jsonl:"):
+        tracer.exporter = JsonLinesExporter(spec[len("jsonl:"):])
+    else:
+        logger.warning("TRACING_EXPORTER=%r not understood; tracing disabled", spec)
+        tracer.exporter = None
+
+
+def current_span() -> Span | _NoopSpan:
+    span = _current.get()
+    return span if span is not None else NOOP
+
+
+def traced(name: str | None = None) -> Callable:
+    """Decorator: run an async function inside a span (named after the function by default)."""
+    def decorate(fn: Callable) -> Callable:
+        span_name = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            if tracer.exporter is None:
+                return await fn(*args, **kwargs)
+            with tracer.span(span_name):
+                return await fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def parse_traceparent(header: str | None) -> tuple[str, str, bool] | None:
+    """W3C ``traceparent`` (00-<trace id>-<parent id>-<flags>) -> (trace_id, parent_id, sampled)."""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        sampled = bool(int(parts[3], 16) & 1)
+    except ValueError:
+        return None
+    return parts[1], parts[2], sampled
+
+
+class TracingMiddleware:
+    """ASGI middleware opening the root span of each HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or tracer.exporter is None:
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or [])
+        remote = parse_traceparent(headers.get(b"traceparent", b"").decode("latin-1"))
+        method = scope.get("method", "GET")
+        with tracer.span(f"{method} {scope.get('path', '')}", root=True, remote=remote) as span:
+            span.set("http.method", method)
+            span.set("http.target", scope.get("path"))
+
+            async def send_traced(message):
+                if message["type"] == "http.response.start":
+                    span.set("http.status_code", message["status"])
+                    if span.trace_id:
+                        message.setdefault("headers", [])
+                        message["headers"] = [*message["headers"], (b"x-trace-id", span.trace_id.encode())]
+                await send(message)
+
+            await self.app(scope, receive, send_traced)
+            if isinstance(span, Span) and scope.get("route") is not None:
+                # Route template from the matched path (nested routers only know their own suffix).
+                template = scope.get("path", "")
+                for name, value in (scope.get("path_params") or {}).items():
+                    template = template.replace(f"/{value}", f"/{{{name}}}", 1)
+                span.name = f"{method} {template}"
+                span.set("http.route", template)
+
+
+class _TracedStream(httpx.AsyncByteStream):
+    """Counts response bytes and ends the upstream span when the body is closed."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, span: Span):
+        self._stream = stream
+        self._span = span
+        self._bytes = 0
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            self._bytes += len(chunk)
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            self._span.set("http.response_bytes", self._bytes)
+            tracer.end(self._span)
+
+
+class TracingTransport(httpx.AsyncBaseTransport):
+    """Outermost layer of each pooled client: one span per upstream call, retries and hedges included."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, upstream: str):
+        self._transport = transport
+        self.upstream = upstream
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        span = tracer.start_span(f"http {self.upstream}") if tracer.exporter is not None else NOOP
+        if not isinstance(span, Span):
+            return await self._transport.handle_async_request(request)
+        span.set("upstream", self.upstream)
+        span.set("http.method", request.method)
+        span.set("http.host", request.url.host)
+        span.set("http.path", redact_path(request.url.path))  # no query; keys in the path are redacted
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException as e:
+            if isinstance(e, Exception):
+                span.record_exception(e)
+            else:
+                span.set("cancelled", True)
+            span.set("http.retries", request.extensions.get("retries"))
+            tracer.end(span)
+            raise
+        span.set("http.status_code", response.status_code)
+        span.set("http.retries", request.extensions.get("retries", 0))
+        span.set("http.hedged", request.extensions.get("hedged"))
+        if response.status_code >= 500 or response.status_code == 429:
+            span.status = "ERROR"
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_TracedStream(response.stream, span),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
@@ -0,0 +1,47 @@
+from datetime import date
+from typing import Dict, List, Tuple
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models.upstream_usage import UpstreamUsage
+
+def add_usage(db: Session, counts: Dict[Tuple[str, str, date], int]) -> None:
+    """Add credits to ledger rows keyed (upstream, route, day), creating rows as needed.
+
+    Increments are done in SQL so several workers flushing at once do not lose counts.
+    """
+    for (upstream, route, day), credits in counts.items():
+        match = db.query(UpstreamUsage).filter(
+            UpstreamUsage.upstream == upstream, UpstreamUsage.route == route, UpstreamUsage.day == day)
+        if match.update({UpstreamUsage.credits: UpstreamUsage.credits + credits}, synchronize_session=False):
+            continue
+        try:
+            with db.begin_nested():
+                db.add(UpstreamUsage(upstream=upstream, route=route, day=day, credits=credits))
+        except IntegrityError:
+            # Another worker inserted the row in between.
+            match.update({UpstreamUsage.credits: UpstreamUsage.credits + credits}, synchronize_session=False)
+    db.commit()
+
+def daily_usage(db: Session, since: date) -> Dict[str, Dict[date, int]]:
+    """Credits per upstream per day from ``since`` on (all routes)."""
+    rows = (
+        db.query(UpstreamUsage.upstream, UpstreamUsage.day, func.sum(UpstreamUsage.credits))
+        .filter(UpstreamUsage.day >= since)
+        .group_by(UpstreamUsage.upstream, UpstreamUsage.day)
+        .all()
+    )
+    out: Dict[str, Dict[date, int]] = {}
+    for upstream, day, credits in rows:
+        out.setdefault(upstream, {})[day] = int(credits or 0)
+    return out
+
+def usage_by_route(db: Session, since: date) -> List[dict]:
+    """Ledger rows from ``since`` on, for reporting."""
+    rows = (
+        db.query(UpstreamUsage)
+        .filter(UpstreamUsage.day >= since)
+        .order_by(UpstreamUsage.day.desc(), UpstreamUsage.upstream, UpstreamUsage.route)
+        .all()
+    )
+    return [{'upstream': r.upstream, 'route': r.route, 'day': r.day.isoformat(), 'credits': r.credits} for r in rows]
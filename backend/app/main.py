@@ -1,8 +1,15 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from .db.database import DB_KIND
 from .api.v1.api import api_router
+from .core.cache import cache
+from .core.cache_snapshot import CacheSnapshotter
+from .core.config import settings
+from .core.http import http_clients
+from .core.tracing import TracingMiddleware, configure as configure_tracing, tracer
+from .services.quota import quota_ledger
 import os, subprocess, logging
 
 logger = logging.getLogger("startup")
@@ -17,7 +24,33 @@ if RUN_MIGRATIONS:
     except Exception as e:  # noqa: BLE001
         logger.error("Failed to run migrations: %s", e)
 
-app = FastAPI(title="MultiSportApp API", version="1.0.0", redirect_slashes=False)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await http_clients.open()
+    cache.start_sweeper(settings.CACHE_SWEEP_INTERVAL)
+    quota_ledger.start(settings.QUOTA_FLUSH_INTERVAL)
+    snapshotter = None
+    if settings.CACHE_SNAPSHOT_PATH:
+        snapshotter = CacheSnapshotter(
+            cache,
+            settings.CACHE_SNAPSHOT_PATH,
+            namespaces={ns.strip() for ns in settings.CACHE_SNAPSHOT_NAMESPACES.split(",") if ns.strip()},
+            interval=settings.CACHE_SNAPSHOT_INTERVAL,
+            max_bytes=settings.CACHE_SNAPSHOT_MAX_BYTES,
+        )
+        await snapshotter.start()
+    yield
+    if snapshotter:
+        await snapshotter.stop()
+    await quota_ledger.stop()
+    await cache.stop_sweeper()
+    await http_clients.aclose()
+    await cache.close()
+    tracer.flush()
+
+app = FastAPI(title="MultiSportApp API", version="1.0.0", redirect_slashes=False, lifespan=lifespan)
+
+configure_tracing(settings.TRACING_EXPORTER, settings.TRACING_SAMPLE_RATE)
 
 app.add_middleware(
     CORSMiddleware,
@@ -35,6 +68,9 @@ app.add_middleware(
     max_age=600,
 )
 
+# Added last so it is outermost: the root span covers CORS handling too.
+app.add_middleware(TracingMiddleware)
+
 app.include_router(api_router, prefix="/api/v1")
 
 @app.get("/api/v1/healthz")
@@ -2,4 +2,5 @@
 from .user import User
 from .interest import Interest
 from .workout import Workout
-from .standings_cache import StandingsCache
\ No newline at end of file
+from .standings_cache import StandingsCache
+from .upstream_usage import UpstreamUsage
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, Date, DateTime, Index, UniqueConstraint, func
+from app.db.base_class import Base
+
+class UpstreamUsage(Base):
+    """Quota ledger: credits spent per upstream, route and UTC day."""
+    __tablename__ = 'upstream_usage'
+    id = Column(Integer, primary_key=True)
+    upstream = Column(String(32), nullable=False)  # key in app.core.http.UPSTREAMS, e.g. "serpapi"
+    route = Column(String(64), nullable=False)  # what spent it, e.g. "events.search"
+    day = Column(Date, nullable=False)
+    credits = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        UniqueConstraint('upstream', 'route', 'day', name='uq_upstream_usage_upstream_route_day'),
+        Index('ix_upstream_usage_upstream_day', 'upstream', 'day'),
+    )
@@ -1,14 +1,21 @@
 from __future__ import annotations
-from typing import List, Optional
-import math
-import httpx
+from typing import AsyncIterator, Awaitable, Callable, List, Optional
+import asyncio
+import contextvars
 import hashlib
 import json
+import numpy as np
 from app.schemas.event import Event, EventsResponse
 import logging
 from app.services.google_events import fetch_google_events, SerpApiRateLimitError
 from app.services.scraperapi_events import fetch_events_via_scraperapi
-from app.core.cache import cache
+from collections import OrderedDict
+from app.core.cache import Uncached, cache, cached, make_key
+from app.core.geo import GeoBatch, GeoIndex
+from app.core.http import http_client, http_clients
+from app.core.ratelimit import UpstreamThrottled
+from app.core.tracing import traced
+from app.services.quota import quota_ledger
 
 EVENTS_CACHE_TTL = 180  # seconds
 logger = logging.getLogger(__name__)
@@ -31,48 +38,204 @@ def _cache_key(query: str, page: int, limit: int, htichips: str | None,
     }, sort_keys=True)
     return "events:" + hashlib.sha256(raw.encode()).hexdigest()
 
-def _haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    """Distance in kilometers between two lat/lon points."""
-    R = 6371.0
-    dlat = math.radians(lat2 - lat1)
-    dlon = math.radians(lon2 - lon1)
-    a = math.sin(dlat/2)**2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon/2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    return R * c
-
 LOCAL_RADIUS_KM = 120.0  # radius considered "local" for first-pass filtering
 MIN_LOCAL_RESULTS = 5    # if fewer than this, append broader results
+SERP_FANOUT = 4          # SerpApi searches run ahead per request; at most SERP_FANOUT - 1 are wasted by an early stop
+POOL_MAX_DEPTH = 3       # SerpApi result pages (of 2 x 10 events) the pool will read per locality variant
+POOL_MAX_TIERS = 4       # pool growth steps, each one request budget of searches
+EVENT_INDEX_TTL = 30 * 60  # seconds a geocoded event stays in the spatial index (the pool's hard TTL)
+VIEWPORT_INDEX_MIN = 20  # events the index must already hold inside a viewport to answer it without the pool
+MAX_INDEX_SCOPES = 64    # query/filter-chip combinations with a spatial index (least recently used dropped)
+RADIUS_SEQ = np.array([50.0, 100.0, LOCAL_RADIUS_KM, 250.0, 500.0])  # "local" radius widens until MIN_LOCAL_RESULTS fit
 
+@cached("revgeo", ttl=86400, key=lambda lat, lon: (str(round(lat, 3)), str(round(lon, 3))))  # 24h
 async def _reverse_geocode(lat: float, lon: float) -> Optional[dict]:
     """Reverse geocode coordinates to a dict with city, state, country using Nominatim (cached)."""
-    key = f"revgeo:{round(lat,3)}:{round(lon,3)}"
+    try:
+        url = "https://nominatim.openstreetmap.org/reverse"
+        params = {"lat": lat, "lon": lon, "format": "json", "zoom": 10, "addressdetails": 1}
+        # Include a contact per Nominatim usage policy to reduce risk of throttling
+        headers = {"User-Agent": "PlayAxisEvents/1.0 (contact: support@playaxis.local)"}
+        client = http_client("nominatim")
+        r = await client.get(url, params=params, headers=headers, extensions={"retry": True})
+        if r.status_code != 200:
+            return None  # negative entry, revgeo negative_ttl
+        data = r.json()
+        addr = data.get('address', {})
+        return {
+            'city': addr.get('city') or addr.get('town') or addr.get('village') or addr.get('hamlet'),
+            'state': addr.get('state') or addr.get('region'),
+            'country': addr.get('country'),
+        }
+    except UpstreamThrottled:
+        raise Uncached()  # never sent: try again next time rather than caching a failure
+    except Exception:
+        return None
+
+async def _fetch_plan(plan: List[tuple[str, int]], fetch: Callable[[str, int], Awaitable[List[Event]]],
+                      enough: Callable[[List[Event]], bool]) -> tuple[List[Event], int, bool]:
+    """Run the planned SerpApi searches concurrently, at most SERP_FANOUT past the merged prefix.
+
+    Batches are merged in plan order, not arrival order, so the result does not
+    depend on timing: it is the deduplicated events of the shortest plan prefix
+    that is ``enough`` (or of every search that completed). Once such a prefix
+    is complete, outstanding searches are cancelled and no more are started.
+    A rate limit stops new searches too. Returns (events, how many plan entries
+    they cover, rate limited).
+    """
+    results: dict[int, List[Event]] = {}
+    pending: dict[asyncio.Task, int] = {}
+    merged: List[Event] = []
+    seen_ids: set = set()
+    merged_upto = 0  # plan[:merged_upto] is merged into ``merged``
+    next_slot = 0
+    satisfied = rate_limited = False
+
+    def merge(batch: List[Event]) -> None:
+        for ev in batch:
+            if ev.id not in seen_ids:
+                seen_ids.add(ev.id)
+                merged.append(ev)
+
+    try:
+        while True:
+            while not (satisfied or rate_limited) and next_slot < len(plan) and next_slot - merged_upto < SERP_FANOUT:
+                pending[asyncio.ensure_future(fetch(*plan[next_slot]))] = next_slot
+                next_slot += 1
+            if not pending:
+                break
+            finished, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in sorted(finished, key=pending.__getitem__):
+                slot = pending.pop(task)
+                qstr, off = plan[slot]
+                try:
+                    results[slot] = task.result()
+                except SerpApiRateLimitError:
+                    rate_limited = True
+                    logger.warning("SerpApi quota exhausted; switching to fallback.")
+                    results[slot] = []
+                    continue
+                except Exception as e:  # noqa: BLE001 - one failed variant should not sink the others
+                    logger.warning("events.fetch failed q='%s' start=%s err=%s", qstr, off, e)
+                    results[slot] = []
+                    continue
+                logger.info("events.fetch q='%s' start=%s -> %s", qstr, off, len(results[slot]))
+            while not satisfied and merged_upto in results:
+                merge(results[merged_upto])
+                merged_upto += 1
+                satisfied = enough(merged)
+            if satisfied or rate_limited:
+                break
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+    if not satisfied:
+        # Stopped early by a rate limit: keep what completed, still in plan order.
+        for slot in sorted(results):
+            if slot >= merged_upto:
+                merge(results[slot])
+    return merged, merged_upto if satisfied else len(plan), rate_limited
+
+def _plan_slots(variants: int, cursor: int, count: int, dead: set) -> List[tuple[int, int, int]]:
+    """Up to ``count`` (slot, variant, offset) entries of the pool plan from ``cursor`` on.
+
+    Slot order is variant by variant, two SerpApi pages each (offsets 0 and 10),
+    then the same again 20 results deeper, up to POOL_MAX_DEPTH. Variants in
+    ``dead`` are skipped.
+    """
+    slots: List[tuple[int, int, int]] = []
+    per_depth = 2 * variants
+    for slot in range(cursor, per_depth * POOL_MAX_DEPTH):
+        if len(slots) >= count:
+            break
+        depth, j = divmod(slot, per_depth)
+        variant = j // 2
+        if variant not in dead:
+            slots.append((slot, variant, depth * 20 + (j % 2) * 10))
+    return slots
+
+
+def _pool_key(base_query: str, location: Optional[str], htichips: Optional[str],
+              enrich_limit: int, max_requests: int, tier: int) -> str:
+    """One candidate pool per query, location bucket (the reverse-geocoded city/state) and filter chips.
+
+    The enrichment limit and request budget are part of the key: a list view
+    and a map view build their tiers differently and must not read each other's.
+    """
+    return make_key("evpool", base_query.lower(), location, htichips, enrich_limit, max_requests, tier)
+
+
+_event_indexes: "OrderedDict[tuple[str, Optional[str]], GeoIndex[Event]]" = OrderedDict()
+
+
+def _event_index(base_query: str, htichips: Optional[str]) -> GeoIndex[Event]:
+    """Spatial index of every geocoded event seen for a query and filter chips, whatever the user's location."""
+    scope = (base_query.lower(), htichips)
+    index = _event_indexes.get(scope)
+    if index is None:
+        index = _event_indexes[scope] = GeoIndex(EVENT_INDEX_TTL, max_entries=20_000)
+        while len(_event_indexes) > MAX_INDEX_SCOPES:
+            _event_indexes.popitem(last=False)
+    else:
+        _event_indexes.move_to_end(scope)
+    return index
+
+
+def _index_events(index: GeoIndex[Event], events: List[Event]) -> None:
+    for ev in events:
+        if ev.latitude is not None and ev.longitude is not None:
+            # Stored without the per-user distance; queries hand out copies.
+            index.add(ev.id, ev.latitude, ev.longitude, ev.model_copy(update={"distance_km": None}))
+
+
+def event_index_stats() -> dict:
+    return {f"{q}|{chips or ''}": index.stats() for (q, chips), index in _event_indexes.items()}
+
+
+def _rank(events: List[Event], user_lat: Optional[float], user_lon: Optional[float]) -> List[tuple[Event, Optional[float]]]:
+    """(event, distance_km) pairs, nearest first (local events by distance, then the rest) when the user's
+    position is known, else by start."""
+    batch = GeoBatch(events)
+    if user_lat is None or user_lon is None:
+        return [(events[i], None) for i in np.argsort(batch.start_rank, kind="stable").tolist()]
+    dist = batch.distances(user_lat, user_lon)
+    known = ~np.isnan(dist)
+    # Partition into local vs non-local; widen radius adaptively to ensure we have some locals
+    counts = np.searchsorted(np.sort(dist[known]), RADIUS_SEQ, side="right")
+    wide_enough = np.flatnonzero(counts >= MIN_LOCAL_RESULTS)
+    local = dist <= RADIUS_SEQ[wide_enough[0] if len(wide_enough) else -1]  # NaN (no coordinates) is never local
+    # Locals by (distance, start), then the rest by (has no distance, distance, start); lexsort's last key is primary.
+    order = np.lexsort((batch.start_rank, np.where(known, dist, 1e9), ~known, ~local))
+    dists = dist.tolist()
+    return [(events[i], dists[i] if known[i] else None) for i in order.tolist()]
+
+def _with_distance(ranked: List[tuple[Event, Optional[float]]]) -> List[Event]:
+    # Distances go on copies: index entries are shared between requests.
+    return [ev.model_copy(update={"distance_km": round(dist, 2)}) if dist is not None else ev for ev, dist in ranked]
+
+
+# Set by stream_events: called with ("batch" | "enriched", events) as upstream batches come in.
+_progress: contextvars.ContextVar[Optional[Callable[[str, List[Event]], None]]] = contextvars.ContextVar(
+    "events_progress", default=None)
+
+
+def _report(kind: str, batch: List[Event]) -> None:
+    report = _progress.get()
+    if report is not None and batch:
+        report(kind, batch)
 
-    async def producer():
-        try:
-            url = "https://nominatim.openstreetmap.org/reverse"
-            params = {"lat": lat, "lon": lon, "format": "json", "zoom": 10, "addressdetails": 1}
-            # Include a contact per Nominatim usage policy to reduce risk of throttling
-            headers = {"User-Agent": "PlayAxisEvents/1.0 (contact: support@playaxis.local)"}
-            async with httpx.AsyncClient(timeout=8.0) as client:
-                r = await client.get(url, params=params, headers=headers)
-                if r.status_code != 200:
-                    return None
-                data = r.json()
-                addr = data.get('address', {})
-                return {
-                    'city': addr.get('city') or addr.get('town') or addr.get('village') or addr.get('hamlet'),
-                    'state': addr.get('state') or addr.get('region'),
-                    'country': addr.get('country'),
-                }
-        except Exception:
-            return None
-    cached = await cache.get(key)
-    if cached is not None:
-        return cached
-    value = await producer()
-    await cache.set(key, value, 86400)  # 24h
-    return value
 
+async def _search(**params) -> List[Event]:
+    """fetch_google_events, reporting the batch to a listening stream before and after coordinate enrichment."""
+    if _progress.get() is None:
+        return await fetch_google_events(**params)
+    batch = await fetch_google_events(on_normalized=lambda events: _report("batch", events), **params)
+    _report("enriched", batch)
+    return batch
+
+@traced()
 async def aggregate_events(query: str = "", page: int = 1, limit: int = 20,
                            htichips: str | None = None,
                            min_lat: float | None = None, max_lat: float | None = None,
@@ -135,176 +298,247 @@ async def aggregate_events(query: str = "", page: int = 1, limit: int = 20,
         if base_query.lower() not in [q.lower() for q in queries]:
             queries.append(base_query)
 
-        # Fetch & aggregate with pagination and early exit once enough local results.
-        aggregated: List[Event] = []
-        seen_ids = set()
+        viewport = None not in (min_lat, max_lat, min_lon, max_lon)
         target_local = max(MIN_LOCAL_RESULTS * 2, limit)  # prefer at least enough locals to fill current page
-
-        # Determine enrichment and request budgets based on whether a viewport filter is present.
-        enrich_limit_global = 40 if None not in (min_lat, max_lat, min_lon, max_lon) else 6
-        requests_used = 0
+        # Use higher enrichment when viewport is present so more items gain coordinates for markers.
+        enrich_limit_global = 40 if viewport else 6
         # When a viewport is provided, use a slightly higher request budget to improve chances of getting
         # events with coordinates that fall inside the bbox for map markers.
-        MAX_REQUESTS = 10 if None not in (min_lat, max_lat, min_lon, max_lon) else 6
-        start_offsets = [max(0, (page - 1) * 10), max(0, (page - 1) * 10) + 10]
-        serp_rate_limited = bool(await cache.get("serpapi:rate_limited"))
-        if serp_rate_limited:
-            logger.info("SerpApi on cooldown (rate limited previously); skipping SerpApi queries this request.")
-        for idx, qstr in enumerate(queries):
-            if requests_used >= MAX_REQUESTS:
-                break
-            for off in start_offsets:
-                if requests_used >= MAX_REQUESTS:
-                    break
-                if serp_rate_limited:
-                    break
+        max_requests = 10 if viewport else 6
+
+        def serp_budget() -> int:
+            """SerpApi searches one pool step may spend (0 while the circuit is open or today's quota share is gone)."""
+            if not http_clients.breaker("serpapi").available():
+                logger.info("SerpApi circuit open (rate limited or failing); skipping SerpApi queries this request.")
+                return 0
+            # Spread the monthly SerpApi allowance over the month: fewer searches per request as today's share runs down.
+            budget = quota_ledger.scaled("serpapi", max_requests)
+            if budget == 0:
+                logger.info("SerpApi daily quota share used up; skipping SerpApi queries this request.")
+            return budget
+
+        def local_enough() -> Callable[[List[Event]], bool]:
+            """A fresh "enough local events yet?" predicate for one fan-out (pool refreshes rerun first_tier)."""
+            counted = [0, 0]  # events already looked at, how many of them are local
+
+            def enough(events: List[Event]) -> bool:
+                if user_lat is None or user_lon is None:
+                    return False
+                # The merged list only grows, so only the events added since the last call are measured.
+                fresh = GeoBatch(events[counted[0]:])
+                counted[0] = len(events)
+                counted[1] += int(np.count_nonzero(fresh.distances(user_lat, user_lon) <= LOCAL_RADIUS_KM))
+                return counted[1] >= target_local
+            return enough
+
+        async def search_step(prev: Optional[dict], budget: int,
+                              enough: Callable[[List[Event]], bool]) -> dict:
+            """Run the next ``budget`` searches of the pool plan; a variant that comes back empty is not paged further."""
+            cursor = prev["cursor"] if prev else 0
+            dead = set(prev["dead"]) if prev else set()
+            slots = _plan_slots(len(queries), cursor, budget, dead)
+            plan = [(queries[v], off) for _, v, off in slots]
+            sizes: dict[tuple[str, int], int] = {}
+
+            async def fetch(qstr: str, off: int) -> List[Event]:
+                batch = await _search(query=qstr, start=off, htichips=htichips, location=location_param,
+                                      no_cache=True, enrich_limit=enrich_limit_global)
+                sizes[(qstr, off)] = len(batch)
+                return batch
+
+            found, used, limited = await _fetch_plan(plan, fetch, enough)
+            for _, v, off in slots[:used]:
+                if sizes.get((queries[v], off)) == 0:
+                    dead.add(v)
+            next_cursor = slots[used - 1][0] + 1 if used else cursor
+            logger.info("events.pool loc='%s' searches=%s used=%s -> %s", location_param, len(plan), used, len(found))
+            return {
+                "events": found,
+                "cursor": next_cursor,
+                "dead": sorted(dead),
+                "done": limited or not _plan_slots(len(queries), next_cursor, 1, dead),
+                "serpapi_exhausted": limited,
+                "scraper_fallback": False,
+                "scraper_limited": False,
+            }
+
+        async def first_tier() -> dict:
+            budget = serp_budget()
+            if budget:
+                # Fetch & aggregate concurrently, stopping early once enough local results are in.
+                first = await search_step(None, budget, local_enough())
+            else:
+                first = {"events": [], "cursor": 0, "dead": [], "done": True, "serpapi_exhausted": True,
+                         "scraper_fallback": False, "scraper_limited": False}
+            if first["events"]:
+                return first
+            first["done"] = True  # whatever the fallbacks below find is the whole pool
+            events = first["events"]
+            seen_ids = set()
+            serp_rate_limited = first["serpapi_exhausted"]
+            # If localized aggregation yielded no results and we used a location, retry queries without location (with pagination)
+            if location_param and not serp_rate_limited:
+                for qstr in queries:
+                    for off in (0, 10):
+                        try:
+                            batch = await _search(query=qstr, start=off, htichips=htichips, location=None, enrich_limit=enrich_limit_global)
+                        except SerpApiRateLimitError:
+                            serp_rate_limited = True
+                            logger.warning("SerpApi quota exhausted (retry phase); switching to fallback.")
+                            break
+                        logger.info("events.retry-no-loc q='%s' start=%s -> %s", qstr, off, len(batch))
+                        for ev in batch:
+                            if ev.id in seen_ids:
+                                continue
+                            seen_ids.add(ev.id)
+                            events.append(ev)
+                        if events:
+                            break
+                    if events or serp_rate_limited:
+                        break
+            # Final safety fallback hierarchy:
+            if not events and not serp_rate_limited:
+                # 1. Attempt another broad SerpApi call without location (unless already rate limited).
                 try:
-                    # Use higher enrichment when viewport is present so more items gain coordinates for markers.
-                    batch = await fetch_google_events(query=qstr, start=off, htichips=htichips, location=location_param, no_cache=True, enrich_limit=enrich_limit_global)
+                    fallback_batch = await _search(query=base_query, start=0, htichips=htichips, location=None, enrich_limit=enrich_limit_global)
+                    events.extend(fallback_batch)
                 except SerpApiRateLimitError:
                     serp_rate_limited = True
-                    # set a short cooldown (e.g., 12 hours) to skip SerpApi until quota refresh; can adjust
-                    await cache.set("serpapi:rate_limited", True, 60*60*12)
-                    logger.warning("SerpApi quota exhausted; switching to fallback.")
-                    break
-                requests_used += 1
-                logger.info("events.fetch q='%s' loc='%s' start=%s -> %s", qstr, location_param, off, len(batch))
-                for ev in batch:
-                    if ev.id in seen_ids:
-                        continue
-                    seen_ids.add(ev.id)
-                    aggregated.append(ev)
-                # Annotate distance for locality evaluation progressively if coords given.
-                if user_lat is not None and user_lon is not None:
-                    local_count = 0
-                    for ev in aggregated:
-                        if getattr(ev, '_distance_km', None) is None and ev.latitude is not None and ev.longitude is not None:
-                            try:
-                                setattr(ev, '_distance_km', _haversine(user_lat, user_lon, ev.latitude, ev.longitude))
-                            except Exception:
-                                setattr(ev, '_distance_km', None)
-                        if getattr(ev, '_distance_km', None) is not None and ev._distance_km <= LOCAL_RADIUS_KM:
-                            local_count += 1
-                    if local_count >= target_local:
-                        break
-            # if we met target locals after inner loop
-            if user_lat is not None and user_lon is not None:
-                local_count = len([e for e in aggregated if getattr(e, '_distance_km', None) is not None and e._distance_km <= LOCAL_RADIUS_KM])
-                if local_count >= target_local:
-                    break
-        events = aggregated
-        # If localized aggregation yielded no results and we used a location, retry queries without location (with pagination)
-        if not events and location_param and not serp_rate_limited:
-            for idx, qstr in enumerate(queries):
-                for off in start_offsets:
-                    if serp_rate_limited:
-                        break
-                    try:
-                        batch = await fetch_google_events(query=qstr, start=off, htichips=htichips, location=None, enrich_limit=enrich_limit_global)
-                    except SerpApiRateLimitError:
-                        serp_rate_limited = True
-                        await cache.set("serpapi:rate_limited", True, 60*60*12)
-                        logger.warning("SerpApi quota exhausted (retry phase); switching to fallback.")
-                        break
-                    logger.info("events.retry-no-loc q='%s' start=%s -> %s", qstr, off, len(batch))
-                    for ev in batch:
-                        if ev.id in seen_ids:
-                            continue
-                        seen_ids.add(ev.id)
-                        events.append(ev)
-                    if events:
+                    logger.warning("SerpApi quota exhausted (final broad attempt); switching to fallback.")
+            first["serpapi_exhausted"] = serp_rate_limited
+            if not events:
+                # 2. ScraperAPI HTML fallback (best-effort) using a localized or base query.
+                fallback_query = base_query
+                if user_lat is not None and user_lon is not None and used_city_state and used_city_state[0]:
+                    city, state = used_city_state
+                    if city and state:
+                        fallback_query = f"events in {city} {state}"
+                    elif city:
+                        fallback_query = f"events in {city}"
+                scraped = await fetch_events_via_scraperapi(fallback_query)
+                _report("batch", scraped)
+                if scraped:
+                    events.extend(scraped)
+                    first["scraper_fallback"] = True
+                    # Heuristic: if we got fewer than 3, mark limited to display a UI hint
+                    if len(scraped) < 3:
+                        first["scraper_limited"] = True
+            return first
+
+        async def tier(n: int) -> dict:
+            """Tier ``n`` of the candidate pool: the first cascade, then one more search step per tier."""
+            async def produce():
+                if n == 0:
+                    return await first_tier()
+                prev = await tier(n - 1)
+                budget = 0 if prev["done"] else serp_budget()
+                if not budget:
+                    return {**prev, "events": [], "done": True}
+                return await search_step(prev, budget, lambda _events: False)
+            return await cache.get_or_set(_pool_key(base_query, location_param, htichips, enrich_limit_global, max_requests, n), EVENTS_CACHE_TTL, produce)
+
+        # Pages, limits and viewports are all cut from the same pool; it only grows when a page runs past its end.
+        needed = page * limit if limit else 0
+        index = _event_index(base_query, htichips)
+        tiers: List[dict] = []
+        if viewport:
+            # Pans over ground the spatial index already covers are answered from it, without touching the pool.
+            hits = index.within(min_lat, max_lat, min_lon, max_lon)
+            if not hits or len(hits) < min(needed, needed - limit + VIEWPORT_INDEX_MIN):
+                while True:
+                    before = len(hits)
+                    tiers.append(await tier(len(tiers)))
+                    _index_events(index, tiers[-1]["events"])
+                    hits = index.within(min_lat, max_lat, min_lon, max_lon)
+                    # Deeper tiers page further into searches around the user's location; once one adds
+                    # nothing inside this viewport (panned elsewhere), further ones will not either.
+                    if (tiers[-1]["done"] or len(tiers) >= POOL_MAX_TIERS or len(hits) >= needed
+                            or len(hits) <= before):
                         break
-                if events:
-                    break
-        # Final safety fallback hierarchy:
-        if not events and not serp_rate_limited:
-            # 1. Attempt another broad SerpApi call without location (unless already rate limited).
-            try:
-                fallback_batch = await fetch_google_events(query=base_query, start=max(0, (page - 1) * 10), htichips=htichips, location=None, enrich_limit=enrich_limit_global)
-                events.extend(fallback_batch)
-            except SerpApiRateLimitError:
-                serp_rate_limited = True
-                await cache.set("serpapi:rate_limited", True, 60*60*12)
-                logger.warning("SerpApi quota exhausted (final broad attempt); switching to fallback.")
-        scraper_used = False
-        scraper_limited = False
-        if not events:
-            # 2. ScraperAPI HTML fallback (best-effort) using a localized or base query.
-            fallback_query = base_query
-            if user_lat is not None and user_lon is not None and used_city_state and used_city_state[0]:
-                city, state = used_city_state
-                if city and state:
-                    fallback_query = f"events in {city} {state}"
-                elif city:
-                    fallback_query = f"events in {city}"
-            scraped = await fetch_events_via_scraperapi(fallback_query)
-            if scraped:
-                events.extend(scraped)
-                scraper_used = True
-                # Heuristic: if we got fewer than 3, mark limited to display a UI hint
-                if len(scraped) < 3:
-                    scraper_limited = True
-        # Filter by bounding box if provided
-        if None not in (min_lat, max_lat, min_lon, max_lon):
-            events_all = events[:]
-            events = [e for e in events if (
-                e.latitude is not None and e.longitude is not None and
-                min_lat <= e.latitude <= max_lat and min_lon <= e.longitude <= max_lon
-            )]
             # Fallback: if filtering produced zero events, broaden by taking nearest to center
-            if not events and events_all:
+            if not hits:
                 center_lat = (min_lat + max_lat) / 2.0
                 center_lon = (min_lon + max_lon) / 2.0
-                with_coords = [e for e in events_all if e.latitude is not None and e.longitude is not None]
-                with_coords.sort(key=lambda e: _haversine(center_lat, center_lon, e.latitude, e.longitude))
-                events = with_coords[:min(limit or 20, 40)]
-        # Distance annotation & local prioritization
-        if user_lat is not None and user_lon is not None:
-            for ev in events:
-                if ev.latitude is not None and ev.longitude is not None:
-                    try:
-                        dist = _haversine(user_lat, user_lon, ev.latitude, ev.longitude)
-                    except Exception:
-                        dist = None
-                else:
-                    dist = None
-                setattr(ev, '_distance_km', dist if dist is not None else getattr(ev, '_distance_km', None))
-            # Partition into local vs non-local; widen radius adaptively to ensure we have some locals
-            radius_seq = [50.0, 100.0, LOCAL_RADIUS_KM, 250.0, 500.0]
-            local = []
-            for r in radius_seq:
-                local = [e for e in events if (e._distance_km is not None and e._distance_km <= r)]
-                if len(local) >= MIN_LOCAL_RESULTS or r == radius_seq[-1]:
-                    break
-            non_local = [e for e in events if e not in local]
-            local.sort(key=lambda e: (e._distance_km, e.start or "9999"))
-            non_local.sort(key=lambda e: (e._distance_km is None, e._distance_km if e._distance_km is not None else 1e9, e.start or "9999"))
-            if len(local) < MIN_LOCAL_RESULTS:
-                events = local + non_local
-            else:
-                events = local + non_local
+                hits = [ev for _, ev in index.nearest(center_lat, center_lon, min(limit or 20, 40))]
+            events = _rank(hits, user_lat, user_lon)
         else:
-            events.sort(key=lambda e: (e.start or "9999"))
-        if limit:
-            trimmed = events[:limit]
-        else:
-            trimmed = events
-        # Expose distance_km outward (non schema field) by embedding into id-stable copy if desired; simplest is to attach attribute.
-        for ev in trimmed:
-            if hasattr(ev, '_distance_km') and ev._distance_km is not None:
-                # monkey-patch attribute for consumer (FastAPI will include since pydantic by default excludes unknown, so we may later extend schema)
-                setattr(ev, 'distance_km', round(ev._distance_km, 2))
+            seen_ids: set = set()
+            tier_events: List[List[Event]] = []
+            while True:
+                tiers.append(await tier(len(tiers)))
+                _index_events(index, tiers[-1]["events"])
+                fresh = [ev for ev in tiers[-1]["events"] if ev.id not in seen_ids]
+                seen_ids.update(ev.id for ev in fresh)
+                tier_events.append(fresh)
+                if tiers[-1]["done"] or len(tiers) >= POOL_MAX_TIERS or sum(map(len, tier_events)) >= needed:
+                    break
+            # Rank tier by tier, so growing the pool never reshuffles pages that were already served.
+            events = [ranked for t in tier_events for ranked in _rank(t, user_lat, user_lon)]
+        data = _with_distance(events[(page - 1) * limit:page * limit] if limit else events)
         return EventsResponse(
-            total=len(trimmed),
-            data=trimmed,
-            serpapi_exhausted=serp_rate_limited or None,
-            scraper_fallback=scraper_used or None,
-            scraper_limited=scraper_limited or None,
+            total=len(data),
+            data=data,
+            serpapi_exhausted=any(t["serpapi_exhausted"] for t in tiers) or None,
+            scraper_fallback=any(t["scraper_fallback"] for t in tiers[:1]) or None,
+            scraper_limited=any(t["scraper_limited"] for t in tiers[:1]) or None,
         )
 
-    cached = await cache.get(key)
-    if cached:
-        return cached
-    result = await producer()
-    await cache.set(key, result, EVENTS_CACHE_TTL)
-    return result
\ No newline at end of file
+    return await cache.get_or_set(key, EVENTS_CACHE_TTL, producer)
+
+
+async def stream_events(query: str = "", page: int = 1, limit: int = 20,
+                        htichips: str | None = None,
+                        min_lat: float | None = None, max_lat: float | None = None,
+                        min_lon: float | None = None, max_lon: float | None = None,
+                        user_lat: Optional[float] = None, user_lon: Optional[float] = None) -> AsyncIterator[dict]:
+    """Async-generator version of aggregate_events, for rendering results while upstreams are still answering.
+
+    Yields ``{"type": "events", ...}`` frames with the ranked first page of
+    everything seen so far, each time a SerpApi page is normalized or its
+    coordinates come in (``added`` / ``enriched`` say what changed), then one
+    ``{"type": "done", ...}`` frame with the aggregate_events response and its
+    serpapi_exhausted / scraper_fallback flags. Progress frames follow arrival
+    order and are provisional; the done frame is the page /events returns.
+    Warm requests (cached page or pool) and pages past the first only get the
+    done frame.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    token = _progress.set(lambda kind, batch: queue.put_nowait((kind, list(batch))))
+    try:
+        task = asyncio.ensure_future(aggregate_events(query=query, page=page, limit=limit, htichips=htichips,
+                                                      min_lat=min_lat, max_lat=max_lat, min_lon=min_lon, max_lon=max_lon,
+                                                      user_lat=user_lat, user_lon=user_lon))
+    finally:
+        _progress.reset(token)
+    task.add_done_callback(lambda _task: queue.put_nowait(None))
+    bbox = (min_lat, max_lat, min_lon, max_lon)
+    seen: dict[str, Event] = {}
+    located: set = set()
+    try:
+        while (item := await queue.get()) is not None:
+            kind, batch = item
+            if page != 1:
+                continue
+            added = [ev for ev in batch if ev.id not in seen]
+            seen.update((ev.id, ev) for ev in added)
+            enriched = [ev.id for ev in batch if kind == "enriched" and ev.latitude is not None and ev.id not in located]
+            located.update(ev.id for ev in batch if ev.latitude is not None)
+            if not added and not enriched:
+                continue
+            events = list(seen.values())
+            if None not in bbox:
+                events = [events[i] for i in np.flatnonzero(GeoBatch(events).in_bbox(*bbox)).tolist()]
+            ranked = _rank(events, user_lat, user_lon)
+            yield {
+                "type": "events",
+                "total": len(events),
+                "added": len(added),
+                "enriched": enriched,
+                "data": [ev.model_dump() for ev in _with_distance(ranked[:limit] if limit else ranked)],
+            }
+        response = await task
+        yield {"type": "done", **response.model_dump(exclude={"events"})}
+    finally:
+        if not task.done():
+            # The client went away: let the searches finish and fill the caches rather than waste them.
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
@@ -1,125 +1,167 @@
 import logging
 import re
+import hashlib
 from typing import List, Dict, Any, Optional
-import httpx
 from bs4 import BeautifulSoup  # already in requirements
-from app.core.cache import cache
+from app.core.cache import Uncached, cache, cached, make_key
+from app.core.http import http_client
+from app.core.ratelimit import UpstreamThrottled
+from app.services import ttl_policy
 
 logger = logging.getLogger(__name__)
 
-WIKI_TTL = 3600 * 6  # 6 hours
+WIKI_TTL = 3600 * 6  # 6 hours: ceiling for a table that keeps coming back unchanged
+PAGE_REVALIDATE_TTL = 10 * 60  # a fetched page is re-checked (conditional GET) after this
 
 
-async def _fetch(url: str, ttl: int = 300) -> Optional[str]:
-    key = f"rawfetch:{url}".lower()
-    cached = await cache.get(key)
-    if cached is not None:
-        return cached
+def _rows_ttl(namespace: str):
+    """TTL callable for a ``@cached`` scraper: short while the table changes, backing off to WIKI_TTL while it doesn't."""
+    def ttl(rows, **arguments) -> int:
+        return min(WIKI_TTL, ttl_policy.standings_ttl(make_key(namespace, *arguments.values()), rows))
+    return ttl
+
+
+@cached("rawfetch", ttl=lambda page, ttl, **_: ttl, key=lambda url, ttl=PAGE_REVALIDATE_TTL: url)
+async def _fetch_page(url: str, ttl: int = PAGE_REVALIDATE_TTL) -> Optional[Dict[str, Any]]:
+    """Fetch a page as ``{"html", "digest", "etag", "last_modified"}``.
+
+    Once the cached copy expires its validators go out as If-None-Match /
+    If-Modified-Since; on 304 the copy is kept (same digest) without
+    downloading the page again.
+    """
+    previous = await cache.get(_fetch_page.cache_key(url), allow_stale=True)
+    headers = {}
+    if previous:
+        if previous.get("etag"):
+            headers["If-None-Match"] = previous["etag"]
+        if previous.get("last_modified"):
+            headers["If-Modified-Since"] = previous["last_modified"]
     try:
-        async with httpx.AsyncClient(timeout=20.0, headers={"User-Agent": "MultiSportBot/1.0"}) as client:
-            r = await client.get(url)
-            if r.status_code != 200:
-                await cache.set(key, None, 120)
-                return None
-            text = r.text
-            await cache.set(key, text, ttl)
-            return text
+        client = http_client("wikipedia")
+        r = await client.get(url, headers=headers, extensions={"retry": True, "hedge": True})
+        if r.status_code == 304 and previous:
+            logger.debug("Not modified url=%s", url)
+            return previous
+        if r.status_code != 200:
+            return None  # negative entry, rawfetch negative_ttl
+        return {
+            "html": r.text,
+            "digest": hashlib.sha1(r.content).hexdigest(),
+            "etag": r.headers.get("ETag"),
+            "last_modified": r.headers.get("Last-Modified"),
+        }
+    except UpstreamThrottled:
+        raise Uncached()
     except Exception as e:  # noqa: BLE001
         logger.warning("Fetch failed url=%s err=%s", url, e)
-        await cache.set(key, None, 120)
         return None
 
 
+async def _table_rows(url: str, parse_fn, key: tuple) -> Optional[List[Dict[str, Any]]]:
+    """Fetch (or revalidate) a page and parse it; None (cached as a failure by the caller) if the fetch failed.
+
+    ``key`` names the parse (scraper + its arguments); rows are memoized per key
+    and page digest, so an unchanged page is not parsed again. Callers run
+    inside their own refresh, so a stale page is revalidated here (conditional
+    GET) rather than served, and the TTL back-off sees the current table.
+    """
+    page = await _fetch_page.fresh(url)
+    if not page:
+        return None
+    # Plain get/set rather than @cached: a refresher would keep the page HTML alive with the entry.
+    rows_key = make_key("wikirows", *key, page["digest"])
+    rows = await cache.get(rows_key, allow_stale=True)  # rows for a digest never change
+    if rows is None:
+        try:
+            rows = parse_fn(page["html"])
+        except Exception as e:  # noqa: BLE001
+            logger.warning("Parse failure key=%s err=%s", key, e)
+            rows = []
+        await cache.set(rows_key, rows, WIKI_TTL)
+    return rows
+
+
+@cached("fifa_rankings", ttl=_rows_ttl("fifa_rankings"), negative_value=[])
 async def get_fifa_world_rankings(limit: int = 50) -> List[Dict[str, Any]]:
     """Scrape FIFA men's world rankings from Wikipedia (simple parse)."""
     url = "https://en.wikipedia.org/wiki/FIFA_Men%27s_World_Ranking"
-    key = f"fifa_rankings:{limit}".lower()
-    cached = await cache.get(key)
-    if cached is not None:
-        return cached
-    html = await _fetch(url, ttl=WIKI_TTL)
-    if not html:
-        return []
-    soup = BeautifulSoup(html, 'html.parser')
-    # Find first wikitable sortable containing ranking data
-    table = soup.find('table', {'class': re.compile(r'wikitable')})
-    rows_out = []
-    if table:
-        for row in table.find_all('tr')[1:]:
-            cols = [c.get_text(strip=True) for c in row.find_all(['td', 'th'])]
-            if len(cols) < 3:
-                continue
-            # Typical format: Rank, Team, Points, ...
-            try:
-                rank = int(re.sub(r'[^0-9]', '', cols[0]) or '0')
-            except ValueError:
-                continue
-            team = cols[1]
-            points_raw = cols[2]
-            points = None
-            try:
-                points = float(points_raw.replace(',', ''))
-            except Exception:  # noqa: BLE001
-                pass
-            rows_out.append({
-                'Rank': rank,
-                'Team': team,
-                'Points': points,
-            })
-            if len(rows_out) >= limit:
-                break
-    await cache.set(key, rows_out, WIKI_TTL)
-    return rows_out
+    def parse(html: str):
+        soup = BeautifulSoup(html, 'html.parser')
+        # Find first wikitable sortable containing ranking data
+        table = soup.find('table', {'class': re.compile(r'wikitable')})
+        rows_out = []
+        if table:
+            for row in table.find_all('tr')[1:]:
+                cols = [c.get_text(strip=True) for c in row.find_all(['td', 'th'])]
+                if len(cols) < 3:
+                    continue
+                # Typical format: Rank, Team, Points, ...
+                try:
+                    rank = int(re.sub(r'[^0-9]', '', cols[0]) or '0')
+                except ValueError:
+                    continue
+                team = cols[1]
+                points_raw = cols[2]
+                points = None
+                try:
+                    points = float(points_raw.replace(',', ''))
+                except Exception:  # noqa: BLE001
+                    pass
+                rows_out.append({
+                    'Rank': rank,
+                    'Team': team,
+                    'Points': points,
+                })
+                if len(rows_out) >= limit:
+                    break
+        return rows_out
+    return await _table_rows(url, parse, ("fifa_rankings", limit))
 
 
+@cached("skiing_wc_overall", ttl=_rows_ttl("skiing_wc_overall"), negative_value=[])
 async def get_skiing_standings(limit: int = 30) -> List[Dict[str, Any]]:
     """Scrape FIS Alpine World Cup (overall) standings (men) from Wikipedia."""
     url = "https://en.wikipedia.org/wiki/2024%E2%80%9325_FIS_Alpine_Ski_World_Cup"
-    key = f"skiing_wc_overall:{limit}".lower()
-    cached = await cache.get(key)
-    if cached is not None:
-        return cached
-    html = await _fetch(url, ttl=WIKI_TTL)
-    if not html:
-        return []
-    soup = BeautifulSoup(html, 'html.parser')
-    # Heuristic: first table with 'Overall' in caption/head or first wikitable sortable
-    candidate_tables = soup.find_all('table', {'class': re.compile(r'wikitable')})
-    rows_out = []
-    for tbl in candidate_tables:
-        caption = (tbl.find('caption').get_text(strip=True).lower() if tbl.find('caption') else '')
-        if 'overall' not in caption and len(candidate_tables) > 1:
-            continue
-        for row in tbl.find_all('tr')[1:]:
-            cols = [c.get_text(strip=True) for c in row.find_all('td')]
-            # Expecting at least: Rank, Name, Nation, Points (varies)
-            if len(cols) < 4:
-                continue
-            try:
-                rank = int(re.sub(r'[^0-9]', '', cols[0]) or '0')
-            except ValueError:
+    def parse(html: str):
+        soup = BeautifulSoup(html, 'html.parser')
+        # Heuristic: first table with 'Overall' in caption/head or first wikitable sortable
+        candidate_tables = soup.find_all('table', {'class': re.compile(r'wikitable')})
+        rows_out = []
+        for tbl in candidate_tables:
+            caption = (tbl.find('caption').get_text(strip=True).lower() if tbl.find('caption') else '')
+            if 'overall' not in caption and len(candidate_tables) > 1:
                 continue
-            name = cols[1]
-            nation = cols[2]
-            points = None
-            try:
-                points = int(re.sub(r'[^0-9]', '', cols[-1]) or '0')
-            except ValueError:
+            for row in tbl.find_all('tr')[1:]:
+                cols = [c.get_text(strip=True) for c in row.find_all('td')]
+                # Expecting at least: Rank, Name, Nation, Points (varies)
+                if len(cols) < 4:
+                    continue
+                try:
+                    rank = int(re.sub(r'[^0-9]', '', cols[0]) or '0')
+                except ValueError:
+                    continue
+                name = cols[1]
+                nation = cols[2]
                 points = None
-            rows_out.append({
-                'Rank': rank,
-                'Athlete': name,
-                'Nation': nation,
-                'Points': points,
-            })
-            if len(rows_out) >= limit:
+                try:
+                    points = int(re.sub(r'[^0-9]', '', cols[-1]) or '0')
+                except ValueError:
+                    points = None
+                rows_out.append({
+                    'Rank': rank,
+                    'Athlete': name,
+                    'Nation': nation,
+                    'Points': points,
+                })
+                if len(rows_out) >= limit:
+                    break
+            if rows_out:
                 break
-        if rows_out:
-            break
-    await cache.set(key, rows_out, WIKI_TTL)
-    return rows_out
+        return rows_out
+    return await _table_rows(url, parse, ("skiing_wc_overall", limit))
 
 
+@cached("topsoc", ttl=1800, negative_ttl=300, negative_value=[])
 async def get_soccer_top_scorers(league_id: str, season: Optional[str] = None, limit: int = 25) -> List[Dict[str, Any]]:
     """Try TheSportsDB top scorers endpoint; return simplified rows.
 
@@ -131,52 +173,32 @@ async def get_soccer_top_scorers(league_id: str, season: Optional[str] = None, l
     params = {"l": league_id}
     if season:
         params["s"] = season
-    cache_key = f"topsoc:{league_id}:{season}".lower()
-    cached = await cache.get(cache_key)
-    if cached is not None:
-        return cached
     base = "https://www.thesportsdb.com/api/v1/json/3/topscorers.php"
     try:
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            r = await client.get(base, params=params)
-            if r.status_code != 200:
-                await cache.set(cache_key, [], 300)
-                return []
-            data = r.json()
-            scorers = data.get('topscorers') or []
-            rows = []
-            for idx, s in enumerate(scorers[:limit]):
-                rows.append({
-                    'Rank': idx + 1,
-                    'Player': s.get('strPlayer'),
-                    'Team': s.get('strTeam'),
-                    'Goals': s.get('intGoals') or s.get('intGoalsOverall') or s.get('intGoal') or None,
-                })
-            await cache.set(cache_key, rows, 1800)  # 30 min
-            return rows
+        client = http_client("thesportsdb")
+        r = await client.get(base, params=params, extensions={"retry": True})
+        if r.status_code != 200:
+            return None
+        data = r.json()
+        scorers = data.get('topscorers') or []
+        rows = []
+        for idx, s in enumerate(scorers[:limit]):
+            rows.append({
+                'Rank': idx + 1,
+                'Player': s.get('strPlayer'),
+                'Team': s.get('strTeam'),
+                'Goals': s.get('intGoals') or s.get('intGoalsOverall') or s.get('intGoal') or None,
+            })
+        return rows
+    except UpstreamThrottled:
+        raise Uncached()
     except Exception as e:  # noqa: BLE001
         logger.warning("Top scorers fetch fail league=%s err=%s", league_id, e)
-        await cache.set(cache_key, [], 600)
-        return []
+        return None
 
 # -------- Additional Sports Ranking Scrapers -------- #
 
-async def _cached_table_rows(cache_key: str, url: str, parse_fn, ttl: int = WIKI_TTL) -> List[Dict[str, Any]]:
-    cached = await cache.get(cache_key)
-    if cached is not None:
-        return cached
-    html = await _fetch(url, ttl=ttl)
-    if not html:
-        return []
-    try:
-        rows = parse_fn(html)
-    except Exception as e:  # noqa: BLE001
-        logger.warning("Parse failure key=%s err=%s", cache_key, e)
-        rows = []
-    await cache.set(cache_key, rows, ttl)
-    return rows
-
-
+@cached("tennis_atp", ttl=_rows_ttl("tennis_atp"), negative_value=[])
 async def get_tennis_rankings(limit: int = 50) -> List[Dict[str, Any]]:
     """Scrape ATP singles rankings (top n) from Wikipedia."""
     url = "https://en.wikipedia.org/wiki/ATP_rankings"
@@ -209,9 +231,10 @@ async def get_tennis_rankings(limit: int = 50) -> List[Dict[str, Any]]:
                 if len(rows_out) >= limit:
                     return rows_out
         return rows_out
-    return await _cached_table_rows(f"tennis_atp:{limit}", url, parse)
+    return await _table_rows(url, parse, ("tennis_atp", limit))
 
 
+@cached("golf_owgr", ttl=_rows_ttl("golf_owgr"), negative_value=[])
 async def get_golf_rankings(limit: int = 50) -> List[Dict[str, Any]]:
     """Scrape OWGR top players from Wikipedia."""
     url = "https://en.wikipedia.org/wiki/Official_World_Golf_Ranking"
@@ -244,9 +267,10 @@ async def get_golf_rankings(limit: int = 50) -> List[Dict[str, Any]]:
                 if len(rows_out) >= limit:
                     return rows_out
         return rows_out
-    return await _cached_table_rows(f"golf_owgr:{limit}", url, parse)
+    return await _table_rows(url, parse, ("golf_owgr", limit))
 
 
+@cached("cricket_odi", ttl=_rows_ttl("cricket_odi"), negative_value=[])
 async def get_cricket_rankings(limit: int = 30) -> List[Dict[str, Any]]:
     """Scrape ICC Men's ODI team rankings from Wikipedia."""
     url = "https://en.wikipedia.org/wiki/ICC_Men%27s_ODI_Team_Rankings"
@@ -270,9 +294,10 @@ async def get_cricket_rankings(limit: int = 30) -> List[Dict[str, Any]]:
                 if len(rows_out) >= limit:
                     break
         return rows_out
-    return await _cached_table_rows(f"cricket_odi:{limit}", url, parse)
+    return await _table_rows(url, parse, ("cricket_odi", limit))
 
 
+@cached("rugby_world", ttl=_rows_ttl("rugby_world"), negative_value=[])
 async def get_rugby_rankings(limit: int = 30) -> List[Dict[str, Any]]:
     """Scrape World Rugby Rankings from Wikipedia."""
     url = "https://en.wikipedia.org/wiki/World_Rugby_Rankings"
@@ -295,9 +320,10 @@ async def get_rugby_rankings(limit: int = 30) -> List[Dict[str, Any]]:
                 if len(rows_out) >= limit:
                     break
         return rows_out
-    return await _cached_table_rows(f"rugby_world:{limit}", url, parse)
+    return await _table_rows(url, parse, ("rugby_world", limit))
 
 
+@cached("cycling_uci", ttl=_rows_ttl("cycling_uci"), negative_value=[])
 async def get_cycling_rankings(limit: int = 50) -> List[Dict[str, Any]]:
     """Scrape UCI World Ranking riders from Wikipedia."""
     url = "https://en.wikipedia.org/wiki/UCI_World_Ranking"
@@ -324,9 +350,10 @@ async def get_cycling_rankings(limit: int = 50) -> List[Dict[str, Any]]:
                 if len(rows_out) >= limit:
                     return rows_out
         return rows_out
-    return await _cached_table_rows(f"cycling_uci:{limit}", url, parse)
+    return await _table_rows(url, parse, ("cycling_uci", limit))
 
 
+@cached("running_records", ttl=_rows_ttl("running_records"), negative_value=[])
 async def get_running_records(limit: int = 20) -> List[Dict[str, Any]]:
     """Scrape selected world records in athletics (men) from Wikipedia."""
     url = "https://en.wikipedia.org/wiki/List_of_world_records_in_athletics"
@@ -347,7 +374,32 @@ async def get_running_records(limit: int = 20) -> List[Dict[str, Any]]:
                 if len(rows_out) >= limit:
                     return rows_out
         return rows_out
-    return await _cached_table_rows(f"running_records:{limit}", url, parse)
+    return await _table_rows(url, parse, ("running_records", limit))
+
+
+@cached("esports_highest", ttl=_rows_ttl("esports_highest"), negative_ttl=1800, negative_value=[])
+async def _esports_page_rows(url: str, limit: int) -> Optional[List[Dict[str, Any]]]:
+    def parse(html: str) -> List[Dict[str, Any]]:
+        soup = BeautifulSoup(html, 'html.parser')
+        table = soup.find('table', {'class': 'wikitable'})
+        rows_out = []
+        if table:
+            for tr in table.find_all('tr')[1:]:
+                tds = tr.find_all('td')
+                if len(tds) < 4:
+                    continue
+                try:
+                    rank = int(tds[0].get_text(strip=True))
+                except ValueError:
+                    continue
+                player = tds[1].get_text(strip=True)
+                country = tds[2].get_text(strip=True)
+                earnings = tds[3].get_text(strip=True)
+                rows_out.append({'Rank': rank, 'Player': player, 'Country': country, 'Earnings': earnings})
+                if len(rows_out) >= limit:
+                    break
+        return rows_out
+    return await _table_rows(url, parse, ("esports_highest", limit))
 
 
 async def get_esports_rankings(limit: int = 25) -> List[Dict[str, Any]]:
@@ -360,46 +412,50 @@ async def get_esports_rankings(limit: int = 25) -> List[Dict[str, Any]]:
         "https://en.wikipedia.org/wiki/List_of_highest_paid_esports_players",  # alt without hyphen
     ]
     for url in candidates:
-        cache_key = f"esports_highest:{limit}:{url.split('/')[-1].lower()}"
-        cached = await cache.get(cache_key)
-        if cached is not None:
-            if cached:  # non-empty success
-                return cached
-            continue
-        html = await _fetch(url, ttl=WIKI_TTL)
-        if not html:
-            await cache.set(cache_key, [], 1800)
-            continue
-        try:
-            soup = BeautifulSoup(html, 'html.parser')
-            table = soup.find('table', {'class': 'wikitable'})
-            rows_out = []
-            if table:
-                for tr in table.find_all('tr')[1:]:
-                    tds = tr.find_all('td')
-                    if len(tds) < 4:
-                        continue
-                    try:
-                        rank = int(tds[0].get_text(strip=True))
-                    except ValueError:
-                        continue
-                    player = tds[1].get_text(strip=True)
-                    country = tds[2].get_text(strip=True)
-                    earnings = tds[3].get_text(strip=True)
-                    rows_out.append({'Rank': rank, 'Player': player, 'Country': country, 'Earnings': earnings})
-                    if len(rows_out) >= limit:
-                        break
-            await cache.set(cache_key, rows_out, WIKI_TTL)
-            if rows_out:
-                return rows_out
-        except Exception as e:  # noqa: BLE001
-            logger.warning("Esports rankings parse fail url=%s err=%s", url, e)
-            await cache.set(cache_key, [], 1800)
+        rows = await _esports_page_rows(url, limit)
+        if rows:
+            return rows
     return []
 
 
 # ------- US Major Leagues Fallback (NBA / NFL / MLB / NHL) ------- #
 
+@cached("nba_standings", ttl=_rows_ttl("nba_standings"), negative_ttl=1800, negative_value=[])
+async def _nba_season_rows(slug: str, limit: int) -> Optional[List[Dict[str, Any]]]:
+    url = "https://en.wikipedia.org/wiki/" + slug
+    def parse(html: str) -> List[Dict[str, Any]]:
+        soup = BeautifulSoup(html, 'html.parser')
+        tables = soup.find_all('table', {'class': re.compile(r'wikitable')})
+        rows_out: List[Dict[str, Any]] = []
+        for tbl in tables:
+            header_cells = [h.get_text(strip=True).lower() for h in tbl.find_all('th')[:8]]
+            # Look for conference tables containing 'team' and 'w' or 'win' columns
+            if not (any('team' in h for h in header_cells) and any(h.startswith('w') for h in header_cells)):
+                continue
+            for tr in tbl.find_all('tr')[1:]:
+                tds = tr.find_all('td')
+                if len(tds) < 5:
+                    continue
+                rank_txt = tds[0].get_text(strip=True)
+                team = tds[1].get_text(strip=True)
+                wl = [c.get_text(strip=True) for c in tds[2:5]]  # W, L, Pct maybe
+                try:
+                    rank_val = int(re.sub(r'[^0-9]', '', rank_txt) or '0')
+                except ValueError:
+                    rank_val = None
+                w = wl[0] if len(wl) > 0 else None
+                l = wl[1] if len(wl) > 1 else None
+                pct = wl[2] if len(wl) > 2 else None
+                if team and rank_val is not None:
+                    rows_out.append({'Rank': rank_val, 'Team': team, 'W': w, 'L': l, 'Pct': pct})
+                if len(rows_out) >= limit:
+                    break
+            if len(rows_out) >= limit:
+                break
+        return rows_out
+    return await _table_rows(url, parse, ("nba_standings", limit))
+
+
 async def get_nba_standings(limit: int = 60) -> List[Dict[str, Any]]:
     """Scrape NBA standings (combined conferences) from Wikipedia current season page.
 
@@ -416,55 +472,48 @@ async def get_nba_standings(limit: int = 60) -> List[Dict[str, Any]]:
         f"{year}\u2013{str(year+1)[-2:]}_NBA_season",
         f"{year-1}\u2013{str(year)[-2:]}_NBA_season",
     ]
-    base = "https://en.wikipedia.org/wiki/"
     for slug in candidates:
-        url = base + slug
-        cache_key = f"nba_standings:{slug}:{limit}".lower()
-        cached = await cache.get(cache_key)
-        if cached is not None:
-            if cached:
-                return cached
-            continue
-        html = await _fetch(url, ttl=WIKI_TTL)
-        if not html:
-            await cache.set(cache_key, [], 1800)
-            continue
-        try:
-            soup = BeautifulSoup(html, 'html.parser')
-            tables = soup.find_all('table', {'class': re.compile(r'wikitable')})
-            rows_out: List[Dict[str, Any]] = []
-            for tbl in tables:
-                header_cells = [h.get_text(strip=True).lower() for h in tbl.find_all('th')[:8]]
-                # Look for conference tables containing 'team' and 'w' or 'win' columns
-                if not (any('team' in h for h in header_cells) and any(h.startswith('w') for h in header_cells)):
+        rows = await _nba_season_rows(slug, limit)
+        if rows:
+            return rows
+    return []
+
+@cached("nfl_standings", ttl=_rows_ttl("nfl_standings"), negative_ttl=1800, negative_value=[])
+async def _nfl_season_rows(slug: str, limit: int) -> Optional[List[Dict[str, Any]]]:
+    url = "https://en.wikipedia.org/wiki/" + slug
+    def parse(html: str) -> List[Dict[str, Any]]:
+        soup = BeautifulSoup(html, 'html.parser')
+        tables = soup.find_all('table', {'class': re.compile(r'wikitable')})
+        rows_out: List[Dict[str, Any]] = []
+        current_division = None
+        for tbl in tables:
+            # Identify tables that look like standings (Win column etc.)
+            headers = [h.get_text(strip=True).lower() for h in tbl.find_all('th')[:10]]
+            if not (any(h.startswith('w') for h in headers) and any('team' in h or 'club' in h for h in headers)):
+                continue
+            for tr in tbl.find_all('tr')[1:]:
+                th = tr.find('th')
+                if th and 'division' in th.get_text(strip=True).lower():
+                    current_division = th.get_text(strip=True)
+                    continue
+                tds = tr.find_all('td')
+                if len(tds) < 6:
+                    continue
+                team = tds[0].get_text(strip=True)
+                w = tds[1].get_text(strip=True)
+                l = tds[2].get_text(strip=True)
+                t_val = tds[3].get_text(strip=True)
+                pct = tds[4].get_text(strip=True)
+                if not team or team.lower() == 'team':
                     continue
-                for tr in tbl.find_all('tr')[1:]:
-                    tds = tr.find_all('td')
-                    if len(tds) < 5:
-                        continue
-                    rank_txt = tds[0].get_text(strip=True)
-                    team = tds[1].get_text(strip=True)
-                    wl = [c.get_text(strip=True) for c in tds[2:5]]  # W, L, Pct maybe
-                    try:
-                        rank_val = int(re.sub(r'[^0-9]', '', rank_txt) or '0')
-                    except ValueError:
-                        rank_val = None
-                    w = wl[0] if len(wl) > 0 else None
-                    l = wl[1] if len(wl) > 1 else None
-                    pct = wl[2] if len(wl) > 2 else None
-                    if team and rank_val is not None:
-                        rows_out.append({'Rank': rank_val, 'Team': team, 'W': w, 'L': l, 'Pct': pct})
-                    if len(rows_out) >= limit:
-                        break
+                rows_out.append({'Division': current_division, 'Team': team, 'W': w, 'L': l, 'T': t_val, 'Pct': pct})
                 if len(rows_out) >= limit:
                     break
-            await cache.set(cache_key, rows_out, WIKI_TTL)
-            if rows_out:
-                return rows_out
-        except Exception as e:  # noqa: BLE001
-            logger.warning("NBA standings parse fail url=%s err=%s", url, e)
-            await cache.set(cache_key, [], 1800)
-    return []
+            if len(rows_out) >= limit:
+                break
+        return rows_out
+    return await _table_rows(url, parse, ("nfl_standings", limit))
+
 
 async def get_nfl_standings(limit: int = 40) -> List[Dict[str, Any]]:
     """Scrape NFL standings (divisional) from Wikipedia current season page.
@@ -477,56 +526,46 @@ async def get_nfl_standings(limit: int = 40) -> List[Dict[str, Any]]:
         f"{year}_NFL_season",
         f"{year-1}_NFL_season",
     ]
-    base = "https://en.wikipedia.org/wiki/"
     for slug in candidates:
-        url = base + slug
-        cache_key = f"nfl_standings:{slug}:{limit}".lower()
-        cached = await cache.get(cache_key)
-        if cached is not None:
-            if cached:
-                return cached
-            continue
-        html = await _fetch(url, ttl=WIKI_TTL)
-        if not html:
-            await cache.set(cache_key, [], 1800)
-            continue
-        try:
-            soup = BeautifulSoup(html, 'html.parser')
-            tables = soup.find_all('table', {'class': re.compile(r'wikitable')})
-            rows_out: List[Dict[str, Any]] = []
-            current_division = None
-            for tbl in tables:
-                # Identify tables that look like standings (Win column etc.)
-                headers = [h.get_text(strip=True).lower() for h in tbl.find_all('th')[:10]]
-                if not (any(h.startswith('w') for h in headers) and any('team' in h or 'club' in h for h in headers)):
+        rows = await _nfl_season_rows(slug, limit)
+        if rows:
+            return rows
+    return []
+
+@cached("mlb_standings", ttl=_rows_ttl("mlb_standings"), negative_ttl=1800, negative_value=[])
+async def _mlb_season_rows(slug: str, limit: int) -> Optional[List[Dict[str, Any]]]:
+    url = "https://en.wikipedia.org/wiki/" + slug
+    def parse(html: str) -> List[Dict[str, Any]]:
+        soup = BeautifulSoup(html, 'html.parser')
+        tables = soup.find_all('table', {'class': re.compile(r'wikitable')})
+        rows_out: List[Dict[str, Any]] = []
+        current_group = None
+        for tbl in tables:
+            headers = [h.get_text(strip=True).lower() for h in tbl.find_all('th')[:10]]
+            if not (any('w' == h or h.startswith('w') for h in headers) and any('team' in h or 'club' in h for h in headers)):
+                continue
+            for tr in tbl.find_all('tr')[1:]:
+                th = tr.find('th')
+                if th and ('division' in th.get_text(strip=True).lower() or 'league' in th.get_text(strip=True).lower()):
+                    current_group = th.get_text(strip=True)
                     continue
-                for tr in tbl.find_all('tr')[1:]:
-                    th = tr.find('th')
-                    if th and 'division' in th.get_text(strip=True).lower():
-                        current_division = th.get_text(strip=True)
-                        continue
-                    tds = tr.find_all('td')
-                    if len(tds) < 6:
-                        continue
-                    team = tds[0].get_text(strip=True)
-                    w = tds[1].get_text(strip=True)
-                    l = tds[2].get_text(strip=True)
-                    t_val = tds[3].get_text(strip=True)
-                    pct = tds[4].get_text(strip=True)
-                    if not team or team.lower() == 'team':
-                        continue
-                    rows_out.append({'Division': current_division, 'Team': team, 'W': w, 'L': l, 'T': t_val, 'Pct': pct})
-                    if len(rows_out) >= limit:
-                        break
+                tds = tr.find_all('td')
+                if len(tds) < 5:
+                    continue
+                team = tds[0].get_text(strip=True)
+                w = tds[1].get_text(strip=True)
+                l = tds[2].get_text(strip=True)
+                pct = tds[3].get_text(strip=True)
+                if not team or team.lower() == 'team':
+                    continue
+                rows_out.append({'Group': current_group, 'Team': team, 'W': w, 'L': l, 'Pct': pct})
                 if len(rows_out) >= limit:
                     break
-            await cache.set(cache_key, rows_out, WIKI_TTL)
-            if rows_out:
-                return rows_out
-        except Exception as e:  # noqa: BLE001
-            logger.warning("NFL standings parse fail url=%s err=%s", url, e)
-            await cache.set(cache_key, [], 1800)
-    return []
+            if len(rows_out) >= limit:
+                break
+        return rows_out
+    return await _table_rows(url, parse, ("mlb_standings", limit))
+
 
 async def get_mlb_standings(limit: int = 60) -> List[Dict[str, Any]]:
     """Scrape MLB standings from current season Wikipedia page.
@@ -539,54 +578,48 @@ async def get_mlb_standings(limit: int = 60) -> List[Dict[str, Any]]:
         f"{year}_Major_League_Baseball_season",
         f"{year-1}_Major_League_Baseball_season",
     ]
-    base = "https://en.wikipedia.org/wiki/"
     for slug in candidates:
-        url = base + slug
-        cache_key = f"mlb_standings:{slug}:{limit}".lower()
-        cached = await cache.get(cache_key)
-        if cached is not None:
-            if cached:
-                return cached
-            continue
-        html = await _fetch(url, ttl=WIKI_TTL)
-        if not html:
-            await cache.set(cache_key, [], 1800)
-            continue
-        try:
-            soup = BeautifulSoup(html, 'html.parser')
-            tables = soup.find_all('table', {'class': re.compile(r'wikitable')})
-            rows_out: List[Dict[str, Any]] = []
-            current_group = None
-            for tbl in tables:
-                headers = [h.get_text(strip=True).lower() for h in tbl.find_all('th')[:10]]
-                if not (any('w' == h or h.startswith('w') for h in headers) and any('team' in h or 'club' in h for h in headers)):
+        rows = await _mlb_season_rows(slug, limit)
+        if rows:
+            return rows
+    return []
+
+@cached("nhl_standings", ttl=_rows_ttl("nhl_standings"), negative_ttl=1800, negative_value=[])
+async def _nhl_season_rows(slug: str, limit: int) -> Optional[List[Dict[str, Any]]]:
+    url = "https://en.wikipedia.org/wiki/" + slug
+    def parse(html: str) -> List[Dict[str, Any]]:
+        soup = BeautifulSoup(html, 'html.parser')
+        tables = soup.find_all('table', {'class': re.compile(r'wikitable')})
+        rows_out: List[Dict[str, Any]] = []
+        current_div = None
+        for tbl in tables:
+            headers = [h.get_text(strip=True).lower() for h in tbl.find_all('th')[:10]]
+            if not (any('team' in h for h in headers) and any('pts' in h or 'points' in h for h in headers)):
+                continue
+            for tr in tbl.find_all('tr')[1:]:
+                th = tr.find('th')
+                if th and ('division' in th.get_text(strip=True).lower()):
+                    current_div = th.get_text(strip=True)
+                    continue
+                tds = tr.find_all('td')
+                if len(tds) < 8:
                     continue
-                for tr in tbl.find_all('tr')[1:]:
-                    th = tr.find('th')
-                    if th and ('division' in th.get_text(strip=True).lower() or 'league' in th.get_text(strip=True).lower()):
-                        current_group = th.get_text(strip=True)
-                        continue
-                    tds = tr.find_all('td')
-                    if len(tds) < 5:
-                        continue
-                    team = tds[0].get_text(strip=True)
-                    w = tds[1].get_text(strip=True)
-                    l = tds[2].get_text(strip=True)
-                    pct = tds[3].get_text(strip=True)
-                    if not team or team.lower() == 'team':
-                        continue
-                    rows_out.append({'Group': current_group, 'Team': team, 'W': w, 'L': l, 'Pct': pct})
-                    if len(rows_out) >= limit:
-                        break
+                team = tds[0].get_text(strip=True)
+                gp = tds[1].get_text(strip=True)
+                w = tds[2].get_text(strip=True)
+                l = tds[3].get_text(strip=True)
+                otl = tds[4].get_text(strip=True)
+                pts = tds[5].get_text(strip=True)
+                if not team or team.lower() == 'team':
+                    continue
+                rows_out.append({'Division': current_div, 'Team': team, 'GP': gp, 'W': w, 'L': l, 'OTL': otl, 'Pts': pts})
                 if len(rows_out) >= limit:
                     break
-            await cache.set(cache_key, rows_out, WIKI_TTL)
-            if rows_out:
-                return rows_out
-        except Exception as e:  # noqa: BLE001
-            logger.warning("MLB standings parse fail url=%s err=%s", url, e)
-            await cache.set(cache_key, [], 1800)
-    return []
+            if len(rows_out) >= limit:
+                break
+        return rows_out
+    return await _table_rows(url, parse, ("nhl_standings", limit))
+
 
 async def get_nhl_standings(limit: int = 50) -> List[Dict[str, Any]]:
     """Scrape NHL standings from current season Wikipedia page.
@@ -600,55 +633,10 @@ async def get_nhl_standings(limit: int = 50) -> List[Dict[str, Any]]:
         f"{year}\u2013{str(year+1)[-2:]}_NHL_season",
         f"{year-1}\u2013{str(year)[-2:]}_NHL_season",
     ]
-    base = "https://en.wikipedia.org/wiki/"
     for slug in candidates:
-        url = base + slug
-        cache_key = f"nhl_standings:{slug}:{limit}".lower()
-        cached = await cache.get(cache_key)
-        if cached is not None:
-            if cached:
-                return cached
-            continue
-        html = await _fetch(url, ttl=WIKI_TTL)
-        if not html:
-            await cache.set(cache_key, [], 1800)
-            continue
-        try:
-            soup = BeautifulSoup(html, 'html.parser')
-            tables = soup.find_all('table', {'class': re.compile(r'wikitable')})
-            rows_out: List[Dict[str, Any]] = []
-            current_div = None
-            for tbl in tables:
-                headers = [h.get_text(strip=True).lower() for h in tbl.find_all('th')[:10]]
-                if not (any('team' in h for h in headers) and any('pts' in h or 'points' in h for h in headers)):
-                    continue
-                for tr in tbl.find_all('tr')[1:]:
-                    th = tr.find('th')
-                    if th and ('division' in th.get_text(strip=True).lower()):
-                        current_div = th.get_text(strip=True)
-                        continue
-                    tds = tr.find_all('td')
-                    if len(tds) < 8:
-                        continue
-                    team = tds[0].get_text(strip=True)
-                    gp = tds[1].get_text(strip=True)
-                    w = tds[2].get_text(strip=True)
-                    l = tds[3].get_text(strip=True)
-                    otl = tds[4].get_text(strip=True)
-                    pts = tds[5].get_text(strip=True)
-                    if not team or team.lower() == 'team':
-                        continue
-                    rows_out.append({'Division': current_div, 'Team': team, 'GP': gp, 'W': w, 'L': l, 'OTL': otl, 'Pts': pts})
-                    if len(rows_out) >= limit:
-                        break
-                if len(rows_out) >= limit:
-                    break
-            await cache.set(cache_key, rows_out, WIKI_TTL)
-            if rows_out:
-                return rows_out
-        except Exception as e:  # noqa: BLE001
-            logger.warning("NHL standings parse fail url=%s err=%s", url, e)
-            await cache.set(cache_key, [], 1800)
+        rows = await _nhl_season_rows(slug, limit)
+        if rows:
+            return rows
     return []
 
 
@@ -1,13 +1,16 @@
-import httpx
 import asyncio
 import logging
-from typing import List, Optional, Tuple
+from typing import Callable, List, Optional, Tuple
 import urllib.parse
 from datetime import datetime, timedelta
 import re
 from app.core.config import settings
 from app.schemas.event import Event
-from app.core.cache import cache
+from app.core.cache import Uncached, cached
+from app.core.http import http_client
+from app.core.ratelimit import UpstreamThrottled
+from app.core.tracing import traced
+from app.services.quota import quota_ledger
 
 logger = logging.getLogger(__name__)
 
@@ -15,7 +18,7 @@ SERP_BASE = "https://serpapi.com/search.json"
 
 
 class SerpApiRateLimitError(Exception):
-    """Raised when SerpApi responds with a hard rate limit (HTTP 429)."""
+    """Raised when SerpApi responds with a hard rate limit (HTTP 429) or its circuit is open."""
     pass
 
 DATE_PATTERNS = [
@@ -89,24 +92,27 @@ async def _enrich_lat_lon(event_location_map: dict) -> Tuple[Optional[float], Op
     link = event_location_map.get('serpapi_link')
     if not link:
         return None, None
-    cache_key = f"latlon:{link}"
-    async def producer():
-        try:
-            async with httpx.AsyncClient(timeout=6.0) as client:
-                r = await client.get(link)
-                if r.status_code != 200:
-                    return (None, None)
-                js = r.json()
-                place = js.get('place_results') or js.get('place_result') or {}
-                lat = place.get('gps_coordinates', {}).get('latitude')
-                lon = place.get('gps_coordinates', {}).get('longitude')
-                if lat is not None and lon is not None:
-                    return (float(lat), float(lon))
-        except Exception:
-            return (None, None)
-        return (None, None)
-    latlon = await cache.get_or_set(cache_key, 3600, producer)  # cache 1 hour
-    return latlon
+    return await _place_lat_lon(link)
+
+@cached("latlon", ttl=3600, negative_value=(None, None))  # cache 1 hour; failures use the latlon negative_ttl
+async def _place_lat_lon(link: str) -> Optional[Tuple[float, float]]:
+    try:
+        client = http_client("serpapi")
+        r = await client.get(link, timeout=6.0, extensions={
+            "retry": True, "on_send": lambda: quota_ledger.spend("serpapi", "events.place")})
+        if r.status_code != 200:
+            return None
+        js = r.json()
+        place = js.get('place_results') or js.get('place_result') or {}
+        lat = place.get('gps_coordinates', {}).get('latitude')
+        lon = place.get('gps_coordinates', {}).get('longitude')
+        if lat is not None and lon is not None:
+            return (float(lat), float(lon))
+    except UpstreamThrottled:
+        raise Uncached()
+    except Exception:
+        return None
+    return None
 
 async def _geocode_address(address_text: str) -> Tuple[Optional[float], Optional[float]]:
     """Fallback geocoding using OpenStreetMap Nominatim for events without event_location_map.
@@ -114,35 +120,37 @@ async def _geocode_address(address_text: str) -> Tuple[Optional[float], Optional
     """
     if not address_text:
         return None, None
-    cache_key = f"geocode:{address_text.lower()}"
+    return await _nominatim_search(address_text)
 
-    async def producer():
-        try:
-            params = {
-                "q": address_text,
-                "format": "json",
-                "limit": 1,
-            }
-            url = "https://nominatim.openstreetmap.org/search?" + urllib.parse.urlencode(params)
-            headers = {"User-Agent": "PlayAxisEvents/1.0 (contact: support@playaxis.local)"}
-            async with httpx.AsyncClient(timeout=4.0) as client:
-                r = await client.get(url, headers=headers)
-                if r.status_code != 200:
-                    return (None, None)
-                js = r.json()
-                if isinstance(js, list) and js:
-                    try:
-                        lat = float(js[0].get("lat"))
-                        lon = float(js[0].get("lon"))
-                        return (lat, lon)
-                    except Exception:
-                        return (None, None)
-        except Exception:
-            return (None, None)
-        return (None, None)
-
-    return await cache.get_or_set(cache_key, 86400, producer)  # cache 24h
+@cached("geocode", ttl=86400, key=lambda address_text: address_text.lower(), negative_value=(None, None))  # cache 24h
+async def _nominatim_search(address_text: str) -> Optional[Tuple[float, float]]:
+    try:
+        params = {
+            "q": address_text,
+            "format": "json",
+            "limit": 1,
+        }
+        url = "https://nominatim.openstreetmap.org/search?" + urllib.parse.urlencode(params)
+        headers = {"User-Agent": "PlayAxisEvents/1.0 (contact: support@playaxis.local)"}
+        client = http_client("nominatim")
+        r = await client.get(url, headers=headers, timeout=4.0, extensions={"retry": True})
+        if r.status_code != 200:
+            return None
+        js = r.json()
+        if isinstance(js, list) and js:
+            try:
+                lat = float(js[0].get("lat"))
+                lon = float(js[0].get("lon"))
+                return (lat, lon)
+            except Exception:
+                return None
+    except UpstreamThrottled:
+        raise Uncached()
+    except Exception:
+        return None
+    return None
 
+@traced()
 async def fetch_google_events(query: str,
                               start: int = 0,
                               hl: Optional[str] = None,
@@ -150,7 +158,8 @@ async def fetch_google_events(query: str,
                               htichips: Optional[str] = None,
                               location: Optional[str] = None,
                               no_cache: Optional[bool] = None,
-                              enrich_limit: int = 6) -> List[Event]:
+                              enrich_limit: int = 6,
+                              on_normalized: Optional[Callable[[List[Event]], None]] = None) -> List[Event]:
     """Fetch events using SerpApi Google Events engine and normalize into Event models.
 
     Parameters
@@ -160,6 +169,7 @@ async def fetch_google_events(query: str,
     hl: language code (defaults to settings.GOOGLE_EVENTS_HL)
     gl: country code (defaults to settings.GOOGLE_EVENTS_GL)
     htichips: optional filter string like "date:today" or "event_type:Virtual-Event,date:today"
+    on_normalized: called with the events before coordinate enrichment (which then updates them in place)
     """
     api_key = settings.SERPAPI_API_KEY
     if not api_key:
@@ -182,17 +192,23 @@ async def fetch_google_events(query: str,
         params["no_cache"] = "true"
 
     try:
-        async with httpx.AsyncClient(timeout=20.0) as client:
-            r = await client.get(SERP_BASE, params=params)
-            if r.status_code == 429:
-                logger.warning("SerpApi rate limit (429) for q='%s'", query)
-                raise SerpApiRateLimitError()
-            if r.status_code != 200:
-                logger.error("SerpApi google_events error status=%s body=%s", r.status_code, r.text[:200])
-                return []
-            data = r.json()
+        client = http_client("serpapi")
+        # Never hedged: every search is billed, including a cancelled losing copy. The ledger is
+        # charged per attempt as it is sent, so retries and searches cut off by an early stop count too.
+        r = await client.get(SERP_BASE, params=params, extensions={
+            "retry": True, "on_send": lambda: quota_ledger.spend("serpapi", "events.search")})
+        if r.status_code == 429:
+            logger.warning("SerpApi rate limit (429) for q='%s'", query)
+            raise SerpApiRateLimitError()
+        if r.status_code != 200:
+            logger.error("SerpApi google_events error status=%s body=%s", r.status_code, r.text[:200])
+            return []
+        data = r.json()
     except SerpApiRateLimitError:
         raise
+    except UpstreamThrottled as exc:
+        # Breaker open (after a 429) or limiter queue full: stop spending this request's budget on SerpApi.
+        raise SerpApiRateLimitError() from exc
     except Exception as exc:
         logger.exception("SerpApi request failed: %s", exc)
         return []
@@ -259,17 +275,23 @@ async def fetch_google_events(query: str,
         except Exception:
             continue
 
+    if on_normalized is not None and out:
+        on_normalized(out)
+
     # Second pass: capped, parallel enrichment for missing coordinates
     MAX_ENRICH = max(0, int(enrich_limit))
+    # Place lookups are billed SerpApi searches; past today's quota share, geocode the address via Nominatim instead.
+    serp_enrich = quota_ledger.scaled("serpapi", MAX_ENRICH)
     tasks = []
     indices = []
     for idx, elmap, addr_lines in candidates_for_enrich:
         if MAX_ENRICH <= 0:
             break
-        if elmap:
+        if elmap and serp_enrich > 0:
             tasks.append(_enrich_lat_lon(elmap))
             indices.append(idx)
             MAX_ENRICH -= 1
+            serp_enrich -= 1
         elif addr_lines:
             joined_addr = ", ".join(addr_lines)
             tasks.append(_geocode_address(joined_addr))
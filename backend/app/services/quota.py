@@ -0,0 +1,150 @@
+"""Quota ledger for metered upstreams (SerpApi, ScraperAPI).
+
+Services call ``quota_ledger.spend("serpapi", "events.search")`` for each
+billed request; SerpApi calls pass it as the ``on_send`` request extension
+(app.core.http), so every attempt is charged when it is sent, even one that
+is cancelled before it completes. Spends are counted in memory and flushed to the
+``upstream_usage`` table every QUOTA_FLUSH_INTERVAL seconds. Each flush also
+re-reads the month's totals, so every worker plans against the same numbers.
+
+Planning: the credits left for the month (QUOTA_MONTHLY_CREDITS) are split
+evenly over the days left, today included. ``scale(upstream)`` is the
+fraction of today's share still unspent, from 1.0 at the start of the day to
+0.0 once it is gone; ``aggregate_events`` and ``fetch_google_events`` multiply
+their request and enrichment limits by it. A quiet day leaves credits that
+raise the share of the days after it.
+"""
+from __future__ import annotations
+import asyncio
+import logging
+from collections import Counter
+from datetime import date, datetime, timezone
+from typing import Any, Callable
+
+from app.core.config import settings
+from app.crud.quota import add_usage, daily_usage
+from app.db.session import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+def _today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def _month_bounds(day: date) -> tuple[date, date]:
+    start = day.replace(day=1)
+    end = date(start.year + (start.month == 12), start.month % 12 + 1, 1)
+    return start, end
+
+
+def month_start() -> date:
+    return _month_bounds(_today())[0]
+
+
+class QuotaLedger:
+    def __init__(self, allowances: dict[str, int], session_factory: Callable[[], Any] = SessionLocal):
+        self._allowances = {k: int(v) for k, v in allowances.items()}
+        self._session_factory = session_factory
+        self._pending: Counter[tuple[str, str, date]] = Counter()
+        self._days: dict[str, dict[date, int]] = {}  # month-to-date per day, as of the last flush (+ our spends)
+        self._task: asyncio.Task | None = None
+
+    def spend(self, upstream: str, route: str, credits: int = 1) -> None:
+        day = _today()
+        self._pending[(upstream, route, day)] += credits
+        days = self._days.setdefault(upstream, {})
+        days[day] = days.get(day, 0) + credits
+
+    def used(self, upstream: str) -> int:
+        start = month_start()
+        return sum(c for d, c in self._days.get(upstream, {}).items() if d >= start)
+
+    def remaining(self, upstream: str) -> int | None:
+        """Credits left this month, or None when no allowance is configured."""
+        allowance = self._allowances.get(upstream)
+        if allowance is None:
+            return None
+        return max(0, allowance - self.used(upstream))
+
+    def scale(self, upstream: str) -> float:
+        """Fraction of today's share of the remaining monthly allowance still unspent (1.0 if unmetered)."""
+        allowance = self._allowances.get(upstream)
+        if allowance is None:
+            return 1.0
+        today = _today()
+        start, end = _month_bounds(today)
+        days = self._days.get(upstream, {})
+        used_today = days.get(today, 0)
+        used_before = sum(c for d, c in days.items() if start <= d < today)
+        share = (allowance - used_before) / (end - today).days
+        if share <= 0:
+            return 0.0
+        return max(0.0, min(1.0, (share - used_today) / share))
+
+    def scaled(self, upstream: str, limit: int) -> int:
+        """``limit`` scaled to today's remaining share (rounded up while any share is left)."""
+        factor = self.scale(upstream)
+        if factor <= 0:
+            return 0
+        return max(1, round(limit * factor)) if limit > 0 else 0
+
+    def _sync(self, pending: Counter) -> dict[str, dict[date, int]]:
+        db = self._session_factory()
+        try:
+            if pending:
+                add_usage(db, dict(pending))
+            return daily_usage(db, month_start())
+        finally:
+            db.close()
+
+    async def flush(self) -> None:
+        """Write pending spends and reload the month's totals (all workers)."""
+        pending, self._pending = self._pending, Counter()
+        try:
+            totals = await asyncio.to_thread(self._sync, pending)
+        except Exception as e:  # noqa: BLE001 - e.g. migration not applied yet; keep counting in memory
+            self._pending.update(pending)
+            logger.warning("quota.flush failed err=%s", e)
+            return
+        # Spends made while the flush ran are not in the totals yet.
+        for (upstream, _route, day), credits in self._pending.items():
+            totals.setdefault(upstream, {})
+            totals[upstream][day] = totals[upstream].get(day, 0) + credits
+        self._days = totals
+
+    def start(self, interval: float) -> None:
+        if self._task is None and interval > 0:
+            self._task = asyncio.create_task(self._run(interval))
+
+    async def _run(self, interval: float) -> None:
+        await self.flush()  # load the month so far
+        while True:
+            await asyncio.sleep(interval)
+            await self.flush()
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        upstreams = set(self._allowances) | set(self._days)
+        return {
+            name: {
+                "allowance": self._allowances.get(name),
+                "used": self.used(name),
+                "remaining": self.remaining(name),
+                "today": self._days.get(name, {}).get(_today(), 0),
+                "scale": round(self.scale(name), 3),
+            }
+            for name in sorted(upstreams)
+        }
+
+
+quota_ledger = QuotaLedger(settings.QUOTA_MONTHLY_CREDITS)
@@ -1,10 +1,13 @@
 import logging
-import httpx
 from typing import List, Optional, Tuple
 from bs4 import BeautifulSoup
 from app.core.config import settings
 from app.schemas.event import Event
-from app.core.cache import cache
+from app.core.cache import Uncached, cache, cached
+from app.core.http import http_client, http_clients
+from app.core.ratelimit import UpstreamThrottled
+from app.core.tracing import traced
+from app.services.quota import quota_ledger
 import asyncio
 import urllib.parse
 import re
@@ -42,25 +45,23 @@ def _normalize_date(raw: str) -> Optional[str]:
     except Exception:
         return None
 
+@cached("fwdgeo", ttl=86400, negative_ttl=3600, key=lambda fragment: fragment.lower())
 async def _geocode_query_fragment(fragment: str) -> Optional[tuple[float, float]]:
     """Best-effort forward geocode using Nominatim (cached)."""
-    key = f"fwdgeo:{fragment.lower()}"
-    cached = await cache.get(key)
-    if cached is not None:
-        return cached
     try:
-        async with httpx.AsyncClient(timeout=8.0, headers={"User-Agent": "PlayAxisEvents/1.0 (contact: support@playaxis.local)"}) as client:
-            r = await client.get("https://nominatim.openstreetmap.org/search", params={"q": fragment, "format": "json", "limit": 1})
-            if r.status_code == 200:
-                data = r.json()
-                if data:
-                    lat = float(data[0]["lat"])
-                    lon = float(data[0]["lon"])
-                    await cache.set(key, (lat, lon), 86400)
-                    return lat, lon
+        client = http_client("nominatim")
+        r = await client.get("https://nominatim.openstreetmap.org/search", params={"q": fragment, "format": "json", "limit": 1},
+                             extensions={"retry": True})
+        if r.status_code == 200:
+            data = r.json()
+            if data:
+                lat = float(data[0]["lat"])
+                lon = float(data[0]["lon"])
+                return lat, lon
+    except UpstreamThrottled:
+        raise Uncached()
     except Exception:
         pass
-    await cache.set(key, None, 3600)
     return None
 
 MAX_EVENTS = 30
@@ -151,6 +152,7 @@ def _jsonld_events_from_soup(soup: BeautifulSoup) -> List[dict]:
             results.append(obj)
     return results
 
+@traced()
 async def fetch_events_via_scraperapi(query: str, gl: str = "us", hl: str = "en") -> List[Event]:
     """Fallback events fetch using ScraperAPI + Google HTML parsing.
 
@@ -163,19 +165,12 @@ async def fetch_events_via_scraperapi(query: str, gl: str = "us", hl: str = "en"
         return []
 
     base = settings.SCRAPERAPI_BASE_URL.rstrip('/') or "https://api.scraperapi.com/"
+    # scrape_ev entries stay readable as stale (last-good) copies for the namespace hard TTL.
     cache_key = f"scrape_ev:{hl}:{gl}:{query.strip().lower()}"
-    last_good_key = f"scrape_last_good:{hl}:{gl}:{query.strip().lower()}"
-    cooldown_key = "scraperapi:429_cooldown"
 
-    # If in cooldown due to prior 429, return cached/stale immediately
-    if await cache.get(cooldown_key):
-        cached_good = await cache.get(last_good_key)
-        if cached_good:
-            return cached_good
-        cached = await cache.get(cache_key)
-        if cached:
-            return cached
-        return []
+    # While the scraperapi breaker is open (e.g. after a 429) serve the last good copy, even if stale.
+    if not http_clients.breaker("scraperapi").available():
+        return await cache.get(cache_key, allow_stale=True) or []
 
     cached = await cache.get(cache_key)
     if cached is not None:
@@ -190,84 +185,81 @@ async def fetch_events_via_scraperapi(query: str, gl: str = "us", hl: str = "en"
     structured_endpoint = f"{base}/structured/google/search"
     struct_params = {"api_key": api_key, "query": normalized_query, "hl": hl, "gl": gl}
     structured_events: List[Event] = []
-    if not await cache.get(cooldown_key):  # skip if cooling down due to previous rate limit
-        try:
-            async with httpx.AsyncClient(timeout=8.0, headers={"User-Agent": USER_AGENT}) as client:
-                sr = await client.get(structured_endpoint, params=struct_params)
-                if sr.status_code == 429:
-                    await cache.set(cooldown_key, True, 90)
-                elif sr.status_code == 200:
-                    try:
-                        payload = sr.json()
-                        # Common possible locations for events data
-                        candidates: List[dict] = []
-                        if isinstance(payload, dict):
-                            if isinstance(payload.get('events_results'), list):
-                                candidates.extend(payload['events_results'])
-                            # Some variants nest inside knowledge_graph
-                            kg = payload.get('knowledge_graph') or {}
-                            if isinstance(kg, dict) and isinstance(kg.get('events'), list):
-                                candidates.extend(kg['events'])
-                            # Fallback: try organic results if very event-like
-                            if not candidates and isinstance(payload.get('organic_results'), list):
-                                for o in payload['organic_results']:
-                                    if not isinstance(o, dict):
-                                        continue
-                                    title = o.get('title') or ''
-                                    if 'event' in title.lower():
-                                        candidates.append(o)
-                        filtered = [c for c in candidates if _looks_like_real_event(c)] or candidates
-                        for idx, item in enumerate(filtered[:MAX_EVENTS]):
-                            try:
-                                title = item.get('title') or item.get('name')
-                                if not title:
-                                    continue
-                                link = _normalize_link(item.get('link') or item.get('url'))
-                                start_raw = item.get('start_date') or item.get('date') or item.get('start_time')
-                                end_raw = item.get('end_date') or item.get('end_time')
-                                start_iso = None
-                                if isinstance(start_raw, str):
-                                    start_iso = _normalize_date(start_raw) or start_raw
-                                # Synthetic link if none: Google search for the title + query context
-                                if not link:
-                                    google_search_q = urllib.parse.quote_plus(f"{title} {query}")
-                                    link = f"https://www.google.com/search?q={google_search_q}"
-                                structured_events.append(Event(
-                                    id=link or f"scraperapi_struct:{idx}:{title[:30]}",
-                                    source="scraperapi_structured",
-                                    name=title,
-                                    description=(item.get('description') or None),
-                                    url=link,
-                                    start=start_iso,
-                                    end=end_raw if isinstance(end_raw, str) else None,
-                                    timezone=None,
-                                    venue=item.get('venue') or item.get('location') or None,
-                                    city=None,
-                                    country=None,
-                                    latitude=None,
-                                    longitude=None,
-                                    category=None,
-                                    subcategory=None,
-                                    image=(item.get('image') if isinstance(item.get('image'), str) else None),
-                                    price=None,
-                                    capacity=None,
-                                    organizer=None,
-                                    is_tiered=None,
-                                    min_price=None,
-                                    max_price=None,
-                                    currency=None,
-                                    ticket_classes=None,
-                                ))
-                            except Exception:
+    try:
+        client = http_client("scraperapi")
+        sr = await client.get(structured_endpoint, params=struct_params, timeout=8.0)
+        if sr.status_code == 200:  # a 429 opens the scraperapi breaker
+            quota_ledger.spend("scraperapi", "events.scrape_structured")
+            try:
+                payload = sr.json()
+                # Common possible locations for events data
+                candidates: List[dict] = []
+                if isinstance(payload, dict):
+                    if isinstance(payload.get('events_results'), list):
+                        candidates.extend(payload['events_results'])
+                    # Some variants nest inside knowledge_graph
+                    kg = payload.get('knowledge_graph') or {}
+                    if isinstance(kg, dict) and isinstance(kg.get('events'), list):
+                        candidates.extend(kg['events'])
+                    # Fallback: try organic results if very event-like
+                    if not candidates and isinstance(payload.get('organic_results'), list):
+                        for o in payload['organic_results']:
+                            if not isinstance(o, dict):
                                 continue
-                    except Exception as ex:
-                        logger.debug("Structured scrape JSON parse error: %s", ex)
-        except Exception as ex:
-            logger.debug("Structured endpoint exception: %s", ex)
+                            title = o.get('title') or ''
+                            if 'event' in title.lower():
+                                candidates.append(o)
+                filtered = [c for c in candidates if _looks_like_real_event(c)] or candidates
+                for idx, item in enumerate(filtered[:MAX_EVENTS]):
+                    try:
+                        title = item.get('title') or item.get('name')
+                        if not title:
+                            continue
+                        link = _normalize_link(item.get('link') or item.get('url'))
+                        start_raw = item.get('start_date') or item.get('date') or item.get('start_time')
+                        end_raw = item.get('end_date') or item.get('end_time')
+                        start_iso = None
+                        if isinstance(start_raw, str):
+                            start_iso = _normalize_date(start_raw) or start_raw
+                        # Synthetic link if none: Google search for the title + query context
+                        if not link:
+                            google_search_q = urllib.parse.quote_plus(f"{title} {query}")
+                            link = f"https://www.google.com/search?q={google_search_q}"
+                        structured_events.append(Event(
+                            id=link or f"scraperapi_struct:{idx}:{title[:30]}",
+                            source="scraperapi_structured",
+                            name=title,
+                            description=(item.get('description') or None),
+                            url=link,
+                            start=start_iso,
+                            end=end_raw if isinstance(end_raw, str) else None,
+                            timezone=None,
+                            venue=item.get('venue') or item.get('location') or None,
+                            city=None,
+                            country=None,
+                            latitude=None,
+                            longitude=None,
+                            category=None,
+                            subcategory=None,
+                            image=(item.get('image') if isinstance(item.get('image'), str) else None),
+                            price=None,
+                            capacity=None,
+                            organizer=None,
+                            is_tiered=None,
+                            min_price=None,
+                            max_price=None,
+                            currency=None,
+                            ticket_classes=None,
+                        ))
+                    except Exception:
+                        continue
+            except Exception as ex:
+                logger.debug("Structured scrape JSON parse error: %s", ex)
+    except Exception as ex:
+        logger.debug("Structured endpoint exception: %s", ex)
     if structured_events:
         logger.info("scraperapi.structured events=%s query='%s'", len(structured_events), normalized_query)
         await cache.set(cache_key, structured_events, 300)
-        await cache.set(last_good_key, structured_events, 900)
     return structured_events[:MAX_EVENTS]
 
     # Fallback to raw HTML approach (previous implementation)
@@ -279,35 +271,25 @@ async def fetch_events_via_scraperapi(query: str, gl: str = "us", hl: str = "en"
     timeouts = [8.0, 16.0]  # two attempts: fast then longer
     for attempt, t in enumerate(timeouts, start=1):
         try:
-            async with httpx.AsyncClient(timeout=t, headers={"User-Agent": USER_AGENT}) as client:
-                r = await client.get(base, params=params)
-                if r.status_code == 429:
-                    logger.warning("ScraperAPI fetch failed status=429 (rate limited) query='%s' attempt=%s", query, attempt)
-                    # Set short cooldown
-                    await cache.set(cooldown_key, True, 90)
-                    # Return stale if available
-                    stale = await cache.get(last_good_key)
-                    if stale:
-                        return stale
-                    return []
-                if r.status_code != 200:
-                    logger.warning("ScraperAPI fetch failed status=%s body=%s", r.status_code, r.text[:160])
-                    # Non-200: retry if attempt 1 else bail with stale
-                    if attempt == len(timeouts):
-                        stale = await cache.get(last_good_key)
-                        if stale:
-                            return stale
-                        return []
-                    continue
-                html = r.text
-                break
+            client = http_client("scraperapi")
+            r = await client.get(base, params=params, timeout=t)
+            if r.status_code == 429:
+                logger.warning("ScraperAPI fetch failed status=429 (rate limited) query='%s' attempt=%s", query, attempt)
+                # Return stale if available
+                return await cache.get(cache_key, allow_stale=True) or []
+            if r.status_code != 200:
+                logger.warning("ScraperAPI fetch failed status=%s body=%s", r.status_code, r.text[:160])
+                # Non-200: retry if attempt 1 else bail with stale
+                if attempt == len(timeouts):
+                    return await cache.get(cache_key, allow_stale=True) or []
+                continue
+            quota_ledger.spend("scraperapi", "events.scrape_html")
+            html = r.text
+            break
         except Exception as exc:  # noqa: BLE001
             logger.warning("ScraperAPI attempt=%s exception: %s", attempt, exc)
             if attempt == len(timeouts):
-                stale = await cache.get(last_good_key)
-                if stale:
-                    return stale
-                return []
+                return await cache.get(cache_key, allow_stale=True) or []
             continue
 
     if not html:
@@ -472,8 +454,7 @@ async def fetch_events_via_scraperapi(query: str, gl: str = "us", hl: str = "en"
     events = events[:MAX_EVENTS]
 
     logger.info("scraperapi.events parsed=%s geocoded=%s jsonld=%s query='%s'", len(events), sum(1 for e in events if e.latitude is not None), len(jsonld), query)
-    # Cache only non-empty results for a short TTL (5 minutes)
+    # Cache only non-empty results for a short TTL (5 minutes); stale copies live on for the scrape_ev hard TTL
     if events:
         await cache.set(cache_key, events, 300)
-        await cache.set(last_good_key, events, 900)  # 15 min stale window
     return events
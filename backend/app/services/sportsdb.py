@@ -1,8 +1,12 @@
-import httpx
 import logging
 from typing import List, Optional, Dict, Any, Tuple
 from app.core.config import settings
-from app.core.cache import cache
+from app.core.breaker import retry_after_seconds
+from app.core.cache import Uncached, cache, cached, make_key
+from app.core.http import http_client
+from app.core.ratelimit import UpstreamThrottled
+from app.core.tracing import traced
+from app.services import ttl_policy
 import asyncio
 from app.services.external_standings import (
     get_fifa_world_rankings,
@@ -26,8 +30,12 @@ logger = logging.getLogger(__name__)
 BASE_URL_V1 = "https://www.thesportsdb.com/api/v1/json"
 API_KEY_FALLBACK = "123"  # free key
 
-TTL_SHORT = 120  # 2 min for volatile endpoints (next events)
+TTL_SHORT = 120  # 2 min for volatile endpoints (next events); fallback when ttl_policy has no opinion
 TTL_LONG = 3600  # 1 hour for static lists
+COOLDOWN_KEY = "sportsdb:429_cooldown"  # shared across workers; set on a 429 for its Retry-After
+COOLDOWN_SECONDS = 60  # when the 429 carries no usable Retry-After
+
+EVENT_LIST_PATHS = {"eventsnextleague.php", "eventspastleague.php", "eventsseason.php", "eventsnext.php"}
 
 # Base static aliases. We will augment this at runtime with any sports returned
 # by list_all_sports() so unknown sports still resolve to a display name.
@@ -82,32 +90,69 @@ def _api_key() -> str:
     key = getattr(settings, 'THESPORTSDB_API_KEY', None) or settings.X_RapidAPI_KEY or API_KEY_FALLBACK
     return key or API_KEY_FALLBACK
 
+def _response_ttl(data: Any, path: str, params: Optional[Dict[str, Any]] = None, ttl: int = TTL_SHORT) -> int:
+    """Cache lifetime for a TheSportsDB payload, derived from its content where possible."""
+    if not isinstance(data, dict):
+        return ttl
+    if path in EVENT_LIST_PATHS:
+        return ttl_policy.event_list_ttl([_norm_event(e) for e in data.get('events') or []])
+    if path == 'lookuptable.php':
+        return ttl_policy.standings_ttl(make_key("sportsdb", path, params), data.get('table'))
+    return ttl
+
+
+@cached("sportsdb", ttl=_response_ttl, key=lambda path, params=None, ttl=TTL_SHORT: (path, params))
 async def _get_json(path: str, params: Optional[Dict[str, Any]] = None, ttl: int = TTL_SHORT) -> Any:
-    key = f"sportsdb:{path}:{params}".lower()
-    cached = await cache.get(key)
-    if cached is not None:
-        return cached
     url = f"{BASE_URL_V1}/{_api_key()}/{path}"
+    if await cache.get(COOLDOWN_KEY):
+        raise Uncached()  # rate limited recently (by any worker); keep serving what is cached
     try:
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            r = await client.get(url, params=params)
-            if r.status_code == 429:
-                logger.warning("TheSportsDB rate limit 429 path=%s", path)
-                # store empty short to dampen repeat hits
-                await cache.set(key, None, 30)
-                return None
-            if r.status_code != 200:
-                logger.error("TheSportsDB error status=%s body=%s", r.status_code, r.text[:200])
-                await cache.set(key, None, 30)
-                return None
-            data = r.json()
-            await cache.set(key, data, ttl)
-            return data
+        client = http_client("thesportsdb")
+        r = await client.get(url, params=params, extensions={"retry": True})
+        if r.status_code == 429:
+            cooldown = round(retry_after_seconds(r) or COOLDOWN_SECONDS)
+            logger.warning("TheSportsDB rate limit 429 path=%s cooldown=%ss", path, cooldown)
+            # One cooldown for the whole upstream rather than a failure pinned on this key.
+            await cache.set(COOLDOWN_KEY, True, max(1, cooldown))
+            raise Uncached()
+        if r.status_code != 200:
+            logger.error("TheSportsDB error status=%s body=%s", r.status_code, r.text[:200])
+            return None
+        return r.json()
+    except Uncached:
+        raise
+    except UpstreamThrottled:
+        raise Uncached()
     except Exception as e:
         logger.error("TheSportsDB exception path=%s err=%s", path, e)
-        await cache.set(key, None, 30)
         return None
 
+
+async def _ergast_get(path: str) -> Optional[Dict[str, Any]]:
+    """Ergast free F1 API (no key required), e.g. current/driverStandings.json."""
+    url = f"http://ergast.com/api/f1/{path}"
+    try:
+        client = http_client("ergast")
+        r = await client.get(url, extensions={"retry": True})
+        if r.status_code != 200:
+            return None
+        return r.json()
+    except UpstreamThrottled:
+        raise Uncached()
+    except Exception as e:  # noqa: BLE001
+        logger.warning("Ergast fetch fail path=%s err=%s", path, e)
+        return None
+
+
+@cached("ergast", ttl=300, negative_ttl=60)
+async def _ergast_standings(path: str) -> Optional[Dict[str, Any]]:
+    return await _ergast_get(path)
+
+
+@cached("ergast", ttl=600, negative_ttl=120)
+async def _ergast_schedule(path: str) -> Optional[Dict[str, Any]]:
+    return await _ergast_get(path)
+
 def _norm_event(ev: Dict[str, Any]) -> Dict[str, Any]:
     if not isinstance(ev, dict):
         return {}
@@ -224,6 +269,7 @@ from app.crud.workout import get_standings_cache, upsert_standings_cache
 STANDINGS_CACHE_TTL_MIN = int(os.getenv('STANDINGS_CACHE_TTL_MIN', '30'))
 FORCE_REFRESH_STANDINGS = os.getenv('FORCE_REFRESH_STANDINGS') == '1'
 
+@traced()
 async def get_standings_for_sport(sport_key: str) -> Dict[str, Any]:
     """Return a multi-table standings structure differing by sport.
 
@@ -258,31 +304,11 @@ async def get_standings_for_sport(sport_key: str) -> Dict[str, Any]:
     # Special handling for motorsport (F1) placeholder sample (real integration would call dedicated endpoints)
     if skey in {"f1", "formula1", "formula-1"}:
         # Use Ergast free API (no key required): http://ergast.com/api/f1/current/standings.json
-        async def _ergast(path: str) -> Optional[Dict[str, Any]]:
-            url = f"http://ergast.com/api/f1/{path}"
-            cache_key = f"ergast:{path}"
-            cached = await cache.get(cache_key)
-            if cached is not None:
-                return cached
-            try:
-                async with httpx.AsyncClient(timeout=15.0) as client:
-                    r = await client.get(url)
-                    if r.status_code != 200:
-                        await cache.set(cache_key, None, 60)
-                        return None
-                    data = r.json()
-                    await cache.set(cache_key, data, 300)  # 5 min cache
-                    return data
-            except Exception as e:  # noqa: BLE001
-                logger.warning("Ergast fetch fail path=%s err=%s", path, e)
-                await cache.set(cache_key, None, 60)
-                return None
-
         drivers_data, constructors_data, last_race_data, qual_data = await asyncio.gather(
-            _ergast('current/driverStandings.json'),
-            _ergast('current/constructorStandings.json'),
-            _ergast('current/last/results.json'),
-            _ergast('current/last/qualifying.json'),
+            _ergast_standings('current/driverStandings.json'),
+            _ergast_standings('current/constructorStandings.json'),
+            _ergast_standings('current/last/results.json'),
+            _ergast_standings('current/last/qualifying.json'),
         )
 
         def _drivers_rows():
@@ -592,26 +618,7 @@ async def unified_events(sport_key: str) -> Dict[str, Any]:
 
     # Special handling for F1 events using Ergast (avoid mixed league aggregation)
     if skey in {"f1", "formula1", "formula-1"}:
-        async def _ergast(path: str) -> Optional[Dict[str, Any]]:
-            url = f"http://ergast.com/api/f1/{path}"
-            cache_key = f"ergast:{path}"
-            cached = await cache.get(cache_key)
-            if cached is not None:
-                return cached
-            try:
-                async with httpx.AsyncClient(timeout=15.0) as client:
-                    r = await client.get(url)
-                    if r.status_code != 200:
-                        await cache.set(cache_key, None, 120)
-                        return None
-                    data = r.json()
-                    await cache.set(cache_key, data, 600)
-                    return data
-            except Exception as e:  # noqa: BLE001
-                logger.warning("Ergast schedule fail err=%s", e)
-                await cache.set(cache_key, None, 120)
-                return None
-        sched = await _ergast('current.json')
+        sched = await _ergast_schedule('current.json')
         races = []
         try:
             races = sched['MRData']['RaceTable']['Races'] if sched else []
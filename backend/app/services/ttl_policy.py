@@ -0,0 +1,122 @@
+"""Content-aware cache lifetimes for TheSportsDB responses and scraped standings tables.
+
+A fixed TTL is wrong most of the year: during the off-season nothing changes
+for weeks, while during a match the score changes every minute. These helpers
+derive a TTL from what was actually fetched:
+
+* event lists (``_norm_event`` dicts): live or about-to-start matches get
+  ``LIVE_TTL``; otherwise the TTL shrinks as the next kickoff approaches and
+  never runs past it; a league with no recent or upcoming fixtures is treated
+  as off-season.
+* standings tables: start at ``STANDINGS_MIN_TTL`` and double each time a
+  refetch returns an identical table (up to ``QUIET_TTL``), resetting as soon
+  as it changes. The Wikipedia tables in external_standings use the same
+  back-off.
+"""
+from __future__ import annotations
+import json
+import hashlib
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+LIVE_TTL = 45  # a match is (probably) in progress
+RECENT_RESULT_TTL = 10 * 60  # finished within RECENT_WINDOW: late score corrections, table updates
+IN_SEASON_TTL = 30 * 60  # fixtures within IN_SEASON_WINDOW but nothing imminent
+QUIET_TTL = 6 * 3600  # off-season / nothing scheduled
+STANDINGS_MIN_TTL = 10 * 60
+
+LIVE_WINDOW = timedelta(hours=3)  # kicked off this recently and not marked finished -> treat as live
+RECENT_WINDOW = timedelta(hours=3)
+IN_SEASON_WINDOW = timedelta(days=14)
+
+# Upcoming kickoff within <delta> -> TTL; the TTL is also capped at the time left before kickoff.
+KICKOFF_BUCKETS = (
+    (timedelta(minutes=15), 60),
+    (timedelta(hours=3), 5 * 60),
+    (timedelta(hours=24), 30 * 60),
+    (timedelta(days=7), 2 * 3600),
+)
+
+FINISHED_STATUSES = {
+    "ft", "aet", "pen", "aot", "match finished", "finished", "final", "ended", "awarded",
+}
+IGNORED_STATUSES = {"postponed", "cancelled", "canceled", "abandoned", "suspended", "pst", "canc", "abd"}
+NOT_STARTED_STATUSES = {"", "ns", "not started", "tbd", "time to be defined", "scheduled"}
+
+
+def kickoff_of(ev: Dict[str, Any]) -> Optional[datetime]:
+    """UTC kickoff from a normalized event (``timestamp``, else ``date`` + ``time``)."""
+    raw = ev.get("timestamp")
+    if not raw and ev.get("date"):
+        raw = f"{ev['date']}T{ev.get('time') or '00:00:00'}"
+    if not raw:
+        return None
+    try:
+        dt = datetime.fromisoformat(str(raw).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def event_list_ttl(events: List[Dict[str, Any]], now: Optional[datetime] = None) -> int:
+    """TTL for a list of normalized events (next, past or season fixtures)."""
+    now = now or datetime.now(timezone.utc)
+    ttl = QUIET_TTL
+    for ev in events:
+        status = (ev.get("status") or "").strip().lower()
+        if status in IGNORED_STATUSES:
+            continue
+        kickoff = kickoff_of(ev)
+        finished = status in FINISHED_STATUSES
+        if not finished and status not in NOT_STARTED_STATUSES:
+            return LIVE_TTL  # 1H, HT, Q3, IN7, ... : in play
+        if kickoff is None:
+            continue
+        age = now - kickoff
+        if age >= timedelta(0):
+            timed = bool(ev.get("timestamp") or ev.get("time"))
+            if not finished and timed and age <= LIVE_WINDOW:
+                return LIVE_TTL  # started, status feed has not caught up yet
+            if age <= RECENT_WINDOW:
+                ttl = min(ttl, RECENT_RESULT_TTL)
+            elif age <= IN_SEASON_WINDOW:
+                ttl = min(ttl, IN_SEASON_TTL)
+            continue
+        until = -age
+        for bound, bucket_ttl in KICKOFF_BUCKETS:
+            if until <= bound:
+                ttl = min(ttl, bucket_ttl, max(LIVE_TTL, int(until.total_seconds())))
+                break
+    return ttl
+
+
+class _StandingsHistory:
+    """Remembers, per cache key, the last table hash and the TTL it earned."""
+
+    def __init__(self, max_keys: int = 512):
+        self._max_keys = max_keys
+        self._seen: OrderedDict[str, tuple[str, int]] = OrderedDict()
+
+    def ttl_for(self, key: str, table: Any) -> int:
+        if not table:
+            # Unsupported league/season or between seasons: check back hourly.
+            return 3600
+        digest = hashlib.sha1(json.dumps(table, sort_keys=True, default=str).encode()).hexdigest()
+        previous = self._seen.pop(key, None)
+        if previous is not None and previous[0] == digest:
+            ttl = min(QUIET_TTL, previous[1] * 2)
+        else:
+            ttl = STANDINGS_MIN_TTL
+        self._seen[key] = (digest, ttl)
+        if len(self._seen) > self._max_keys:
+            self._seen.popitem(last=False)
+        return ttl
+
+
+standings_history = _StandingsHistory()
+
+
+def standings_ttl(key: str, table: Any) -> int:
+    """TTL for a standings table, backing off while it stays unchanged."""
+    return standings_history.ttl_for(key, table)
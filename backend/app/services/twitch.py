@@ -1,7 +1,7 @@
 from __future__ import annotations
-import httpx
 from app.core.config import settings
 from app.core.cache import cache
+from app.core.http import http_client
 from app.schemas.streams import StreamsResponse, Stream
 
 TWITCH_ID = settings.TWITCH_CLIENT_ID
@@ -12,26 +12,24 @@ TOKEN_CACHE_KEY = "twitch:app_token"
 async def _fetch_app_token():
     if not TWITCH_ID or not TWITCH_SECRET:
         raise RuntimeError("Twitch credentials not configured")
-    async with httpx.AsyncClient(timeout=15.0) as client:
-        r = await client.post(
-            "https://id.twitch.tv/oauth2/token",
-            params={
-                "client_id": TWITCH_ID,
-                "client_secret": TWITCH_SECRET,
-                "grant_type": "client_credentials"
-            }
-        )
-        r.raise_for_status()
-        data = r.json()
-        return data["access_token"], int(data.get("expires_in", 3600))
+    client = http_client("twitch")
+    r = await client.post(
+        "https://id.twitch.tv/oauth2/token",
+        params={
+            "client_id": TWITCH_ID,
+            "client_secret": TWITCH_SECRET,
+            "grant_type": "client_credentials"
+        }
+    )
+    r.raise_for_status()
+    data = r.json()
+    return data["access_token"], int(data.get("expires_in", 3600))
 
 async def get_app_token() -> str:
-    existing = await cache.get(TOKEN_CACHE_KEY)
-    if existing:
-        return existing
-    token, ttl = await _fetch_app_token()
-    await cache.set(TOKEN_CACHE_KEY, token, max(ttl - 60, 300))
-    return token
+    async def producer():
+        token, ttl = await _fetch_app_token()
+        return token, max(ttl - 60, 300)
+    return await cache.get_or_compute(TOKEN_CACHE_KEY, producer)
 
 async def fetch_streams(game_id: str | None = None, first: int = 10) -> StreamsResponse:
     token = await get_app_token()
@@ -42,10 +40,10 @@ async def fetch_streams(game_id: str | None = None, first: int = 10) -> StreamsR
     params = {"first": min(first, 20)}
     if game_id:
         params["game_id"] = game_id
-    async with httpx.AsyncClient(timeout=15.0) as client:
-        r = await client.get(f"{TWITCH_BASE}/streams", headers=headers, params=params)
-        r.raise_for_status()
-        payload = r.json()
+    client = http_client("twitch")
+    r = await client.get(f"{TWITCH_BASE}/streams", headers=headers, params=params)
+    r.raise_for_status()
+    payload = r.json()
 
     streams = [
         Stream(
@@ -1,7 +1,7 @@
 from __future__ import annotations
-import httpx
 from typing import Optional, List
 from app.core.config import settings
+from app.core.http import http_client
 from app.schemas.weather import WeatherResponse, WeatherCurrent, WeatherHourlyPoint
 
 WEATHER_BASE = settings.WEATHER_API_URL.rstrip("/")
@@ -29,10 +29,10 @@ async def fetch_weather(lat: float, lon: float, include_hourly: bool = False, ho
     if include_hourly:
         params["hourly"] = "temperature_2m,weathercode"
 
-    async with httpx.AsyncClient(timeout=15.0) as client:
-        r = await client.get(f"{WEATHER_BASE}/forecast", params=params)
-        r.raise_for_status()
-        raw = r.json()
+    client = http_client("open_meteo")
+    r = await client.get(f"{WEATHER_BASE}/forecast", params=params, extensions={"retry": True})
+    r.raise_for_status()
+    raw = r.json()
 
     cw = raw.get("current_weather") or {}
     code = cw.get("weathercode")
@@ -0,0 +1,134 @@
+"""Benchmark: per-event Python geo work vs the columnar ``GeoBatch`` path.
+
+Builds synthetic events around a user (a dense local cluster plus a
+national spread, some without coordinates or start times) and times, for
+each size, the three places ``aggregate_events`` touches every event:
+
+* rank: distance annotation, adaptive local radius and the local/non-local sort;
+* bbox: viewport filtering;
+* enough: the "enough locals yet?" check after each merged batch of 10.
+
+The legacy path is the per-event code ``aggregate_events`` used before
+(``_haversine`` per event, a list comprehension per radius, ``e not in
+local`` partitioning). It is quadratic, so it only runs up to ``--legacy-max``.
+A bbox mask on its own is no faster than the list comprehension: reading
+the coordinates into arrays costs about as much as comparing them. The
+gain comes where the arrays feed distances and sort keys (rank, enough).
+
+    cd backend && DATABASE_URL=sqlite:// python -m benchmarks.geo_rank
+    cd backend && DATABASE_URL=sqlite:// python -m benchmarks.geo_rank --sizes 1000 10000 100000 --legacy-max 100000
+"""
+from __future__ import annotations
+import time
+import random
+import argparse
+
+import numpy as np
+
+from app.core.geo import GeoBatch, haversine_km
+from app.schemas.event import Event
+from app.services.events import LOCAL_RADIUS_KM, MIN_LOCAL_RESULTS, _rank
+
+USER = (39.95, -75.16)
+BBOX = (39.5, 40.5, -75.8, -74.6)
+
+
+def _events(n: int, seed: int = 7) -> list[Event]:
+    rng = random.Random(seed)
+    events = []
+    for i in range(n):
+        if rng.random() < 0.1:
+            lat = lon = None
+        elif rng.random() < 0.3:
+            lat, lon = USER[0] + rng.gauss(0, 0.4), USER[1] + rng.gauss(0, 0.4)
+        else:
+            lat, lon = rng.uniform(25, 49), rng.uniform(-124, -67)
+        start = None if rng.random() < 0.05 else f"2026-{rng.randint(10, 12):02d}-{rng.randint(1, 28):02d}"
+        events.append(Event(id=f"ev{i}", source="bench", name=f"Event {i}", latitude=lat, longitude=lon, start=start))
+    return events
+
+
+def _legacy_rank(events: list[Event], user_lat: float, user_lon: float) -> list[Event]:
+    for ev in events:
+        dist = haversine_km(user_lat, user_lon, ev.latitude, ev.longitude) if ev.latitude is not None and ev.longitude is not None else None
+        setattr(ev, '_distance_km', dist)
+    radius_seq = [50.0, 100.0, LOCAL_RADIUS_KM, 250.0, 500.0]
+    local = []
+    for r in radius_seq:
+        local = [e for e in events if (e._distance_km is not None and e._distance_km <= r)]
+        if len(local) >= MIN_LOCAL_RESULTS or r == radius_seq[-1]:
+            break
+    non_local = [e for e in events if e not in local]
+    local.sort(key=lambda e: (e._distance_km, e.start or "9999"))
+    non_local.sort(key=lambda e: (e._distance_km is None, e._distance_km if e._distance_km is not None else 1e9, e.start or "9999"))
+    return local + non_local
+
+
+def _legacy_bbox(events: list[Event]) -> list[Event]:
+    min_lat, max_lat, min_lon, max_lon = BBOX
+    return [e for e in events if (e.latitude is not None and e.longitude is not None and
+                                  min_lat <= e.latitude <= max_lat and min_lon <= e.longitude <= max_lon)]
+
+
+def _legacy_enough(events: list[Event]) -> int:
+    """Rescans the whole merged prefix after every batch of 10, caching distances on the events."""
+    local_count = 0
+    for upto in range(10, len(events) + 10, 10):
+        local_count = 0
+        for ev in events[:upto]:
+            if getattr(ev, '_distance_km', None) is None and ev.latitude is not None and ev.longitude is not None:
+                setattr(ev, '_distance_km', haversine_km(USER[0], USER[1], ev.latitude, ev.longitude))
+            if getattr(ev, '_distance_km', None) is not None and ev._distance_km <= LOCAL_RADIUS_KM:
+                local_count += 1
+    return local_count
+
+
+def _columnar_bbox(events: list[Event]) -> list[Event]:
+    mask = GeoBatch(events).in_bbox(*BBOX)
+    return [events[i] for i in np.flatnonzero(mask).tolist()]
+
+
+def _columnar_enough(events: list[Event]) -> int:
+    local_count = 0
+    for upto in range(10, len(events) + 10, 10):
+        fresh = GeoBatch(events[upto - 10:upto])
+        local_count += int(np.count_nonzero(fresh.distances(*USER) <= LOCAL_RADIUS_KM))
+    return local_count
+
+
+def _time(fn, events: list[Event], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        batch = [e.model_copy() for e in events]  # fresh objects: the legacy path caches distances on them
+        t0 = time.perf_counter()
+        fn(batch)
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--legacy-max", type=int, default=10_000, help="skip the quadratic legacy path above this size")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    cases = {
+        "rank": (lambda ev: _legacy_rank(ev, *USER), lambda ev: _rank(ev, *USER)),
+        "bbox": (_legacy_bbox, _columnar_bbox),
+        "enough": (_legacy_enough, _columnar_enough),
+    }
+    print(f"{'events':>8} {'op':>7} {'legacy ms':>10} {'columnar ms':>12} {'speedup':>8}")
+    for n in args.sizes:
+        events = _events(n)
+        for op, (legacy, columnar) in cases.items():
+            new_ms = _time(columnar, events, args.repeat)
+            if n <= args.legacy_max:
+                old_ms = _time(legacy, events, 1 if n >= 10_000 else args.repeat)
+                print(f"{n:>8} {op:>7} {old_ms:>10.1f} {new_ms:>12.1f} {old_ms / new_ms:>7.1f}x")
+            else:
+                print(f"{n:>8} {op:>7} {'skipped':>10} {new_ms:>12.1f} {'':>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Benchmark: per-call ``httpx.AsyncClient`` vs the pooled clients in app.core.http.
+
+Starts a local HTTPS server (self-signed cert via the ``openssl`` CLI; plain
+HTTP with ``--no-tls``) and times sequential calls and a 40-way fan-out (the
+shape of fetch_google_events enrichment) both ways. Loopback hides network
+RTT, so real savings are larger; point ``--url`` at a real upstream to see them.
+
+    cd backend && DATABASE_URL=sqlite:// python -m benchmarks.http_pool
+    cd backend && DATABASE_URL=sqlite:// python -m benchmarks.http_pool --url https://nominatim.openstreetmap.org/status
+"""
+from __future__ import annotations
+import os
+import ssl
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import threading
+import statistics
+import subprocess
+
+import httpx
+import uvicorn
+
+from app.core.http import Upstream
+
+
+async def _app(scope, receive, send):
+    if scope["type"] != "http":
+        return
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": b'{"ok": true}'})
+
+
+def _self_signed(tmp: str) -> tuple[str, str] | None:
+    cert, key = os.path.join(tmp, "cert.pem"), os.path.join(tmp, "key.pem")
+    try:
+        subprocess.run(
+            ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-keyout", key, "-out", cert,
+             "-days", "1", "-subj", "/CN=localhost"],
+            check=True, capture_output=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return cert, key
+
+
+def _serve(tls: tuple[str, str] | None) -> str:
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    config = uvicorn.Config(_app, host="127.0.0.1", port=port, log_level="warning",
+                            ssl_certfile=tls[0] if tls else None, ssl_keyfile=tls[1] if tls else None)
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"{'https' if tls else 'http'}://127.0.0.1:{port}/"
+
+
+def _summary(label: str, samples: list[float]) -> str:
+    ms = sorted(s * 1000 for s in samples)
+    return (f"{label:<28} mean={statistics.mean(ms):7.2f}ms p50={ms[len(ms) // 2]:7.2f}ms "
+            f"p95={ms[int(len(ms) * 0.95)]:7.2f}ms")
+
+
+async def _per_call(url: str, verify) -> float:
+    t0 = time.perf_counter()
+    async with httpx.AsyncClient(verify=verify, timeout=15.0) as client:
+        (await client.get(url)).raise_for_status()
+    return time.perf_counter() - t0
+
+
+async def _pooled(client: httpx.AsyncClient, url: str) -> float:
+    t0 = time.perf_counter()
+    (await client.get(url)).raise_for_status()
+    return time.perf_counter() - t0
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="benchmark against this URL instead of a local server")
+    parser.add_argument("--no-tls", action="store_true")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--fanout", type=int, default=40)
+    args = parser.parse_args()
+
+    verify: ssl.SSLContext | bool = True
+    url = args.url
+    if not url:
+        tmp = tempfile.mkdtemp()
+        tls = None if args.no_tls else _self_signed(tmp)
+        if tls is None and not args.no_tls:
+            print("openssl not available; falling back to plain HTTP")
+        url = _serve(tls)
+        if tls:
+            verify = ssl.create_default_context(cafile=tls[0])
+            verify.check_hostname = False
+
+    # Built like HttpClients._build, plus the benchmark's CA.
+    up = Upstream(max_connections=args.fanout, max_keepalive=args.fanout)
+    pooled = httpx.AsyncClient(
+        verify=verify,
+        timeout=httpx.Timeout(up.timeout, connect=up.connect_timeout),
+        limits=httpx.Limits(max_connections=up.max_connections, max_keepalive_connections=up.max_keepalive,
+                            keepalive_expiry=up.keepalive_expiry),
+    )
+    await _pooled(pooled, url)  # warm one connection, as a long-running worker would have
+
+    per_call = [await _per_call(url, verify) for _ in range(args.requests)]
+    shared = [await _pooled(pooled, url) for _ in range(args.requests)]
+    print(f"target {url}")
+    print(_summary("sequential, client per call", per_call))
+    print(_summary("sequential, pooled client", shared))
+
+    fan_per_call, fan_pooled = [], []
+    await asyncio.gather(*[_pooled(pooled, url) for _ in range(args.fanout)])  # fill the pool
+    for _ in range(5):
+        t0 = time.perf_counter()
+        await asyncio.gather(*[_per_call(url, verify) for _ in range(args.fanout)])
+        fan_per_call.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        await asyncio.gather(*[_pooled(pooled, url) for _ in range(args.fanout)])
+        fan_pooled.append(time.perf_counter() - t0)
+    print(f"{args.fanout}-way fan-out (median of 5): client per call {statistics.median(fan_per_call) * 1000:.1f}ms, "
+          f"pooled {statistics.median(fan_pooled) * 1000:.1f}ms")
+    saved = statistics.mean(per_call) - statistics.mean(shared)
+    print(f"saved per request: {saved * 1000:.2f}ms")
+    await pooled.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
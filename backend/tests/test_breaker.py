@@ -0,0 +1,30 @@
+import asyncio
+
+import pytest
+
+from app.core.breaker import OPEN, CircuitOpen, SharedBreakerState
+from app.core.cache import NAMESPACE_POLICIES, TTLCache
+from app.core.cache_backends import MemoryBackend
+from app.core.http import BREAKERS, UPSTREAMS, HttpClients
+
+
+def _worker(l2: MemoryBackend) -> HttpClients:
+    cache = TTLCache(namespace_policies=NAMESPACE_POLICIES, l2=l2, l2_sync_seconds=0)
+    return HttpClients(UPSTREAMS, breakers=BREAKERS, shared_breakers=SharedBreakerState(cache, sync_seconds=0))
+
+
+def test_trip_is_seen_by_another_worker():
+    async def run():
+        l2 = MemoryBackend()
+        first, second = _worker(l2), _worker(l2)
+        first.breakers["serpapi"].record(False, 0.1, rate_limited=True, retry_after=30)
+        await asyncio.sleep(0.01)  # let the publish task write to L2
+        assert first.breakers["serpapi"].state == OPEN
+        with pytest.raises(CircuitOpen):
+            await second.get("serpapi").get("https://serpapi.com/search.json")
+        assert second.breakers["serpapi"].state == OPEN
+        assert second.breakers["nominatim"].state != OPEN
+        await first.aclose()
+        await second.aclose()
+
+    asyncio.run(run())
@@ -0,0 +1,51 @@
+import asyncio
+import contextvars
+
+from app.core.cache import MB, NamespacePolicy, TTLCache
+
+
+def _cache() -> TTLCache:
+    return TTLCache(default_policy=NamespacePolicy(max_entries=1000, max_bytes=MB, hard_ttl=60))
+
+
+def test_refresh_with_ttl_zero_does_not_block_later_refreshes():
+    cache = _cache()
+    calls = []
+
+    async def producer():
+        calls.append(1)
+        # First result is cached briefly; refreshes say "do not cache this one".
+        return len(calls), (1 if len(calls) == 1 else 0)
+
+    async def run():
+        assert await cache.get_or_compute("t:k", producer) == 1
+        await asyncio.sleep(1.05)
+        for expected_calls in (2, 3):
+            assert await cache.get_or_compute("t:k", producer) == 1  # stale value served, refresh in background
+            await asyncio.sleep(0.05)
+            assert len(calls) == expected_calls
+
+    asyncio.run(run())
+
+
+def test_background_refresh_does_not_inherit_the_callers_context():
+    cache = _cache()
+    marker: contextvars.ContextVar = contextvars.ContextVar("marker", default=None)
+    seen = []
+
+    async def producer():
+        seen.append(marker.get())
+        return "v", 1
+
+    async def run():
+        await cache.get_or_compute("t:ctx", producer)
+        await asyncio.sleep(1.05)
+        token = marker.set("stream")
+        try:
+            await cache.get_or_compute("t:ctx", producer)  # stale: refreshes in the background
+        finally:
+            marker.reset(token)
+        await asyncio.sleep(0.05)
+
+    asyncio.run(run())
+    assert seen == [None, None]
@@ -0,0 +1,44 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from app.core.cache import NAMESPACE_POLICIES, TTLCache
+from app.core.cache_backends import CacheBackend, MemoryBackend, SQLiteBackend
+
+
+def test_backend_interface_is_abstract():
+    class Partial(CacheBackend):
+        async def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+def test_sqlite_purges_expired_rows_on_write(tmp_path):
+    path = str(tmp_path / "l2.db")
+    backend = SQLiteBackend(path, purge_interval=0)
+
+    async def run():
+        await backend.set("a:1", b"x", 0.01)
+        await asyncio.sleep(0.02)
+        await backend.set("a:2", b"y", 60)
+        await backend.close()
+
+    asyncio.run(run())
+    keys = [k for (k,) in sqlite3.connect(path).execute("SELECT key FROM l2_cache")]
+    assert keys == ["a:2"]
+
+
+def test_only_opted_in_namespaces_are_shared():
+    l2 = MemoryBackend()
+    cache = TTLCache(namespace_policies=NAMESPACE_POLICIES, l2=l2)
+
+    async def run():
+        await cache.set("events:abc", [1], 60)
+        await cache.set("geocode:somewhere", (1.0, 2.0), 60)
+        assert await l2.get("events:abc") is None
+        assert await l2.get("geocode:somewhere") is not None
+
+    asyncio.run(run())
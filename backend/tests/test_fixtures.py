@@ -0,0 +1,19 @@
+import httpx
+
+from app.core.fixtures import FixtureCorpus, _entry
+
+
+def _recording(url: str) -> dict:
+    response = httpx.Response(200, text="ok")
+    return _entry(f"GET {url}", response, b"ok", 0.01)
+
+
+def test_workers_saving_the_same_corpus_keep_each_others_recordings(tmp_path):
+    path = str(tmp_path / "upstream.jsonl.gz")
+    first, second = FixtureCorpus("upstream", path), FixtureCorpus("upstream", path)
+    first.put(_recording("https://example.test/a"))
+    second.put(_recording("https://example.test/b"))
+    first.save()
+    second.save()  # closes last; used to overwrite the first worker's file
+    keys = set(FixtureCorpus("upstream", path)._load())
+    assert keys == {"GET https://example.test/a", "GET https://example.test/b"}
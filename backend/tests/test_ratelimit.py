@@ -0,0 +1,26 @@
+import asyncio
+
+import httpx
+
+from app.core.ratelimit import Limiter, RateLimit
+
+
+def test_cancelled_queued_request_refunds_its_token():
+    limiter = Limiter("test", RateLimit(rate=1.0, burst=1, max_wait=10.0))
+    request = httpx.Request("GET", "https://example.test/")
+
+    async def run():
+        await limiter.acquire(request)  # uses the burst token
+        limiter.release()
+        for _ in range(3):  # each queues for a token, then is cancelled before it is sent
+            waiter = asyncio.ensure_future(limiter.acquire(request))
+            await asyncio.sleep(0.01)
+            waiter.cancel()
+            await asyncio.gather(waiter, return_exceptions=True)
+        # Without refunds the bucket would owe 3 tokens and this would wait about 4s.
+        waited = await asyncio.wait_for(limiter.acquire(request), 2.0)
+        limiter.release()
+        return waited
+
+    assert asyncio.run(run()) < 1.1
+    assert limiter.refunded == 3
@@ -0,0 +1,30 @@
+import asyncio
+
+import httpx
+
+from app.core.cache import cache
+from app.services import sportsdb
+
+
+def test_429_sets_a_shared_cooldown(monkeypatch):
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        return httpx.Response(429, headers={"Retry-After": "5"})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(sportsdb, "http_client", lambda name: client)
+    monkeypatch.setattr(sportsdb, "_api_key", lambda: "123")
+
+    async def run():
+        await cache.delete(sportsdb.COOLDOWN_KEY)
+        assert await sportsdb._get_json("lookupleague.php", {"id": "4328"}) is None
+        assert await cache.get(sportsdb.COOLDOWN_KEY)
+        # Another path during the cooldown does not reach the upstream.
+        assert await sportsdb._get_json("lookupleague.php", {"id": "4387"}) is None
+        assert len(calls) == 1
+        await cache.delete(sportsdb.COOLDOWN_KEY)
+        await client.aclose()
+
+    asyncio.run(run())
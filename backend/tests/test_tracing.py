@@ -0,0 +1,31 @@
+import asyncio
+import json
+
+import httpx
+
+from app.core.tracing import TracingTransport, tracer
+
+
+class _Capture:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, spans):
+        self.spans.extend(spans)
+
+
+def test_sportsdb_span_does_not_contain_the_key(monkeypatch):
+    capture = _Capture()
+    monkeypatch.setattr(tracer, "exporter", capture)
+    monkeypatch.setattr(tracer, "sample_rate", 1.0)
+    transport = TracingTransport(httpx.MockTransport(lambda request: httpx.Response(200, json={})), "thesportsdb")
+
+    async def run():
+        async with httpx.AsyncClient(transport=transport) as client:
+            await client.get("https://www.thesportsdb.com/api/v1/json/s3cr3tkey/eventsday.php", params={"d": "2026-10-18"})
+
+    asyncio.run(run())
+    assert capture.spans
+    dumped = json.dumps(capture.spans)
+    assert "s3cr3tkey" not in dumped
+    assert "/api/v1/json/REDACTED/eventsday.php" in dumped